@@ -0,0 +1,220 @@
+"""
+설비별 메일링 차트 일괄 생성 (atlas_ecas_mailing_chart)
+
+설비 목록과 기간을 받아
+1. 모든 설비의 값과 알람을 한 번의 조회로 읽고 (설비마다 쿼리하지 않음)
+   기간이 길어 원본 점이 차트 픽셀 수보다 훨씬 많으면 원본 대신 시간/일 롤업(simulate_pm/rollup.py)의
+   구간별 최솟값/최댓값을 읽는다. (몇 주 이상의 차트가 atlas_ecas_raw 전체를 읽지 않도록)
+2. 차트 그리기를 프로세스 풀에 나눠 맡긴다. 워커마다 ecas_chart 템플릿(figure)을 미리 만들어 두고
+   (Agg, 첫 배치까지 끝낸 상태) 설비 차트는 데이터만 바꿔 그린다.
+3. 차트별 소요 시간(워커 안에서 그리기+저장)과 전체 처리량을 출력한다.
+
+    python batch_charts.py --start "2025-07-18" --end "2025-07-19" --eqp EQP-001 EQP-002
+    python batch_charts.py --start "2025-07-18" --end "2025-07-19" --eqp-file eqps.txt --workers 8
+    python batch_charts.py --source mock_data.ecas --out-dir charts   # .ecas 파일의 채널마다 한 장
+    python batch_charts.py --source mock_data.ecas --format html       # 메일용 대화형 HTML (ecas_html.py)
+
+DB 는 simulate_pm/db.py 의 접속 정보(ECAS_DB_* 환경 변수)를 사용한다.
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import ecas_chart
+import ecas_html
+from ecas_series import open_series
+from timebase import local_to_epoch_ms
+
+# atlas_ecas_raw / atlas_ecas_alarms 의 tm 은 이 시간대의 현지 시간으로 기록된다. (data_inserter.py)
+DB_TIMEZONE = 'Asia/Seoul'
+DEFAULT_LAYOUT = '1x1'
+FORMATS = ('png', 'html')
+MAP_CHUNKSIZE = 4
+
+# PM 모드 행(val 이 NULL)도 읽어 NaN 으로 둔다. 빼고 읽으면 PM 구간이 앞뒤 값을 잇는 직선으로 그려진다.
+# (.ecas / mock 데이터도 PM 중에는 NaN 이라 선이 끊긴다)
+RAW_QUERY = """
+SELECT eqp_id, tm, val FROM atlas_ecas_raw
+WHERE eqp_id IN ({placeholders}) AND tm >= %s AND tm < %s
+ORDER BY eqp_id, tm
+"""
+
+ALARM_QUERY = """
+SELECT DISTINCT eqp_id, tm FROM atlas_ecas_alarms
+WHERE eqp_id IN ({placeholders}) AND tm >= %s AND tm < %s
+ORDER BY eqp_id, tm
+"""
+
+def _split_by_eqp(rows, columns):
+    """(eqp_id, ...) 로 정렬된 행을 설비별 컬럼 배열 dict 로"""
+    grouped = {}
+    if not rows:
+        return grouped
+    eqp_ids = np.array([row[0] for row in rows], dtype=object)
+    starts = np.flatnonzero(np.r_[True, eqp_ids[1:] != eqp_ids[:-1]])
+    ends = np.r_[starts[1:], len(rows)]
+    values = [np.array([row[i + 1] for row in rows], dtype=dtype) for i, dtype in enumerate(columns)]
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        grouped[eqp_ids[start]] = [column[start:end] for column in values]
+    return grouped
+
+def chart_width_px(layout=DEFAULT_LAYOUT, style=None):
+    """layout 차트 한 장의 가로 픽셀 수 (figure 폭 x DPI). 롤업 해상도를 고를 때 쓴다."""
+    dpi = dict(ecas_chart.DEFAULT_STYLE, **(style or {}))['dpi']
+    return int(ecas_chart.layout_of(layout)['figsize'][0] * dpi)
+
+def _rollup_points(rows, step):
+    """query_series_many() 의 롤업 행을 설비별 [시간, 값] 으로. 구간마다 최솟값과 최댓값 두 점을 남긴다.
+
+    구간 안에서 최솟값/최댓값의 순서는 알 수 없으므로 구간 시작에 최솟값, 구간 가운데에 최댓값을 둔다.
+    (decimate.py 'minmax' 처럼 픽셀 열별 세로 범위가 원본과 같다. 값이 없는 구간은 NaN 이라 선이 끊긴다)
+    """
+    half = np.timedelta64(int(step.total_seconds() * 1000) // 2, 'ms')
+    points = {}
+    by_eqp = _split_by_eqp([row[:4] for row in rows], ('datetime64[ms]', np.float32, np.float32))
+    for eqp_id, (bucket, val_min, val_max) in by_eqp.items():
+        points[eqp_id] = [
+            np.column_stack([bucket, bucket + half]).reshape(-1),
+            np.column_stack([val_min, val_max]).reshape(-1),
+        ]
+    return points
+
+def load_series_from_db(eqp_ids, start, end, width_px=None):
+    """eqp_ids 의 [start, end) 값과 알람을 조회 두 번으로 읽어 {eqp_id: {'t', 'v', 'a'}} 로 반환
+
+    width_px(차트 가로 픽셀 수)를 주면 rollup.choose_resolution() 으로 해상도를 골라, 기간이 길면
+    원본 대신 시간/일 롤업을 읽는다.
+    """
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'simulate_pm'))
+    from db import connection
+    from rollup import ROLLUPS, choose_resolution, query_series_many
+
+    resolution = choose_resolution(start, end, width_px) if width_px else 'raw'
+    placeholders = ', '.join(['%s'] * len(eqp_ids))
+    params = (*eqp_ids, start, end)
+    with connection(autocommit=True) as conn:
+        cursor = conn.cursor()
+        try:
+            if resolution == 'raw':
+                cursor.execute(RAW_QUERY.format(placeholders=placeholders), params)
+                raw = _split_by_eqp(cursor.fetchall(), ('datetime64[ms]', np.float32))
+            else:
+                _, rows = query_series_many(conn, eqp_ids, start, end, width_px, resolution)
+                raw = _rollup_points(rows, ROLLUPS[resolution][1])
+            cursor.execute(ALARM_QUERY.format(placeholders=placeholders), params)
+            alarms = _split_by_eqp(cursor.fetchall(), ('datetime64[ms]',))
+        finally:
+            cursor.close()
+
+    series = {}
+    for eqp_id in eqp_ids:
+        if eqp_id not in raw:
+            continue
+        tm, val = raw[eqp_id]
+        alarm_tm = alarms.get(eqp_id, [np.zeros(0, dtype='datetime64[ms]')])[0]
+        series[eqp_id] = {
+            't': local_to_epoch_ms(tm, DB_TIMEZONE), 'v': val, 'a': local_to_epoch_ms(alarm_tm, DB_TIMEZONE)
+        }
+    return series
+
+def load_series_from_file(path, eqp_ids=None):
+    """.ecas 파일의 채널(이름 = 설비 ID)별 차트 데이터
+
+    워커로 넘기는 데이터를 줄이기 위해 날짜 숫자('x', 'ax')는 빼고 epoch ms 만 보낸다. (워커에서 변환)
+    """
+    series_file = open_series(path)
+    names = eqp_ids or series_file.names
+    return {
+        name: {key: value for key, value in series_file.chart_data(name).items() if key in ('t', 'v', 'a')}
+        for name in names
+    }
+
+# --- 워커 ---
+_worker_settings = {}
+
+def _init_worker(layout, style, output_format='png'):
+    """워커 시작 시 템플릿을 만들고 빈 데이터로 한 번 그려 둔다. (폰트 로딩, tight_layout 등 첫 렌더 비용)"""
+    _worker_settings.update(layout=layout, style=style, output_format=output_format)
+    if output_format == 'html':
+        return   # HTML 은 브라우저에서 그리므로 미리 만들 figure 가 없다
+    template = ecas_chart.get_template(layout, style)
+    warmup = {'t': np.array([0, 60000], dtype=np.int64), 'v': np.array([0.0, 1.0]), 'a': (), 'title': ''}
+    template.render([warmup])
+    template.figure.canvas.draw()
+
+def render_chart(job):
+    """(eqp_id, series, path) 하나를 그려 저장하고 (eqp_id, path, 소요 시간) 반환"""
+    eqp_id, series, path = job
+    started = time.perf_counter()
+    if _worker_settings['output_format'] == 'html':
+        ecas_html.render_html([series], path, style=_worker_settings['style'])
+    else:
+        ecas_chart.render([series], _worker_settings['layout'], _worker_settings['style'], path=path)
+    return eqp_id, path, time.perf_counter() - started
+
+def render_batch(series_by_eqp, out_dir, suffix='', layout=DEFAULT_LAYOUT, style=None, workers=None,
+                 output_format='png'):
+    """설비별 차트를 프로세스 풀에서 그리고 [(eqp_id, path, 소요 시간)] 을 반환"""
+    os.makedirs(out_dir, exist_ok=True)
+    style_items = tuple(sorted((style or {}).items()))
+    jobs = [
+        (eqp_id, dict(series, title=eqp_id),
+         os.path.join(out_dir, f"{eqp_id}{'_' + suffix if suffix else ''}.{output_format}"))
+        for eqp_id, series in series_by_eqp.items()
+    ]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(layout, dict(style_items), output_format)) as pool:
+        return list(pool.map(render_chart, jobs, chunksize=MAP_CHUNKSIZE))
+
+def print_report(results, elapsed):
+    if not results:
+        print("No charts rendered.")
+        return
+    latencies = np.array([seconds for _, _, seconds in results]) * 1000
+    print(f"Rendered {len(results)} charts in {elapsed:.2f} s ({len(results) / elapsed:.1f} charts/s)")
+    print(f"  per chart (ms): mean {latencies.mean():.1f}, p50 {np.percentile(latencies, 50):.1f}, "
+          f"p95 {np.percentile(latencies, 95):.1f}, max {latencies.max():.1f}")
+    slowest = sorted(results, key=lambda result: result[2], reverse=True)[:5]
+    print("  slowest: " + ", ".join(f"{eqp_id} {seconds * 1000:.0f}ms" for eqp_id, _, seconds in slowest))
+
+def main():
+    parser = argparse.ArgumentParser(description="설비별 메일링 차트 일괄 생성")
+    parser.add_argument('--eqp', nargs='+', default=[], help="설비 ID 목록")
+    parser.add_argument('--eqp-file', help="설비 ID 목록 파일 (한 줄에 하나)")
+    parser.add_argument('--start', type=datetime.datetime.fromisoformat, help="시작 시간 (DB_TIMEZONE 현지 시간)")
+    parser.add_argument('--end', type=datetime.datetime.fromisoformat, help="끝 시간 (포함하지 않음)")
+    parser.add_argument('--source', default='db', help="'db' 또는 .ecas 파일 경로")
+    parser.add_argument('--layout', default=DEFAULT_LAYOUT, choices=sorted(ecas_chart.LAYOUTS))
+    parser.add_argument('--format', default='png', choices=FORMATS, help="png 또는 대화형 html")
+    parser.add_argument('--out-dir', default='charts')
+    parser.add_argument('--workers', type=int, default=None, help="프로세스 수 (기본: CPU 수)")
+    args = parser.parse_args()
+
+    eqp_ids = list(args.eqp)
+    if args.eqp_file:
+        with open(args.eqp_file, 'r') as f:
+            eqp_ids += [line.strip() for line in f if line.strip()]
+
+    started = time.perf_counter()
+    if args.source == 'db':
+        if not eqp_ids or not args.start or not args.end:
+            parser.error("--eqp/--eqp-file, --start and --end are required with --source db")
+        series_by_eqp = load_series_from_db(eqp_ids, args.start, args.end, chart_width_px(args.layout))
+        suffix = f"{args.start:%Y%m%d%H%M}_{args.end:%Y%m%d%H%M}"
+    else:
+        series_by_eqp = load_series_from_file(args.source, eqp_ids or None)
+        suffix = ''
+    loaded = time.perf_counter()
+    print(f"Loaded {len(series_by_eqp)} series in {loaded - started:.2f} s.")
+
+    results = render_batch(series_by_eqp, args.out_dir, suffix, args.layout, workers=args.workers,
+                           output_format=args.format)
+    print_report(results, time.perf_counter() - loaded)
+
+if __name__ == "__main__":
+    main()
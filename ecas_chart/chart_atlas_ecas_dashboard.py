@@ -0,0 +1,14 @@
+import sys
+
+from ecas_chart import render_shared
+from ecas_series import open_series
+
+# .ecas 파일의 채널(설비/항목)마다 차트 하나, 모든 차트가 시간 축을 공유한다.
+# python chart_atlas_ecas_dashboard.py dashboard.ecas
+file_name = sys.argv[1] if len(sys.argv) > 1 else 'mock_data.ecas'
+series_file = open_series(file_name)
+
+series_list = [dict(series_file.chart_data(name), title=name) for name in series_file.names]
+render_shared(series_list, path='line_chart_dashboard.png')
+
+print(f"{len(series_list)}x1 대시보드가 'line_chart_dashboard.png'로 저장되었습니다.")
@@ -0,0 +1,157 @@
+"""
+차트용 시계열 솎아내기 (decimation)
+
+가로 12 inch x 100 dpi 차트의 x 축은 1000 픽셀 남짓이라, 몇 달치 5분 데이터(수만 ~ 수십만 점)를 그대로
+ax.plot 에 넘겨도 화면에는 픽셀 열마다 세로 선 하나만 보인다. 그리기 전에 픽셀 수에 맞춰 점을 줄인다.
+
+- 'minmax': x 축을 픽셀 열 수만큼 같은 폭의 구간으로 나누고 구간마다 최솟값/최댓값 점만 남긴다.
+            픽셀 열마다 그려지는 세로 범위(envelope)가 원본과 같으므로 피크/딥이 사라지지 않는다. (기본)
+- 'lttb':   Largest-Triangle-Three-Buckets. 구간마다 앞뒤 점과 만드는 삼각형이 가장 큰 점 하나를 고른다.
+            점 수가 절반이고 선 모양이 자연스럽지만, 구간 안의 극값은 하나만 남는다.
+
+값이 NaN 인 구간(PM 등)은 NaN 점을 하나 남겨 선이 끊긴 채로 그려지게 한다.
+점 수는 원본 길이와 무관하게 픽셀 수에 비례하므로 기간이 길어도 그리는 시간이 일정하다.
+
+    python decimate.py                       # 1년치 데이터로 모드별 점 수/envelope 오차/시간 출력
+    python -m pytest test_decimate.py        # envelope 와 LTTB 규칙 테스트
+"""
+import numpy as np
+
+MODES = ('minmax', 'lttb')
+
+def _nan_run_starts(y):
+    """NaN 이 시작되는 위치 (연속된 NaN 은 첫 위치 하나)"""
+    missing = np.isnan(y)
+    return np.flatnonzero(missing & ~np.r_[False, missing[:-1]])
+
+def pixel_bins(x, buckets):
+    """x(오름차순)를 x[0] ~ x[-1] 의 같은 폭 구간 buckets 개로 나눈 구간 번호
+
+    x 축을 공유하는 여러 차트는 한 번 구해 decimate(..., bins=) 로 넘기면 된다.
+    """
+    span = x[-1] - x[0]
+    if span <= 0:
+        return np.zeros(len(x), dtype=np.int64)
+    return np.minimum(((x - x[0]) * (buckets / span)).astype(np.int64), buckets - 1)
+
+def minmax_indices(x, y, buckets, bins=None):
+    """구간마다 최솟값/최댓값 점의 인덱스 (시간 순). NaN 은 제외하고 NaN 구간의 시작점은 따로 더한다."""
+    valid = np.flatnonzero(~np.isnan(y))
+    if not len(valid):
+        return _nan_run_starts(y)
+    bins = (pixel_bins(x, buckets) if bins is None else bins)[valid]
+    # 구간 번호, 값 순으로 정렬하면 구간마다 첫 점이 최솟값, 마지막 점이 최댓값이다.
+    sort = np.lexsort((y[valid], bins))
+    order = valid[sort]
+    sorted_bins = bins[sort]
+    boundary = np.flatnonzero(sorted_bins[1:] != sorted_bins[:-1])
+    firsts = order[np.r_[0, boundary + 1]]
+    lasts = order[np.r_[boundary, len(order) - 1]]
+    return np.unique(np.concatenate([firsts, lasts, valid[[0, -1]], _nan_run_starts(y)]))
+
+def lttb_indices(x, y, buckets):
+    """Largest-Triangle-Three-Buckets 로 고른 점의 인덱스 (처음/끝 포함 buckets + 2 개 정도)
+
+    다음 구간의 평균점은 np.add.reduceat 으로 한 번에 구하고, 앞 구간에서 고른 점에 의존하는
+    구간별 선택만 구간 수만큼 반복한다. (원본 점 수가 아니라 픽셀 수에 비례)
+    """
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= buckets + 2:
+        return np.unique(np.concatenate([valid, _nan_run_starts(y)]))
+    vx, vy = x[valid], y[valid]
+    # 처음/끝 점을 뺀 나머지를 점 수가 같은 구간으로 나눈다.
+    edges = np.linspace(1, len(valid) - 1, buckets + 1).astype(np.int64)
+    edges = np.unique(edges)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(vx[:-1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(vy[:-1], edges[:-1]) / counts
+    # 구간 i 의 '다음 점': 다음 구간의 평균 (마지막 구간은 끝 점)
+    next_x = np.r_[mean_x[1:], vx[-1]]
+    next_y = np.r_[mean_y[1:], vy[-1]]
+
+    selected = np.empty(len(counts) + 2, dtype=np.int64)
+    selected[0] = 0
+    ax_, ay_ = vx[0], vy[0]
+    for i in range(len(counts)):
+        start, end = edges[i], edges[i + 1]
+        bx, by = vx[start:end], vy[start:end]
+        # 삼각형 넓이의 2배 (부호 제외)
+        area = np.abs((ax_ - next_x[i]) * (by - ay_) - (ax_ - bx) * (next_y[i] - ay_))
+        best = start + int(np.argmax(area))
+        selected[i + 1] = best
+        ax_, ay_ = vx[best], vy[best]
+    selected[-1] = len(valid) - 1
+    return np.unique(np.concatenate([valid[selected], _nan_run_starts(y)]))
+
+def decimate(x, y, buckets, mode='minmax', bins=None):
+    """(x, y) 를 buckets 개 구간 기준으로 솎아 (x, y) 를 반환. 점이 충분히 적거나 mode 가 None 이면 그대로.
+
+    bins: 미리 구한 pixel_bins(x, buckets) ('minmax' 에서만 사용)
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    if mode is None or buckets <= 0 or len(x) <= 2 * buckets:
+        return x, y
+    if mode == 'minmax':
+        indices = minmax_indices(x, y, buckets, bins)
+    elif mode == 'lttb':
+        indices = lttb_indices(x, y, buckets)
+    else:
+        raise ValueError(f"Unknown decimation mode {mode!r}. Available: {', '.join(MODES)}")
+    return x[indices], y[indices]
+
+def pixel_buckets(ax):
+    """axes 의 가로 픽셀 수 (figure 폭 x DPI 중 axes 가 차지하는 부분)"""
+    return max(1, int(round(ax.get_position().width * ax.figure.get_figwidth() * ax.figure.dpi)))
+
+def pixel_envelope(x, y, pixels, x_min=None, x_max=None):
+    """픽셀 열마다 (최솟값, 최댓값). 점이 없는 열은 NaN. (선이 지나가는 세로 범위의 근사)"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    x_min = x[0] if x_min is None else x_min
+    x_max = x[-1] if x_max is None else x_max
+    columns = np.minimum(((x - x_min) * (pixels / (x_max - x_min))).astype(np.int64), pixels - 1)
+    valid = ~np.isnan(y)
+    low = np.full(pixels, np.inf)
+    high = np.full(pixels, -np.inf)
+    np.minimum.at(low, columns[valid], y[valid])
+    np.maximum.at(high, columns[valid], y[valid])
+    empty = np.isinf(low)
+    low[empty] = np.nan
+    high[empty] = np.nan
+    return low, high
+
+def check_envelope(x, y, buckets, mode):
+    """솎아낸 결과의 픽셀 열별 envelope 를 원본과 비교해 (점 수, 최대 오차, 피크 보존 비율)을 반환"""
+    dx, dy = decimate(x, y, buckets, mode)
+    low, high = pixel_envelope(x, y, buckets)
+    d_low, d_high = pixel_envelope(dx, dy, buckets, x[0], x[-1])
+    both = ~np.isnan(low) & ~np.isnan(d_low)
+    error = max(np.nanmax(np.abs(low - d_low)[both], initial=0.0), np.nanmax(np.abs(high - d_high)[both], initial=0.0))
+    value_range = np.nanmax(y) - np.nanmin(y)
+    # 원본에서 가장 큰 값/작은 값이 결과에 남아 있는지
+    peaks = [np.nanmax(dy) == np.nanmax(y), np.nanmin(dy) == np.nanmin(y)]
+    return len(dx), error / value_range if value_range else 0.0, sum(peaks) / len(peaks)
+
+def main():
+    import time
+
+    rng = np.random.default_rng(0)
+    points = 365 * 288   # 1년, 5분 간격
+    x = 20000 + np.arange(points) / 288
+    y = 7.0 + np.cumsum(rng.normal(0, 0.01, points)) + rng.normal(0, 0.08, points)
+    spikes = rng.choice(points, 20, replace=False)
+    y[spikes] += rng.choice([-1, 1], 20) * rng.uniform(1, 2, 20)
+    y[5000:5030] = np.nan
+    buckets = 1050   # 12 inch x 100 dpi 차트의 axes 폭 정도
+
+    print(f"{points:,} points -> {buckets} pixel columns")
+    for mode in MODES:
+        started = time.perf_counter()
+        count, error, peaks = check_envelope(x, y, buckets, mode)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"  {mode:7s}: {count:5d} points, max envelope error {error:.2%} of range, "
+              f"global peaks kept {peaks:.0%} ({elapsed:.1f} ms incl. check)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+"""
+ECAS 시계열 차트 렌더링 엔진
+
+chart_atlas_ecas*.py 가 각자 하던 일(figure 구성, 축/눈금 설정, 알람 영역, 저장)을 모은 모듈.
+레이아웃(1x1, 4x1 ...)과 스타일 조합마다 figure, axes, 선(Line2D)을 한 번만 만들어 두고(ChartTemplate),
+render() 할 때는 선의 데이터(set_data), 축 범위와 눈금, 제목, 알람 영역만 바꾼다.
+그래서 설비별 차트 수백 장을 연달아 그려도 figure 를 매번 새로 만드는 비용이 들지 않는다.
+
+    from ecas_chart import render
+    from ecas_series import load_chart_data
+
+    data = load_chart_data('mock_data.ecas')
+    render([dict(data, title='Current I')], layout='1x1', path='line_chart_kst.png')
+
+series: load_chart_data() 가 반환하는 {'t': epoch ms, 'v': 값, 'a': 알람 시간(ms)} 에 'title' 을 더한 dict.
+시간은 UTC epoch ms 그대로 두고, 눈금 라벨만 style['tz'] 시간대로 표시한다. (plt.rcParams['timezone'] 불필요)
+'x' / 'ax' (t / a 의 matplotlib 날짜 숫자)가 있으면 변환 없이 그대로 쓴다. (timebase.py)
+
+여러 설비/항목을 한 시간 축에 쌓는 대시보드는 render_shared() (16개 이상도 가능):
+
+    series_file = open_series('dashboard.ecas')
+    render_shared([dict(series_file.chart_data(name), title=name) for name in series_file.names],
+                  path='dashboard.png')
+
+figure 는 pyplot 을 거치지 않고 Agg 로 그리므로 GUI 없는 서버나 여러 프로세스에서 그대로 쓸 수 있다.
+"""
+import re
+
+import matplotlib.colors as mcolors
+import matplotlib.dates as mdates
+import matplotlib.style
+import matplotlib.ticker as ticker
+import matplotlib.transforms as mtransforms
+import numpy as np
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
+
+from decimate import decimate, pixel_bins, pixel_buckets
+from timebase import epoch_ms_to_date_num
+
+# 레이아웃 템플릿: 행 수, 크기(inch), x 축 공유 여부(공유하면 맨 아래 차트만 x 라벨 표시), tight_layout pad
+LAYOUTS = {
+    '1x1': {'rows': 1, 'figsize': (12, 6), 'sharex': False, 'pad': 1.08},
+    '4x1': {'rows': 4, 'figsize': (12, 16), 'sharex': False, 'pad': 3.0},
+    '4x1_tall': {'rows': 4, 'figsize': (12, 24), 'sharex': False, 'pad': 3.0},
+    '4x1_shared': {'rows': 4, 'figsize': (12, 24), 'sharex': True, 'pad': 3.0},
+}
+# LAYOUTS 에 없는 'Nx1_shared' 는 x 축을 공유하는 N 행으로 만든다. (대시보드, render_shared)
+SHARED_LAYOUT = re.compile(r'(\d+)x1_shared')
+PANEL_HEIGHT = 2.0   # 'Nx1_shared' 차트 하나의 높이 (inch)
+
+DEFAULT_STYLE = {
+    'mpl_style': 'seaborn-v0_8',     # matplotlib 3.6 이전에는 'seaborn'
+    'font_family': None,             # 한글 제목이면 'Malgun Gothic' 등
+    'tz': 'Asia/Seoul',
+    'date_format': '%Y-%m-%d\n%H:%M:%S %Z',
+    'x_ticks': 6,                    # 처음~끝을 나눈 고정 눈금 수. None 이면 matplotlib 자동 눈금
+    'y_ticks': 7,
+    'y_format': '%.2f',
+    'line_color': 'blue',
+    'line_width': 1.5,
+    'alarm_color': 'red',
+    'alarm_alpha': 0.1,
+    'alarm_width_ratio': 1 / 60,     # 알람 영역 폭 (x 축 전체 대비)
+    'decimation': 'minmax',          # 점이 axes 가로 픽셀 수의 2배를 넘으면 솎아서 그림 ('minmax', 'lttb', None)
+    'title_size': 16,
+    'tick_label_size': 12,
+    'tick_label_rotation': 45,
+    'dpi': 100,
+}
+
+def to_date_num(t_ms):
+    """epoch ms 배열을 matplotlib 날짜 숫자(UTC 기준 일 단위)로"""
+    return epoch_ms_to_date_num(t_ms)
+
+def _date_nums(series, key, ms_key):
+    """series 의 날짜 숫자 (loader 가 미리 만들어 둔 key 가 있으면 그대로, 없으면 ms_key 를 변환)"""
+    x = series.get(key)
+    return to_date_num(series.get(ms_key, ())) if x is None else np.asarray(x, dtype=np.float64)
+
+def layout_of(name):
+    """레이아웃 이름의 설정 (LAYOUTS 또는 'Nx1_shared')"""
+    if name in LAYOUTS:
+        return LAYOUTS[name]
+    match = SHARED_LAYOUT.fullmatch(name)
+    if match and int(match.group(1)) > 0:
+        rows = int(match.group(1))
+        return {'rows': rows, 'figsize': (12, 1.0 + PANEL_HEIGHT * rows), 'sharex': True, 'pad': 1.08}
+    raise ValueError(f"Unknown layout {name!r}. Available: {', '.join(LAYOUTS)}, Nx1_shared")
+
+def _x_range(xs):
+    """날짜 숫자 배열들(각각 오름차순) 전체의 (처음, 끝). 비어 있으면 (0, 1), 한 점이면 1시간 폭."""
+    xs = [x for x in xs if len(x)]
+    if xs:
+        min_num, max_num = min(float(x[0]) for x in xs), max(float(x[-1]) for x in xs)
+    else:
+        min_num, max_num = 0.0, 1.0
+    if min_num == max_num:
+        max_num = min_num + 1 / 24
+    return min_num, max_num
+
+def alarm_bands(alarm_nums, width, x_min, x_max, pixels=None):
+    """알람 시점마다 폭 width 인 사각형을 겹친 개수가 같은 구간으로 합쳐 (왼쪽, 오른쪽, 겹친 개수) 배열로 반환
+
+    사각형 시작에 +1, 끝에 -1 을 두고 정렬한 뒤 누적합을 구하면 경계 사이 구간마다 겹친 개수가 나온다.
+    pixels 를 주면 x_min ~ x_max 를 픽셀 열로 나눠 열 가운데의 겹친 개수로 대신한다.
+    (알람이 많아도 구간 수가 픽셀 수를 넘지 않는다)
+    x_min ~ x_max 밖에서 시작하는 알람은 그리지 않는다. (예전 스크립트와 같음)
+    """
+    starts = np.asarray(alarm_nums, dtype=np.float64)
+    starts = starts[(starts >= x_min) & (starts <= x_max)]
+    if not len(starts):
+        empty = np.zeros(0)
+        return empty, empty, np.zeros(0, dtype=np.int64)
+    edges = np.concatenate([starts, starts + width])
+    steps = np.concatenate([np.ones(len(starts), dtype=np.int64), -np.ones(len(starts), dtype=np.int64)])
+    order = np.argsort(edges, kind='stable')
+    edges = edges[order]
+    depth = np.cumsum(steps[order])
+    # 같은 위치의 경계는 마지막 누적값만 남긴다. 구간 [edges[i], edges[i+1]) 의 겹친 개수는 depth[i].
+    last = np.r_[edges[1:] != edges[:-1], True]
+    edges, depth = edges[last], depth[last]
+    if pixels:
+        pixel_width = (x_max - x_min) / pixels
+        centers = x_min + (np.arange(pixels) + 0.5) * pixel_width
+        position = np.searchsorted(edges, centers, side='right') - 1
+        depth = np.where(position >= 0, depth[np.maximum(position, 0)], 0)
+        edges = x_min + np.arange(pixels + 1) * pixel_width
+    else:
+        depth = depth[:-1]
+    # 개수가 같은 이웃 구간은 하나로 합친다.
+    first = np.flatnonzero(np.r_[True, depth[1:] != depth[:-1]])
+    left = edges[first]
+    right = edges[np.r_[first[1:], len(depth)]]
+    depth = depth[first]
+    drawn = depth > 0
+    return left[drawn], right[drawn], depth[drawn]
+
+def _style_sheets(style):
+    sheets = []
+    mpl_style = style['mpl_style']
+    if mpl_style:
+        if mpl_style not in matplotlib.style.available and mpl_style.replace('-v0_8', '') in matplotlib.style.available:
+            mpl_style = mpl_style.replace('-v0_8', '')
+        sheets.append(mpl_style)
+    if style['font_family']:
+        sheets.append({'font.family': style['font_family'], 'axes.unicode_minus': False})
+    return sheets
+
+class ChartTemplate:
+    """레이아웃 하나의 figure / axes / 선을 만들어 두고 render() 마다 데이터만 바꿔 그린다.
+
+    x 축을 공유하는 레이아웃은 x 범위, 눈금, 날짜 formatter, 솎아내기 구간, 알람 영역을 한 번만 계산해
+    모든 차트가 같이 쓰고, 차트마다는 자기 선 데이터와 y 축, 제목만 바꾼다.
+    """
+
+    def __init__(self, layout='1x1', style=None):
+        self.layout = layout_of(layout)
+        self.style = dict(DEFAULT_STYLE, **(style or {}))
+        self._sheets = _style_sheets(self.style)
+        self._laid_out = False
+
+        with matplotlib.style.context(self._sheets):
+            self.figure = Figure(figsize=self.layout['figsize'], dpi=self.style['dpi'], facecolor='white')
+            self.axes = self.figure.subplots(self.layout['rows'], 1, sharex=self.layout['sharex'], squeeze=False)[:, 0]
+            self.lines = []
+            self.alarm_bands = []
+            # x 축을 공유하면 눈금(Ticker)도 공유되므로 formatter 하나를 모든 axes 가 같이 쓴다.
+            shared_formatter = self._date_formatter() if self.layout['sharex'] else None
+            for ax in self.axes:
+                ax.set_facecolor('white')
+                line, = ax.plot([], [], color=self.style['line_color'], linewidth=self.style['line_width'], zorder=2)
+                self.lines.append(line)
+                ax.grid(True, linestyle='-', alpha=0.7, color='grey')
+                ax.xaxis.set_major_formatter(shared_formatter or self._date_formatter())
+                ax.yaxis.set_major_formatter(ticker.FormatStrFormatter(self.style['y_format']))
+                ax.tick_params(axis='both', colors='black')
+                # 알람 영역: axes 마다 PolyCollection 하나. x 는 데이터 좌표, y 는 axes 좌표(0~1, 위아래 끝까지)
+                bands = PolyCollection(
+                    [], transform=mtransforms.blended_transform_factory(ax.transData, ax.transAxes),
+                    edgecolor='none', linewidth=0, antialiased=False, zorder=1
+                )
+                ax.add_collection(bands, autolim=False)
+                self.alarm_bands.append(bands)
+        # 겹친 개수 k 인 구간의 색: 같은 색 사각형 k 개를 alpha 로 겹쳐 그린 것과 같은 1 - (1 - alpha)^k
+        self._alarm_rgb = mcolors.to_rgb(self.style['alarm_color'])
+
+    def _date_formatter(self):
+        return mdates.DateFormatter(self.style['date_format'], tz=self.style['tz'])
+
+    def render(self, series_list):
+        """series_list 를 위에서부터 한 axes 에 하나씩 그리고 figure 를 반환 (남는 axes 는 숨김)"""
+        if len(series_list) > len(self.axes):
+            raise ValueError(f"{len(series_list)} series for a layout with {len(self.axes)} charts")
+        with matplotlib.style.context(self._sheets):
+            for i, ax in enumerate(self.axes):
+                ax.set_visible(i < len(series_list))
+            if self.layout['sharex']:
+                self._draw_shared(series_list)
+            else:
+                for i, series in enumerate(series_list):
+                    self._draw_series(i, series)
+            if not self._laid_out:
+                # 눈금 라벨 폭은 데이터가 바뀌어도 거의 같으므로 배치는 처음 한 번만 계산한다.
+                self.figure.tight_layout(pad=self.layout['pad'])
+                self._laid_out = True
+        return self.figure
+
+    def _draw_series(self, i, series):
+        ax = self.axes[i]
+        x = _date_nums(series, 'x', 't')
+        min_num, max_num = _x_range([x])
+        self._set_x_axis(ax, min_num, max_num)
+        pixels = pixel_buckets(ax)
+        self._draw_line(i, x, series['v'], pixels)
+        self._set_alarms(i, self._alarm_polygons(_date_nums(series, 'ax', 'a'), min_num, max_num, pixels))
+        self._set_title(ax, series)
+        self._set_x_tick_labels(ax)
+
+    def _draw_shared(self, series_list):
+        """x 축을 공유하는 차트들: 공통 계산은 한 번, 차트마다는 선과 y 축만"""
+        if not series_list:
+            return
+        axes = self.axes[:len(series_list)]
+        # 같은 시간 배열을 쓰는 차트(.ecas 파일의 채널들)는 변환/솎아내기 구간/알람 영역도 같이 쓴다.
+        date_nums = {}
+
+        def shared_date_nums(series, key, ms_key):
+            source = series.get(key)
+            source = series.get(ms_key, ()) if source is None else source
+            cached = date_nums.get(id(source))
+            if cached is None:
+                cached = date_nums[id(source)] = (source, _date_nums(series, key, ms_key))
+            return cached[1]
+
+        xs = [shared_date_nums(series, 'x', 't') for series in series_list]
+        min_num, max_num = _x_range(xs)
+        self._set_x_axis(axes[0], min_num, max_num)   # 공유 축이라 한 번이면 모든 axes 에 적용된다
+        pixels = pixel_buckets(axes[0])
+        bins = {}
+        polygons = {}
+        for i, series in enumerate(series_list):
+            x = xs[i]
+            if self.style['decimation'] == 'minmax' and id(x) not in bins and len(x) > 2 * pixels:
+                bins[id(x)] = pixel_bins(x, pixels)
+            self._draw_line(i, x, series['v'], pixels, bins.get(id(x)))
+            alarm_x = shared_date_nums(series, 'ax', 'a')
+            if id(alarm_x) not in polygons:
+                polygons[id(alarm_x)] = self._alarm_polygons(alarm_x, min_num, max_num, pixels)
+            self._set_alarms(i, polygons[id(alarm_x)])
+            self._set_title(axes[i], series)
+        # 날짜 라벨은 보이는 차트 중 맨 아래에만
+        for ax in axes[:-1]:
+            ax.xaxis.set_tick_params(labelbottom=False)
+        axes[-1].xaxis.set_tick_params(labelbottom=True)
+        self._set_x_tick_labels(axes[-1])
+
+    def _set_x_axis(self, ax, min_num, max_num):
+        ax.set_xlim(min_num, max_num)
+        if self.style['x_ticks']:
+            ax.xaxis.set_major_locator(ticker.FixedLocator(np.linspace(min_num, max_num, self.style['x_ticks'])))
+
+    def _draw_line(self, i, x, v, pixels, bins=None):
+        """선 데이터와 y 축. 축 범위는 원본으로 계산하고, 선에는 픽셀 수에 맞춰 솎아낸 점만 넘긴다."""
+        ax = self.axes[i]
+        y = np.asarray(v, dtype=np.float64)
+        self.lines[i].set_data(*decimate(x, y, pixels, self.style['decimation'], bins))
+        if len(y) and not np.isnan(y).all():
+            min_y, max_y = float(np.nanmin(y)), float(np.nanmax(y))
+        else:
+            min_y, max_y = 0.0, 1.0
+        if min_y == max_y:
+            min_y, max_y = min_y - 0.5, max_y + 0.5
+        ax.set_ylim(min_y, max_y)
+        ax.yaxis.set_major_locator(ticker.FixedLocator(np.linspace(min_y, max_y, self.style['y_ticks'])))
+
+    def _alarm_polygons(self, alarm_x, min_num, max_num, pixels):
+        """알람 영역 PolyCollection 의 (verts, 색)"""
+        style = self.style
+        rect_width_days = (max_num - min_num) * style['alarm_width_ratio']
+        left, right, depth = alarm_bands(alarm_x, rect_width_days, min_num, max_num, pixels)
+        verts = np.empty((len(left), 4, 2))
+        verts[:, :2, 0] = left[:, None]
+        verts[:, 2:, 0] = right[:, None]
+        verts[:, :, 1] = (0.0, 1.0, 1.0, 0.0)
+        colors = np.empty((len(left), 4))
+        colors[:, :3] = self._alarm_rgb
+        colors[:, 3] = 1.0 - (1.0 - style['alarm_alpha']) ** depth
+        return verts, colors
+
+    def _set_alarms(self, i, polygons):
+        verts, colors = polygons
+        self.alarm_bands[i].set_verts(verts)
+        self.alarm_bands[i].set_facecolor(colors)
+
+    def _set_title(self, ax, series):
+        # y 를 지정하면 그릴 때마다 위쪽 눈금 라벨과 겹치는지 계산하지 않는다. (x 눈금은 항상 아래쪽)
+        ax.set_title(series.get('title', ''), fontsize=self.style['title_size'], fontweight='bold', color='black',
+                     y=1.0)
+
+    def _set_x_tick_labels(self, ax):
+        style = self.style
+        for label in ax.get_xticklabels():
+            label.set(rotation=style['tick_label_rotation'], ha='center',
+                      fontsize=style['tick_label_size'], fontweight='bold')
+
+    def save(self, path):
+        self.figure.savefig(path, facecolor='white')
+
+# (레이아웃, 스타일) 별로 만들어 둔 템플릿
+_templates = {}
+
+def get_template(layout='1x1', style=None):
+    """같은 레이아웃과 스타일이면 만들어 둔 템플릿을 재사용한다. (style 값은 hashable 이어야 함)"""
+    key = (layout, tuple(sorted((style or {}).items())))
+    template = _templates.get(key)
+    if template is None:
+        template = _templates[key] = ChartTemplate(layout, style)
+    return template
+
+def render(series_list, layout='1x1', style=None, path=None):
+    """series_list 를 layout 템플릿에 그려 figure 를 반환. path 를 주면 이미지로 저장한다."""
+    template = get_template(layout, style)
+    figure = template.render(series_list)
+    if path:
+        template.save(path)
+    return figure
+
+def render_shared(series_list, style=None, path=None):
+    """series_list 를 시간 축을 공유하는 차트 N 개로 위아래로 쌓아 그린다. (layout 'Nx1_shared')"""
+    return render(series_list, f'{len(series_list)}x1_shared', style, path)
@@ -0,0 +1,172 @@
+"""
+ECAS 시계열 대화형 HTML 차트
+
+PNG (ecas_chart.py) 대신 브라우저에서 확대/이동할 수 있는 HTML 파일 하나를 만든다. 메일 첨부용.
+- 시간/값/알람은 JSON 숫자 목록이 아니라 little-endian 타입 배열(Int32 시간 차이, Float32 값)을
+  바이트 자리별로 모아 zlib 으로 압축해 base64 로 넣는다. (값은 손실 없음)
+  5분 간격 시간은 차이가 일정해 거의 0 바이트로 줄어든다.
+- 브라우저는 보이는 구간만 픽셀 열마다 최솟값/최댓값 점으로 솎아 그린다. (decimate.py 'minmax' 와 같은 방식)
+  확대하면 보이는 점이 줄어 원본 점이 그대로 보이고, 서버에서 이미지를 만드는 비용이 없다.
+- 모양은 pls_chart/*.html 과 같은 카드 레이아웃, 색/눈금 수/알람 표시는 ecas_chart.DEFAULT_STYLE 을 따른다.
+
+    from ecas_html import render_html
+    render_html([dict(data, title='Current I')], path='line_chart_kst.html')
+
+    python ecas_html.py mock_data.ecas -o line_chart_kst.html
+    python ecas_html.py dashboard.ecas --channel EQP-001 EQP-002 -o dashboard.html
+"""
+import argparse
+import base64
+import datetime
+import json
+import os
+import re
+import tempfile
+import zlib
+from zoneinfo import ZoneInfo
+
+import matplotlib.colors as mcolors
+import numpy as np
+
+from decimate import decimate
+from ecas_chart import DEFAULT_STYLE
+from ecas_series import load_chart_data, open_series
+from timebase import fixed_offset_ms
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ecas_chart_template.html')
+DATA_MARKER = '/*ECAS_DATA*/null'
+COMPRESS_LEVEL = 6
+# 차트 하나의 높이 (px, 시간 라벨 제외). 여러 개면 대시보드처럼 낮게
+PANEL_HEIGHT = 360
+SHARED_PANEL_HEIGHT = 200
+
+def _pack(array):
+    """타입 배열 -> 바이트 자리별로 모음(shuffle) -> zlib 압축 -> base64 문자열
+
+    float32 값은 부호/지수 바이트가 거의 같아서, 자리별로 모아 두면 그대로 압축할 때보다 30% 정도 작아진다.
+    """
+    array = np.ascontiguousarray(array)
+    shuffled = array.view(np.uint8).reshape(-1, array.itemsize).T.tobytes()
+    return base64.b64encode(zlib.compress(shuffled, COMPRESS_LEVEL)).decode('ascii')
+
+def encode_times(t_ms):
+    """epoch ms 배열을 {'t0', 'dt': Int32 차이} 로. 차이가 int32 를 넘거나 음수면 {'ms': Float64 절대 시간}"""
+    t_ms = np.asarray(t_ms, dtype=np.int64)
+    if not len(t_ms):
+        return {'t0': 0, 'dt': _pack(np.zeros(0, dtype='<i4'))}
+    deltas = np.diff(t_ms, prepend=t_ms[0])
+    if deltas.min() >= 0 and deltas.max() <= np.iinfo(np.int32).max:
+        return {'t0': int(t_ms[0]), 'dt': _pack(deltas.astype('<i4'))}
+    return {'ms': _pack(t_ms.astype('<f8'))}
+
+def encode_values(values):
+    return _pack(np.asarray(values, dtype='<f4'))
+
+def _style_payload(style):
+    """DEFAULT_STYLE 중 HTML 에서 쓰는 값 (색은 CSS 로 그릴 수 있는 형식으로)"""
+    digits = re.fullmatch(r'%\.(\d+)f', style['y_format'])
+    return {
+        'lineColor': mcolors.to_hex(style['line_color']),
+        'lineWidth': style['line_width'],
+        'alarmRgb': [round(c * 255) for c in mcolors.to_rgb(style['alarm_color'])],
+        'alarmAlpha': style['alarm_alpha'],
+        'alarmWidthRatio': style['alarm_width_ratio'],
+        'xTicks': style['x_ticks'] or DEFAULT_STYLE['x_ticks'],
+        'yTicks': style['y_ticks'],
+        'yDigits': int(digits.group(1)) if digits else 2,
+    }
+
+def _tz_name(tz, t_ms):
+    """DST 가 없는 시간대면 시간 라벨에 쓸 약자 (예: KST). DST 가 있으면 None (브라우저가 시점마다 구함)"""
+    if not len(t_ms):
+        return None
+    first = datetime.datetime.fromtimestamp(int(t_ms[0]) / 1000, ZoneInfo(tz))
+    last = datetime.datetime.fromtimestamp(int(t_ms[-1]) / 1000, ZoneInfo(tz))
+    if fixed_offset_ms(tz, first.year - 1, last.year + 1) is None:
+        return None
+    return first.tzname()
+
+def chart_payload(series_list, title='', style=None, max_points=None):
+    """HTML 에 넣을 데이터 dict. 같은 시간 배열을 쓰는 series 는 시간을 한 번만 넣는다.
+
+    max_points: series 하나의 점이 이보다 많으면 미리 솎아서 넣는다. (파일 크기 상한, minmax 라 피크는 남음)
+    """
+    style = dict(DEFAULT_STYLE, **(style or {}))
+    times = []
+    time_index = {}
+    first_t = None
+    panels = []
+    for series in series_list:
+        t = np.asarray(series['t'], dtype=np.int64)
+        v = np.asarray(series['v'], dtype=np.float32)
+        if max_points and len(t) > max_points:
+            t, v = decimate(t, v, max_points // 2, 'minmax')
+            key = None   # 솎아낸 결과는 series 마다 다르다
+        else:
+            key = id(series['t'])
+        if key is None or key not in time_index:
+            times.append(encode_times(t))
+            if key is not None:
+                time_index[key] = len(times) - 1
+        if first_t is None and len(t):
+            first_t = t
+        panels.append({
+            'title': series.get('title', ''),
+            't': time_index[key] if key is not None else len(times) - 1,
+            'v': encode_values(v),
+            'a': encode_times(np.sort(np.asarray(series.get('a', ()), dtype=np.int64))),
+        })
+    return {
+        'title': title or (panels[0]['title'] if len(panels) == 1 else 'ECAS 시계열 차트'),
+        'tz': style['tz'],
+        'tzName': _tz_name(style['tz'], first_t if first_t is not None else ()),
+        'panelHeight': PANEL_HEIGHT if len(panels) == 1 else SHARED_PANEL_HEIGHT,
+        'style': _style_payload(style),
+        'times': times,
+        'series': panels,
+    }
+
+def render_html(series_list, path=None, title='', style=None, max_points=None):
+    """series_list 를 시간 축을 공유하는 대화형 차트 HTML 로 만들어 반환. path 를 주면 파일로 저장한다."""
+    with open(TEMPLATE_PATH, 'r', encoding='utf-8') as f:
+        template = f.read()
+    payload = json.dumps(chart_payload(series_list, title, style, max_points), ensure_ascii=False)
+    # </script> 가 데이터 안에 있으면 스크립트가 끝나 버리므로 '</' 를 이스케이프
+    html = template.replace(DATA_MARKER, payload.replace('</', '<\\/'), 1)
+    if path:
+        directory = os.path.dirname(path) or '.'
+        fd, tmp_path = tempfile.mkstemp(prefix='.ecas_html.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(html)
+            os.chmod(tmp_path, 0o644)   # mkstemp 는 0600 으로 만든다. 메일 발송 등 다른 계정에서도 읽도록
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return html
+
+def main():
+    parser = argparse.ArgumentParser(description="ECAS 시계열 대화형 HTML 차트")
+    parser.add_argument('path', help=".ecas 또는 mock_data.json 형식 파일")
+    parser.add_argument('-o', '--output', default='line_chart.html')
+    parser.add_argument('--channel', nargs='+', default=None, help="채널 이름 또는 번호 (기본: .ecas 의 모든 채널)")
+    parser.add_argument('--title', default='')
+    parser.add_argument('--max-points', type=int, default=None, help="차트 하나에 넣을 최대 점 수")
+    args = parser.parse_args()
+
+    if args.path.endswith('.json'):
+        series_list = [dict(load_chart_data(args.path), title=args.title)]
+    else:
+        series_file = open_series(args.path)
+        channels = [int(c) if c.isdigit() else c for c in args.channel] if args.channel else series_file.names
+        series_list = [
+            dict(series_file.chart_data(channel), title=series_file.names[series_file.channel_index(channel)])
+            for channel in channels
+        ]
+    render_html(series_list, args.output, args.title, max_points=args.max_points)
+    print(f"'{args.output}' ({os.path.getsize(args.output) / 1024:.1f} KB, {len(series_list)} charts)")
+
+if __name__ == "__main__":
+    main()
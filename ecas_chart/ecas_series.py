@@ -0,0 +1,307 @@
+"""
+ECAS 시계열 바이너리 포맷 (.ecas)
+
+mock_data.json 의 {'t': [...], 'v': [...], 'a': [...]} 를 대신하는 파일 형식.
+여러 채널(설비/항목)이 하나의 시간 축을 공유하고, numpy.memmap 으로 열어 값과 알람을 복사 없이 읽는다.
+(JSON 은 점 하나마다 파싱/객체 생성을 하므로 1년치 5분 데이터 x 수천 채널이면 수 초 ~ 수십 초가 걸린다)
+
+레이아웃 (little-endian, 각 구간은 8바이트 경계로 정렬):
+    header   24 bytes                       magic b'ECAS', version(u2), flags(u2), channels(u4),
+                                            names_size(u4), points(i8)
+    names    names_size bytes               채널 이름 (UTF-8, '\\n' 구분)
+    t_delta  int64[points]                  첫 값은 시작 시간(epoch ms), 이후는 앞 시점과의 차이(ms)
+    values   float32[channels, points]      채널별로 연속
+    alarms   uint8[channels, (points+7)//8] 알람 비트맵 (np.packbits, 시점 i 에 알람이면 1)
+
+values / alarms / t_delta 는 파일 버퍼의 view 이고, 절대 시간 t 는 처음 쓸 때 np.cumsum 한 번으로 만든다.
+차트 x 값(matplotlib 날짜 숫자)도 채널이 공유하므로 파일마다 한 번만 계산한다. (timebase.py)
+
+    python ecas_series.py import mock_data.json mock_data.ecas
+    python ecas_series.py export mock_data.ecas mock_data.json
+    python ecas_series.py info mock_data.ecas
+"""
+import argparse
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from timebase import epoch_ms_to_date_num
+
+MAGIC = b'ECAS'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIIq')
+ALIGNMENT = 8
+
+def _aligned(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def _bitmap_size(points):
+    return (points + 7) // 8
+
+def _layout(channels, names_size, points):
+    """(t_delta, values, alarms 구간 시작 위치, 파일 크기)"""
+    t_offset = _aligned(HEADER.size + names_size)
+    values_offset = _aligned(t_offset + 8 * points)
+    alarms_offset = _aligned(values_offset + 4 * channels * points)
+    return t_offset, values_offset, alarms_offset, _aligned(alarms_offset + channels * _bitmap_size(points))
+
+class SeriesFile:
+    """열린 .ecas 파일 (또는 bytes). 배열 속성은 모두 읽기 전용 view 이다."""
+
+    def __init__(self, buffer, path=None):
+        if len(buffer) < HEADER.size:
+            raise ValueError(f"{path or 'buffer'} is too short for an ECAS series file")
+        magic, version, _flags, channels, names_size, points = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path or 'buffer'} is not an ECAS series file")
+        if version != VERSION:
+            raise ValueError(f"Unsupported ECAS series version {version} in {path or 'buffer'}")
+
+        names = bytes(buffer[HEADER.size:HEADER.size + names_size]).decode('utf-8')
+        self.names = names.split('\n') if channels else []
+        t_offset, values_offset, alarms_offset, _ = _layout(channels, names_size, points)
+        self.t_delta = np.frombuffer(buffer, dtype='<i8', count=points, offset=t_offset)
+        self.values = np.frombuffer(buffer, dtype='<f4', count=channels * points, offset=values_offset)
+        self.values = self.values.reshape(channels, points)
+        row_size = _bitmap_size(points)
+        self.alarm_bits = np.frombuffer(buffer, dtype=np.uint8, count=channels * row_size, offset=alarms_offset)
+        self.alarm_bits = self.alarm_bits.reshape(channels, row_size)
+
+        self.path = path
+        self._buffer = buffer
+        self._t = None
+        self._x = None
+        self._index = {name: i for i, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.t_delta)
+
+    @property
+    def t(self):
+        """시점별 epoch ms (int64)"""
+        if self._t is None:
+            self._t = np.cumsum(self.t_delta)
+        return self._t
+
+    @property
+    def x(self):
+        """시점별 matplotlib 날짜 숫자 (float64, UTC 기준). 모든 채널이 공유한다."""
+        if self._x is None:
+            self._x = epoch_ms_to_date_num(self.t)
+        return self._x
+
+    def channel_index(self, channel):
+        """채널 이름 또는 번호를 번호로"""
+        if isinstance(channel, str):
+            try:
+                return self._index[channel]
+            except KeyError:
+                raise KeyError(f"No channel named {channel!r} in {self.path or 'buffer'}") from None
+        return channel
+
+    def alarm_mask(self, channel=0):
+        """채널의 시점별 알람 여부 (bool 배열)"""
+        row = self.alarm_bits[self.channel_index(channel)]
+        return np.unpackbits(row, count=len(self)).view(bool)
+
+    def chart_data(self, channel=0):
+        """mock_data.json 과 같은 키의 dict ({'t', 'v', 'a'}, 값은 NumPy 배열)
+
+        'x' / 'ax' 는 t / a 를 matplotlib 날짜 숫자로 바꾼 값. (ecas_chart 가 다시 변환하지 않고 그대로 쓴다)
+        """
+        index = self.channel_index(channel)
+        mask = self.alarm_mask(index)
+        return {'t': self.t, 'v': self.values[index], 'a': self.t[mask], 'x': self.x, 'ax': self.x[mask]}
+
+def open_series(path):
+    """.ecas 파일을 memmap 으로 연다. (파일 내용은 실제로 접근할 때 읽힌다)"""
+    return SeriesFile(np.memmap(path, dtype=np.uint8, mode='r'), path)
+
+class SeriesWriter:
+    """점 수를 미리 알고 있는 시계열을 앞에서부터 조각(chunk)으로 나눠 .ecas 파일에 쓴다.
+
+    파일을 전체 크기로 만든 뒤 memmap 으로 열어 조각을 제자리에 쓰므로, 메모리에는 조각 하나만 있으면 된다.
+    마지막 조각이 아니면 조각의 점 수는 8의 배수여야 한다. (알람 비트맵이 바이트 단위)
+    임시 파일에 쓰고 close() 에서 이름을 바꾸므로 읽는 쪽은 쓰는 도중의 파일을 보지 않는다.
+
+        with SeriesWriter('out.ecas', points, names) as writer:
+            for t, values, alarms in chunks:
+                writer.write(t, values, alarms)
+    """
+
+    def __init__(self, path, points, names):
+        names = [str(name) for name in names]
+        if any('\n' in name for name in names):
+            raise ValueError("channel names must not contain newlines")
+        encoded_names = '\n'.join(names).encode('utf-8')
+        self.path = path
+        self.points = points
+        self.channels = len(names)
+        self.position = 0
+        self._last_t = 0
+        t_offset, values_offset, alarms_offset, size = _layout(self.channels, len(encoded_names), points)
+
+        directory = os.path.dirname(path) or '.'
+        fd, self._tmp_path = tempfile.mkstemp(prefix='.ecas_series.', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, 0, self.channels, len(encoded_names), points))
+                f.write(encoded_names)
+                f.truncate(size)
+            self._buffer = np.memmap(self._tmp_path, dtype=np.uint8, mode='r+')
+        except BaseException:
+            os.remove(self._tmp_path)
+            raise
+        self._t_delta = np.frombuffer(self._buffer, dtype='<i8', count=points, offset=t_offset)
+        self._values = np.frombuffer(self._buffer, dtype='<f4', count=self.channels * points, offset=values_offset)
+        self._values = self._values.reshape(self.channels, points)
+        row_size = _bitmap_size(points)
+        self._alarm_bits = np.frombuffer(self._buffer, dtype=np.uint8, count=self.channels * row_size,
+                                         offset=alarms_offset).reshape(self.channels, row_size)
+
+    def write(self, t, values, alarms=None):
+        """다음 조각을 쓴다. t: (n,) epoch ms, values / alarms: (채널 수, n) 또는 채널이 하나면 (n,)"""
+        t = np.asarray(t, dtype=np.int64)
+        n = len(t)
+        if self.position % 8:
+            raise ValueError("only the last chunk may have a length that is not a multiple of 8")
+        if self.position + n > self.points:
+            raise ValueError(f"chunk overflows the series ({self.position} + {n} > {self.points} points)")
+        start, end = self.position, self.position + n
+        if n:
+            self._t_delta[start] = t[0] - self._last_t
+            np.subtract(t[1:], t[:-1], out=self._t_delta[start + 1:end])
+            self._last_t = int(t[-1])
+        self._values[:, start:end] = np.reshape(values, (self.channels, n))
+        if alarms is not None:
+            bits = np.packbits(np.reshape(np.asarray(alarms, dtype=bool), (self.channels, n)), axis=1)
+            self._alarm_bits[:, start // 8:start // 8 + bits.shape[1]] = bits
+        self.position = end
+
+    def close(self):
+        if self.position != self.points:
+            self.abort()
+            raise ValueError(f"only {self.position} of {self.points} points were written")
+        self._buffer.flush()
+        del self._t_delta, self._values, self._alarm_bits, self._buffer
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """쓰던 임시 파일을 지운다."""
+        self._buffer = None
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def write_series(path, t, values, alarms=None, names=None):
+    """시계열을 한 번에 .ecas 파일로 저장
+
+    t: epoch ms (길이 N), values: (N,) 또는 (채널 수, N), alarms: values 와 같은 모양의 bool (없으면 알람 없음)
+    """
+    t = np.asarray(t, dtype=np.int64)
+    values = np.asarray(values, dtype='<f4')
+    if values.ndim == 1:
+        values = values.reshape(1, -1)
+    channels, points = values.shape
+    if t.shape != (points,):
+        raise ValueError(f"t has {t.size} points but values have {points}")
+    if names is None:
+        names = [str(i) for i in range(channels)]
+    if len(names) != channels:
+        raise ValueError(f"{len(names)} names for {channels} channels")
+    with SeriesWriter(path, points, names) as writer:
+        writer.write(t, values, alarms)
+
+def alarm_mask_from_times(t, alarm_times):
+    """알람 시간(ms) 목록을 시점별 bool 배열로. 시점에 없는 알람 시간이 있으면 ValueError."""
+    t = np.asarray(t, dtype=np.int64)
+    alarm_times = np.asarray(alarm_times, dtype=np.int64)
+    missing = np.count_nonzero(~np.isin(alarm_times, t))
+    if missing:
+        raise ValueError(f"{missing} alarm times do not match any sample time")
+    return np.isin(t, alarm_times)
+
+def json_values(values, digits=6):
+    """값 배열을 JSON 목록으로 (소수 digits 자리). NaN 은 표준 JSON 이 아니므로 None(null)으로 쓴다."""
+    values = np.round(np.asarray(values, dtype=np.float64), digits)
+    return [None if missing else value for value, missing in zip(values.tolist(), np.isnan(values).tolist())]
+
+def _values_from_json(values):
+    """JSON 의 값 목록을 float64 배열로 (null 은 NaN)"""
+    return np.asarray([np.nan if value is None else value for value in values], dtype=np.float64)
+
+def import_json(json_path, path, name='v'):
+    """mock_data.json 형식의 파일을 단일 채널 .ecas 로 변환"""
+    with open(json_path, 'r') as f:
+        data = json.load(f)
+    t = np.asarray(data['t'], dtype=np.int64)
+    write_series(path, t, _values_from_json(data['v']), alarm_mask_from_times(t, data['a']), names=[name])
+
+def export_json(path, json_path, channel=0):
+    """.ecas 파일의 한 채널을 mock_data.json 형식으로 저장 (값은 float32 정밀도, 값이 없으면 null)"""
+    data = open_series(path).chart_data(channel)
+    with open(json_path, 'w') as f:
+        json.dump({
+            'a': data['a'].tolist(),
+            'v': json_values(data['v']),
+            't': data['t'].tolist(),
+        }, f, indent=2, allow_nan=False)
+
+def load_chart_data(path, channel=0):
+    """차트 스크립트용: .ecas 또는 예전 .json 파일을 읽어 {'t', 'v', 'a', 'x', 'ax'} (NumPy 배열)로 반환"""
+    if path.endswith('.json'):
+        with open(path, 'r') as f:
+            data = json.load(f)
+        t = np.asarray(data['t'], dtype=np.int64)
+        a = np.asarray(data['a'], dtype=np.int64)
+        return {
+            't': t,
+            'v': _values_from_json(data['v']),
+            'a': a,
+            'x': epoch_ms_to_date_num(t),
+            'ax': epoch_ms_to_date_num(a),
+        }
+    return open_series(path).chart_data(channel)
+
+def main():
+    parser = argparse.ArgumentParser(description="ECAS 시계열 바이너리 파일 변환")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help="mock_data.json -> .ecas")
+    import_parser.add_argument('json_path')
+    import_parser.add_argument('path')
+    export_parser = subparsers.add_parser('export', help=".ecas -> mock_data.json")
+    export_parser.add_argument('path')
+    export_parser.add_argument('json_path')
+    export_parser.add_argument('--channel', default='0', help="채널 이름 또는 번호")
+    info_parser = subparsers.add_parser('info', help="파일 정보 출력")
+    info_parser.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        import_json(args.json_path, args.path)
+        print(f"'{args.json_path}' -> '{args.path}'")
+    elif args.command == 'export':
+        channel = int(args.channel) if args.channel.isdigit() else args.channel
+        export_json(args.path, args.json_path, channel)
+        print(f"'{args.path}' -> '{args.json_path}'")
+    else:
+        series = open_series(args.path)
+        t = series.t
+        print(f"channels: {len(series.names)}, points: {len(series)}, "
+              f"alarms: {int(np.unpackbits(series.alarm_bits).sum())}")
+        if len(series):
+            print(f"time range (ms): {t[0]} ~ {t[-1]}")
+
+if __name__ == "__main__":
+    main()
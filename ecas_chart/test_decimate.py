@@ -0,0 +1,96 @@
+"""
+decimate.py 테스트: 솎아낸 결과의 픽셀 열별 envelope 를 원본과 비교하고 LTTB 의 점 선택 규칙을 확인한다.
+
+    python -m pytest ecas_chart/test_decimate.py
+"""
+import numpy as np
+import pytest
+
+from decimate import MODES, _nan_run_starts, check_envelope, decimate, lttb_indices, minmax_indices, pixel_bins
+
+BUCKETS = 1050   # 12 inch x 100 dpi 차트의 axes 폭 정도
+
+@pytest.fixture(scope='module')
+def year_series():
+    """1년치 5분 간격 값 (랜덤 워크 + 잡음 + 스파이크, NaN 구간 하나)"""
+    rng = np.random.default_rng(0)
+    points = 365 * 288
+    x = 20000 + np.arange(points) / 288
+    y = 7.0 + np.cumsum(rng.normal(0, 0.01, points)) + rng.normal(0, 0.08, points)
+    spikes = rng.choice(points, 20, replace=False)
+    y[spikes] += rng.choice([-1, 1], 20) * rng.uniform(1, 2, 20)
+    y[5000:5030] = np.nan
+    return x, y
+
+def with_gaps(points=20000, gaps=((0, 10), (3000, 3100), (9000, 9001), (19990, 20000))):
+    """처음/중간/끝에 NaN 구간이 있는 값"""
+    x = np.arange(points, dtype=np.float64)
+    y = np.sin(x / 50) + np.random.default_rng(1).normal(0, 0.1, points)
+    for start, end in gaps:
+        y[start:end] = np.nan
+    return x, y
+
+def test_minmax_keeps_exact_envelope(year_series):
+    x, y = year_series
+    count, error, peaks = check_envelope(x, y, BUCKETS, 'minmax')
+    assert error == 0.0
+    assert peaks == 1.0
+    assert count <= 2 * BUCKETS + 2 + len(_nan_run_starts(y))
+
+def test_lttb_envelope_is_bounded(year_series):
+    x, y = year_series
+    count, error, peaks = check_envelope(x, y, BUCKETS, 'lttb')
+    assert count <= BUCKETS + 2 + len(_nan_run_starts(y))
+    # 구간마다 한 점이라 envelope 는 좁아지지만 값 범위를 벗어나지는 않는다
+    assert 0.0 <= error < 1.0
+
+def test_lttb_invariants(year_series):
+    x, y = year_series
+    indices = lttb_indices(x, y, BUCKETS)
+    valid = np.flatnonzero(~np.isnan(y))
+    nan_starts = _nan_run_starts(y)
+    assert indices[0] == valid[0] and indices[-1] == valid[-1]
+    assert len(indices) <= BUCKETS + 2 + len(nan_starts)
+    assert np.all(np.diff(indices) > 0)
+    assert np.isin(nan_starts, indices).all()
+
+@pytest.mark.parametrize('mode', MODES)
+def test_empty_input(mode):
+    dx, dy = decimate(np.array([], dtype=np.float64), np.array([], dtype=np.float64), BUCKETS, mode)
+    assert len(dx) == 0 and len(dy) == 0
+
+@pytest.mark.parametrize('mode', MODES + (None,))
+@pytest.mark.parametrize('points', [1, 2, 100, 2 * BUCKETS])
+def test_short_input_is_unchanged(mode, points):
+    x = np.arange(points, dtype=np.float64)
+    y = np.cos(x)
+    y[points // 2] = np.nan
+    dx, dy = decimate(x, y, BUCKETS, mode)
+    np.testing.assert_array_equal(dx, x)
+    np.testing.assert_array_equal(dy, y)
+
+@pytest.mark.parametrize('mode', MODES)
+def test_nan_gaps_are_kept_as_breaks(mode):
+    x, y = with_gaps()
+    dx, dy = decimate(x, y, 100, mode)
+    assert np.all(np.diff(dx) > 0)
+    # 원본의 NaN 구간마다 결과에도 그 구간 시작 위치의 NaN 점이 남는다
+    nan_x = x[_nan_run_starts(y)]
+    assert np.isin(nan_x, dx[np.isnan(dy)]).all()
+    # NaN 이 아닌 점은 원본의 점 그대로다
+    kept = ~np.isnan(dy)
+    np.testing.assert_array_equal(dy[kept], y[np.searchsorted(x, dx[kept])])
+
+@pytest.mark.parametrize('mode', MODES)
+def test_all_nan_input(mode):
+    x = np.arange(5000, dtype=np.float64)
+    y = np.full(5000, np.nan)
+    dx, dy = decimate(x, y, 100, mode)
+    np.testing.assert_array_equal(dx, [0.0])
+    assert np.isnan(dy).all()
+
+def test_minmax_with_precomputed_bins(year_series):
+    x, y = year_series
+    np.testing.assert_array_equal(
+        minmax_indices(x, y, BUCKETS, pixel_bins(x, BUCKETS)), minmax_indices(x, y, BUCKETS)
+    )
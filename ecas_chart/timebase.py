@@ -0,0 +1,104 @@
+"""
+차트용 시간 변환 (epoch ms <-> matplotlib 날짜 숫자, 현지 시간 <-> UTC)
+
+차트의 x 값은 UTC 기준 matplotlib 날짜 숫자(1970-01-01 부터의 일 수)로 두고, 시간대는 눈금 라벨을 만드는
+DateFormatter(tz=...) 에만 지정한다. 그래서 데이터 배열은 시간대 변환 없이
+    x = t_ms / 86400000 + (1970-01-01 - matplotlib epoch)
+한 번의 곱셈/덧셈으로 끝나고, DST 가 있는 시간대도 눈금마다 올바른 오프셋으로 표시된다.
+(pandas 의 tz_localize / tz_convert 후 date2num 을 다시 하는 여러 번의 배열 복사가 필요 없다)
+
+DB 의 tm 처럼 현지 시간으로 저장된 값을 UTC 로 바꿀 때(local_to_epoch_ms)는
+- DST 가 없는 시간대(Asia/Seoul 등): 고정 오프셋을 빼는 것으로 끝
+- DST 가 있는 시간대: 시간(hour)별 오프셋 표를 한 번 만들고 배열 인덱싱으로 적용
+"""
+import datetime
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+MS_PER_HOUR = 3_600_000
+MS_PER_DAY = 86_400_000
+# DST 시간대에서 시간별 오프셋 표를 만들 최대 시간 수 (이보다 넓은 범위는 나오는 시간만 따로 구함)
+MAX_OFFSET_TABLE_HOURS = 24 * 366 * 5
+
+def _epoch_shift_days():
+    """1970-01-01 과 matplotlib 날짜 epoch (mdates.get_epoch()) 의 차이 (일)"""
+    import matplotlib.dates as mdates  # ecas_series 는 matplotlib 없이도 쓰므로 여기서만 import
+
+    epoch = np.datetime64(mdates.get_epoch(), 'ms')
+    return float((np.datetime64(0, 'ms') - epoch).astype(np.int64)) / MS_PER_DAY
+
+def epoch_ms_to_date_num(t_ms):
+    """UTC epoch ms 배열을 matplotlib 날짜 숫자 (float64 배열)로"""
+    x = np.asarray(t_ms, dtype=np.float64) / MS_PER_DAY
+    shift = _epoch_shift_days()
+    if shift:
+        x += shift
+    return x
+
+@lru_cache(maxsize=None)
+def fixed_offset_ms(tz, year_from, year_to):
+    """year_from ~ year_to 동안 UTC 오프셋이 바뀌지 않으면 그 오프셋(ms), 바뀌면 None
+
+    DST 가 있는 시간대는 1월과 7월의 오프셋이 다르므로 해마다 두 시점만 비교한다.
+    """
+    zone = ZoneInfo(tz)
+    offsets = {
+        zone.utcoffset(datetime.datetime(year, month, 1))
+        for year in range(year_from, year_to + 1) for month in (1, 7)
+    }
+    if len(offsets) != 1:
+        return None
+    return int(offsets.pop().total_seconds() * 1000)
+
+def _year_range(t_ms):
+    """t_ms 가 걸친 연도 (앞뒤로 한 해씩 여유: 현지 시각과 UTC 가 연도 경계에서 어긋나는 경우)"""
+    years = np.array([t_ms.min(), t_ms.max()]).astype('datetime64[ms]').astype('datetime64[Y]').astype(np.int64) + 1970
+    return max(int(years[0]) - 1, datetime.MINYEAR), min(int(years[1]) + 1, datetime.MAXYEAR)
+
+def _hourly_offsets(hours, tz, local):
+    """hours(epoch 기준 시간 번호 배열)마다 UTC 오프셋(ms). local 이면 hours 를 현지 시각으로 본다."""
+    zone = ZoneInfo(tz)
+    offsets = np.empty(len(hours), dtype=np.int64)
+    for i, hour in enumerate(hours.tolist()):
+        if local:
+            moment = datetime.datetime(1970, 1, 1) + datetime.timedelta(hours=hour)
+            offset = zone.utcoffset(moment)
+        else:
+            offset = datetime.datetime.fromtimestamp(hour * 3600, datetime.timezone.utc).astimezone(zone).utcoffset()
+        offsets[i] = int(offset.total_seconds() * 1000)
+    return offsets
+
+def _offsets(t_ms, tz, local):
+    """t_ms 각각의 UTC 오프셋(ms) 배열. 고정 오프셋이면 스칼라."""
+    fixed = fixed_offset_ms(tz, *_year_range(t_ms))
+    if fixed is not None:
+        return fixed
+    hours = t_ms // MS_PER_HOUR
+    first, last = int(hours.min()), int(hours.max())
+    if last - first + 1 <= MAX_OFFSET_TABLE_HOURS:
+        table = _hourly_offsets(np.arange(first, last + 1), tz, local)
+        return table[hours - first]
+    unique_hours, inverse = np.unique(hours, return_inverse=True)
+    return _hourly_offsets(unique_hours, tz, local)[inverse.reshape(-1)]
+
+def local_to_epoch_ms(local_ms, tz):
+    """tz 현지 시각(1970-01-01 부터의 ms, 또는 naive datetime64 배열)을 UTC epoch ms 로
+
+    DST 로 같은 현지 시각이 두 번 있는 경우에는 앞의 것(fold=0)으로 본다.
+    """
+    local_ms = np.asarray(local_ms)
+    if np.issubdtype(local_ms.dtype, np.datetime64):
+        local_ms = local_ms.astype('datetime64[ms]').astype(np.int64)
+    local_ms = local_ms.astype(np.int64, copy=False)
+    if not len(local_ms):
+        return local_ms
+    return local_ms - _offsets(local_ms, tz, local=True)
+
+def epoch_ms_to_local_ms(t_ms, tz):
+    """UTC epoch ms 를 tz 현지 시각(1970-01-01 부터의 ms)으로 (일 단위 집계 등 현지 날짜가 필요할 때)"""
+    t_ms = np.asarray(t_ms, dtype=np.int64)
+    if not len(t_ms):
+        return t_ms
+    return t_ms + _offsets(t_ms, tz, local=False)
@@ -1,70 +1,199 @@
+# ECAS 차트용 mock 데이터(5분 간격 값, PM 구간, 알람)를 만들어 .ecas 바이너리 파일로 저장한다.
+# .ecas 읽기/쓰기(ecas_series.py)는 차트 쪽과 같이 쓰기 위해 ../ecas_chart 에 있다. 패키지가 아니므로
+# 이 파일 위치 기준으로 ../ecas_chart 를 sys.path 에 더해 import 한다. (make_mock 과 ecas_chart 가
+# 저장소에서처럼 나란히 있어야 하고, 이 파일만 따로 복사하면 실행되지 않는다)
+#
+#   python make_atlas_ecas.py --days 30 --channels 100 --output mock_data.ecas --json
+#   python make_atlas_ecas.py --benchmark --days 365 --channels 1000
+import argparse
 import datetime
+import os
+import sys
 import time
-import random
-import json
 
-def create_mock_data():
+import numpy as np
+
+# 바이너리 시계열 포맷은 ecas_chart 에 있다.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ecas_chart"))
+import ecas_series
+
+INTERVAL_MS = 5 * 60 * 1000   # 5분 간격
+DAY_MS = 24 * 60 * 60 * 1000
+CHUNK_POINTS = 4096           # 한 번에 만드는 시점 수 (8의 배수: ecas_series.SeriesWriter 의 알람 비트맵 단위)
+
+# --- 신호 모델 (채널마다) ---
+# 값 = 기준값 + 드리프트/계단 변화(누적) + 하루 주기 변동 + 잡음, PM 중에는 값 없음(NaN)
+LEVEL_RANGE = (6.9, 7.2)      # 채널별 기준값
+DRIFT_SIGMA = 0.002           # 시점마다 누적되는 드리프트 (랜덤 워크)
+STEP_PROBABILITY = 1 / 2000   # 시점마다 계단 변화(조건 변경)가 생길 확률
+STEP_SIGMA = 0.08
+DAILY_AMPLITUDE = 0.1
+NOISE_SIGMA = 0.08
+PM_PROBABILITY = 1 / 4000     # 시점마다 PM 이 시작될 확률 (약 2주에 한 번)
+PM_DURATION_POINTS = (6, 37)  # PM 길이 (30분 ~ 3시간). PM 이 끝나면 드리프트/계단 변화가 0 으로 돌아간다.
+ALARM_PROBABILITY = 1 / 3     # 무작위 알람 확률 (예전 mock 데이터와 같은 밀도)
+SPEC_LIMIT = 0.45             # 기준값에서 이만큼 벗어나면 항상 알람
+
+def mock_time_range(days=2, end_time=None):
+  """(시작, 끝) epoch ms. 시작은 days 일 전 00시 04분 59초, 끝은 현재 시간"""
+  end_time = end_time or datetime.datetime.now()
+  start_time = end_time - datetime.timedelta(days=days)
+  start_time = start_time.replace(hour=0, minute=4, second=59, microsecond=0)
+  return int(start_time.timestamp() * 1000), int(end_time.timestamp() * 1000)
+
+def count_points(start_ms, end_ms):
+  return (end_ms - start_ms) // INTERVAL_MS + 1
+
+def sparse_events(rng, channels, n, probability):
+  """(channels, n) 시점 중 probability 확률로 일어나는 드문 사건의 (행, 열) 위치.
+  시점마다 난수를 뽑지 않고 사건 수를 먼저 정한 뒤 위치만 뽑는다. (겹치는 위치는 하나로 본다)
+  """
+  count = rng.binomial(channels * n, probability)
+  positions = np.unique(rng.integers(0, channels * n, size=count))
+  return np.divmod(positions, n)
+
+def generate_mock_chunks(start_ms, end_ms, channels=1, seed=None, chunk_points=CHUNK_POINTS):
   """
-  - v, t: 2일 전부터 현재까지 5분 간격의 값과 시간
-  - a: 약 1/3 확률로 발생하는 알람 시간
+  start_ms ~ end_ms 를 5분 간격으로 나눈 시점에 대해 (t, v, a) 조각을 차례로 만든다.
+  - t: (n,) int64 epoch ms
+  - v: (channels, n) float32 값 (PM 중에는 NaN)
+  - a: (channels, n) bool 알람 여부
+  같은 seed 이면 같은 데이터가 나온다. 메모리에는 조각 하나(channels x chunk_points)만 있으므로
+  기간이 아무리 길어도 파일이나 DB 로 바로 흘려보낼 수 있다.
   """
-  # --- 1. 시간 설정 ---
-  # 현재 시간
-  end_time = datetime.datetime.now()
+  rng = np.random.default_rng(seed)
+  total = count_points(start_ms, end_ms)
+  level = rng.uniform(*LEVEL_RANGE, size=(channels, 1)).astype(np.float32)
+  phase = rng.uniform(0, 2 * np.pi, size=(channels, 1))
+  # 하루 주기 변동 sin(wt + phase) = sin(wt)cos(phase) + cos(wt)sin(phase): 채널 x 시점마다 sin 을 계산하지 않는다.
+  daily_cos = (DAILY_AMPLITUDE * np.cos(phase)).astype(np.float32)
+  daily_sin = (DAILY_AMPLITUDE * np.sin(phase)).astype(np.float32)
+  rows = np.arange(channels)
 
-  # 시작 시간: 2일 전 00시 04분 59초
-  start_time = end_time - datetime.timedelta(days=2)
-  start_time = start_time.replace(hour=0, minute=4, second=59, microsecond=0)
+  # 조각 사이에 이어지는 상태
+  offset = np.zeros(channels, dtype=np.float32)       # 누적 드리프트/계단 변화
+  pm_remaining = np.zeros(channels, dtype=np.int64)  # 다음 조각까지 이어지는 PM 시점 수
 
-  # 5분 간격 설정
-  time_interval = datetime.timedelta(minutes=5)
+  for start in range(0, total, chunk_points):
+    n = min(chunk_points, total - start)
+    t = start_ms + np.arange(start, start + n, dtype=np.int64) * INTERVAL_MS
 
-  # --- 2. 데이터 구조 초기화 ---
-  mock_data = {
-    "a": [], # 알람 시간 (ms)
-    "v": [], # 값 (6.5-7.6 사이의 랜덤 값)
-    "t": []  # 시간 (ms)
-  }
+    # 1. PM 구간: 시작 위치에 +1, 끝 위치에 -1 을 더한 뒤 누적합이 양수인 곳
+    start_rows, start_cols = sparse_events(rng, channels, n, PM_PROBABILITY)
+    pm_start = np.zeros((channels, n), dtype=bool)
+    pm_start[start_rows, start_cols] = True
+    pm_end = start_cols + rng.integers(*PM_DURATION_POINTS, size=len(start_cols))
+    marks = np.zeros((channels, n + 1), dtype=np.int32)
+    np.add.at(marks, (start_rows, start_cols), 1)
+    np.add.at(marks, (start_rows, np.minimum(pm_end, n)), -1)
+    carried = pm_remaining > 0
+    marks[carried, 0] += 1
+    np.add.at(marks, (rows[carried], np.minimum(pm_remaining[carried], n)), -1)
+    in_pm = np.cumsum(marks[:, :n], axis=1) > 0
+    pm_remaining = np.maximum(pm_remaining - n, 0)
+    np.maximum.at(pm_remaining, start_rows, pm_end - n)
+
+    # 2. 드리프트 + 계단 변화의 누적합. PM 이 시작된 곳에서 0 으로 되돌린다.
+    increments = rng.standard_normal((channels, n), dtype=np.float32)
+    increments *= DRIFT_SIGMA
+    step_rows, step_cols = sparse_events(rng, channels, n, STEP_PROBABILITY)
+    np.add.at(increments, (step_rows, step_cols), rng.normal(0.0, STEP_SIGMA, size=len(step_cols)))
+    drift = np.cumsum(increments, axis=1)
+    drift += offset[:, None]
+    reset_rows = np.unique(start_rows)
+    if len(reset_rows):
+      reset_at = np.maximum.accumulate(np.where(pm_start[reset_rows], np.arange(n), -1), axis=1)
+      reset_base = np.take_along_axis(drift[reset_rows], np.maximum(reset_at, 0), axis=1)
+      drift[reset_rows] -= np.where(reset_at >= 0, reset_base, 0)
+    offset = drift[:, -1].copy()
+
+    # 3. 값과 알람
+    day_angle = 2 * np.pi * (t % DAY_MS) / DAY_MS
+    v = rng.standard_normal((channels, n), dtype=np.float32)
+    v *= NOISE_SIGMA
+    v += drift
+    v += level
+    v += daily_cos * np.sin(day_angle).astype(np.float32)
+    v += daily_sin * np.cos(day_angle).astype(np.float32)
+    a = (rng.random((channels, n), dtype=np.float32) < ALARM_PROBABILITY) | (np.abs(v - level) > SPEC_LIMIT)
+    a &= ~in_pm
+    v[in_pm] = np.nan
+    yield t, v, a
 
-  # --- 3. 데이터 생성 루프 ---
-  current_time = start_time
-  while current_time <= end_time:
-    # 밀리초 단위 timestamp 생성
-    js_timestamp = int(current_time.timestamp() * 1000)
+def create_mock_data(days=2, seed=None):
+  """
+  - v, t: days 일 전부터 현재까지 5분 간격의 값과 시간 (채널 하나)
+  - a: 알람 시간 (약 1/3 확률 + 기준값에서 크게 벗어난 시점)
+  예전 mock_data.json 과 같은 형태의 dict 를 반환한다. (값은 소수 6자리, PM 중이면 None: JSON 의 null)
+  """
+  start_ms, end_ms = mock_time_range(days)
+  chunks = list(generate_mock_chunks(start_ms, end_ms, seed=seed))
+  t = np.concatenate([chunk[0] for chunk in chunks])
+  v = np.concatenate([chunk[1][0] for chunk in chunks]).astype(np.float64)
+  a = np.concatenate([chunk[2][0] for chunk in chunks])
+  return {
+    "a": t[a].tolist(), # 알람 시간 (ms)
+    "v": ecas_series.json_values(v), # 값
+    "t": t.tolist()  # 시간 (ms)
+  }
 
-    # 'v'와 't' 데이터 추가 (매 5분마다 항상 생성)
-    # value = random.uniform(6.5, 7.6)
-    value = round(random.uniform(6.5, 7.6), 6)
-    mock_data["v"].append(value)
-    mock_data["t"].append(js_timestamp)
+def write_mock_series(path, days=2, channels=1, seed=None):
+  """mock 데이터를 조각 단위로 바로 .ecas 파일에 쓰고 (시점 수, 알람 수)를 반환"""
+  start_ms, end_ms = mock_time_range(days)
+  names = [f"EQP-{i + 1:03d}" for i in range(channels)] if channels > 1 else ["v"]
+  alarm_count = 0
+  with ecas_series.SeriesWriter(path, count_points(start_ms, end_ms), names) as writer:
+    for t, v, a in generate_mock_chunks(start_ms, end_ms, channels, seed):
+      writer.write(t, v, a)
+      alarm_count += int(np.count_nonzero(a))
+  return writer.points, alarm_count
 
-    # 'a' 데이터 추가 (약 1/3 확률로 생성)
-    if random.randint(1, 3) == 1:
-      mock_data["a"].append(js_timestamp)
+def run_benchmark(path, days=365, channels=1000, seed=0):
+  """days 일 x channels 채널 생성 시간 (생성만 / .ecas 파일 쓰기까지)"""
+  start_ms, end_ms = mock_time_range(days)
+  points = count_points(start_ms, end_ms)
+  print(f"Benchmark: {days} days x {channels} channels = {points * channels:,} points")
 
-    # 다음 시간으로 5분 증가
-    current_time += time_interval
+  started = time.perf_counter()
+  for _ in generate_mock_chunks(start_ms, end_ms, channels, seed):
+    pass
+  elapsed = time.perf_counter() - started
+  print(f"  generate only : {elapsed:.2f} s ({points * channels / elapsed / 1e6:.1f} M points/s)")
 
-  return mock_data
+  started = time.perf_counter()
+  write_mock_series(path, days, channels, seed)
+  elapsed = time.perf_counter() - started
+  print(f"  write .ecas   : {elapsed:.2f} s ({os.path.getsize(path) / 1e6:.0f} MB, '{path}')")
 
-# --- 4. JSON으로 변환하여 출력 ---
+# --- 4. 파일로 저장 ---
 if __name__ == "__main__":
-  # MockData 생성
-  chart_data = create_mock_data()
-
-  # JSON 문자열로 변환 (보기 좋게 indent 적용)
-  json_data = json.dumps(chart_data, indent=2)
+  parser = argparse.ArgumentParser(description="ECAS 차트용 mock 데이터 생성")
+  parser.add_argument("--output", default="mock_data.ecas", help="바이너리 시계열 파일 (ecas_chart/ecas_series.py 포맷)")
+  parser.add_argument("--days", type=int, default=None, help="생성 기간 (일, 기본 2. --benchmark 이면 기본 365)")
+  parser.add_argument("--channels", type=int, default=None, help="채널(설비) 수 (기본 1. --benchmark 이면 기본 1000)")
+  parser.add_argument("--seed", type=int, default=None, help="같은 데이터를 다시 만들 때 사용")
+  parser.add_argument("--json", action="store_true", help="예전 형식의 JSON 도 --output 과 같은 이름의 .json 으로 함께 저장 (첫 채널)")
+  parser.add_argument("--benchmark", action="store_true", help="--days x --channels 생성 시간 측정")
+  args = parser.parse_args()
 
-  # 결과 출력
-  print(json_data)
+  if args.benchmark:
+    run_benchmark(args.output, args.days or 365, args.channels or 1000, 0 if args.seed is None else args.seed)
+    sys.exit(0)
+  args.days = args.days or 2
+  args.channels = args.channels or 1
 
-  # 파일로 저장
-  with open("mock_data.json", "w") as f:
-    f.write(json_data)
+  # 바이너리 포맷으로 저장 (알람은 시점별 비트맵)
+  points, alarm_count = write_mock_series(args.output, args.days, args.channels, args.seed)
+  print(f"Mock data has been created and saved to '{args.output}'.")
 
-  print("Mock data has been created and saved to 'mock_data.json'.")
+  if args.json:
+    # 방금 쓴 .ecas 의 첫 채널을 예전 mock_data.json 형식으로 내보낸다. (PM 중 값은 null)
+    json_path = os.path.splitext(args.output)[0] + ".json"
+    ecas_series.export_json(args.output, json_path)
+    print(f"Mock data has also been saved to '{json_path}'.")
 
   # 생성된 데이터 개수 확인 (참고용)
   print("\n--- Data Counts ---")
-  print(f"Value/Time points (v, t): {len(chart_data['v'])}")
-  print(f"Alarm points (a): {len(chart_data['a'])}")
+  print(f"Channels: {args.channels}")
+  print(f"Value/Time points (v, t): {points}")
+  print(f"Alarm points (a): {alarm_count}")
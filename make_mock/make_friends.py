@@ -1,51 +1,195 @@
-# iyagibox 에서 python 을 이용하여 mock.json 을 만들기.
-from faker import Faker
-import pandas as pd
-
-# Faker 초기화
-fake = Faker("ko_KR")
-
-# 데이터 생성 함수
-def generate_fake_data(num_records):
-  data = []
-  for idx in range(num_records):
-    person = {
-      "_id": idx + 1,
-      "avatar_nm": fake.name(),
-      "age": fake.random_int(min=18, max=99),
-      "address": fake.address(),
-      "email": fake.email(),
-      "phone_number": fake.phone_number(),
-      "job": fake.job(),
-      "company": fake.company(),
-      "birthdate": fake.date_of_birth(minimum_age=18, maximum_age=99).isoformat(),
-      "gender": fake.random_element(elements=["M", "F"]),
-      "status": fake.random_element(elements=["on", "off"]),
-      "region": fake.random_element(elements=["02", "051", "032", "042", "053", "062", "052", "031", "033", "041", "061", "055", "064"]),
-      # "last_activity_time": fake.date_time_between(start_date="-1y", end_date="now").isoformat()
-      "last_activity_time": fake.date_time_between(start_date="-1y", end_date="-1d").isoformat()
-    }
-    data.append(person)
-  return data
-
-# 메인 스크립트
-def main():
-  # num_people = 10_000 # 생성할 사람의 수
-  num_people = 100_000 # 생성할 사람의 수
-  print(f"{num_people}명의 데이터를 생성 중...")
-
-  # 가짜 데이터 생성
-  fake_data = generate_fake_data(num_people)
-
-  # Pandas DataFrame 생성
-  df = pd.DataFrame(fake_data)
-
-  # JSON 파일로 저장
-  # output_file = "fake_people_data.json"
-  output_file = "fake_people_data_10.json"
-  df.to_json(output_file, orient="records", indent=4, force_ascii=False)
-
-  print(f"데이터가 JSON 파일로 저장되었습니다: {output_file}")
-
-if __name__ == "__main__":
-  main()
+# iyagibox 에서 python 을 이용하여 mock.json 을 만들기.
+# 레코드 범위를 CHUNK_SIZE 개씩 나눠 프로세스 풀에서 만들고, 끝난 조각부터 순서대로 파일에 이어 쓴다.
+# 조각마다 (seed, 조각 번호) 로 Faker / NumPy 난수를 초기화하므로 워커 수와 관계없이 같은 seed 면 같은 파일이 나온다.
+#
+#   python make_friends.py --records 10000000 --output fake_people.parquet
+#   python make_friends.py --records 100000 --output fake_people_data_10.jsonl --seed 1
+import argparse
+import datetime
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from faker import Faker
+
+CHUNK_SIZE = 10_000
+# 한 번에 풀에 넣어 두는 조각 수 (워커 수 x 이 값). 파일 쓰기가 밀려도 메모리가 늘지 않도록 제한한다.
+PENDING_CHUNKS_PER_WORKER = 2
+
+FIELDS = [
+  "_id", "avatar_nm", "age", "address", "email", "phone_number", "job", "company",
+  "birthdate", "gender", "status", "region", "last_activity_time",
+]
+# Faker 를 거치지 않고 NumPy 로 한 번에 뽑는 값
+GENDERS = np.array(["M", "F"])
+STATUSES = np.array(["on", "off"])
+REGIONS = np.array(["02", "051", "032", "042", "053", "062", "052", "031", "033", "041", "061", "055", "064"])
+AGE_RANGE = (18, 99)
+SECONDS_PER_DAY = 24 * 60 * 60
+
+# 워커 프로세스마다 하나씩 만드는 Faker (생성 비용이 커서 조각마다 만들지 않는다)
+_fake = None
+
+def _init_worker():
+  global _fake
+  _fake = Faker("ko_KR")
+
+def chunk_seed(seed, chunk_index):
+  """조각별 Faker seed (seed 와 조각 번호로 정해진다)"""
+  return int(np.random.SeedSequence([seed, chunk_index]).generate_state(1)[0])
+
+# 데이터 생성 함수
+def generate_chunk(chunk_index, start, stop, seed, base_date):
+  """_id 가 start + 1 ~ stop 인 레코드를 컬럼별로 만든다. (범주형 값은 코드 배열, 날짜는 ISO 문자열)
+
+  생년월일 / 마지막 활동 시간은 '오늘' 대신 base_date 를 기준으로 하므로 실행한 날짜와 관계없이 같다.
+  """
+  n = stop - start
+  rng = np.random.default_rng([seed, chunk_index])
+  fake = _fake or Faker("ko_KR")
+  fake.seed_instance(chunk_seed(seed, chunk_index))
+
+  birth_days = rng.integers(AGE_RANGE[0] * 365, (AGE_RANGE[1] + 1) * 365, size=n)
+  birthdate = np.datetime64(base_date, "D") - birth_days.astype("timedelta64[D]")
+  activity_seconds = rng.integers(SECONDS_PER_DAY, 365 * SECONDS_PER_DAY, size=n)
+  last_activity_time = np.datetime64(base_date, "s") - activity_seconds.astype("timedelta64[s]")
+  return {
+    "_id": np.arange(start + 1, stop + 1),
+    "avatar_nm": [fake.name() for _ in range(n)],
+    "age": rng.integers(AGE_RANGE[0], AGE_RANGE[1] + 1, size=n),
+    "address": [fake.address() for _ in range(n)],
+    "email": [fake.email() for _ in range(n)],
+    "phone_number": [fake.phone_number() for _ in range(n)],
+    "job": [fake.job() for _ in range(n)],
+    "company": [fake.company() for _ in range(n)],
+    "birthdate": np.datetime_as_string(birthdate),
+    "gender": rng.integers(0, len(GENDERS), size=n),
+    "status": rng.integers(0, len(STATUSES), size=n),
+    "region": rng.integers(0, len(REGIONS), size=n),
+    "last_activity_time": np.datetime_as_string(last_activity_time),
+  }
+
+def encode_json_records(columns):
+  """조각을 레코드 하나당 JSON 한 줄의 목록으로"""
+  values = dict(columns)
+  values["gender"] = GENDERS[columns["gender"]]
+  values["status"] = STATUSES[columns["status"]]
+  values["region"] = REGIONS[columns["region"]]
+  rows = zip(*(values[field].tolist() if isinstance(values[field], np.ndarray) else values[field]
+               for field in FIELDS))
+  return [json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) for row in rows]
+
+def to_arrow_table(columns):
+  """조각을 pyarrow Table 로. 범주형 값은 코드 배열 그대로 dictionary 컬럼이 된다."""
+  import pyarrow as pa  # parquet 출력에서만 필요
+
+  arrays = {}
+  for field in FIELDS:
+    if field in ("gender", "status", "region"):
+      dictionary = {"gender": GENDERS, "status": STATUSES, "region": REGIONS}[field]
+      arrays[field] = pa.DictionaryArray.from_arrays(columns[field].astype(np.int8), dictionary.tolist())
+    else:
+      arrays[field] = pa.array(columns[field])
+  return pa.table(arrays)
+
+def make_chunk(chunk_index, start, stop, seed, base_date, output_format):
+  """워커에서 실행: 조각을 만들어 바로 쓸 수 있는 형태로 반환 (json/jsonl 은 문자열, parquet 은 Table)"""
+  columns = generate_chunk(chunk_index, start, stop, seed, base_date)
+  if output_format == "parquet":
+    return to_arrow_table(columns)
+  records = encode_json_records(columns)
+  if output_format == "jsonl":
+    return "\n".join(records) + "\n"
+  return ",\n".join(records)
+
+class ChunkWriter:
+  """make_chunk() 결과를 순서대로 파일에 이어 쓴다. json 은 레코드 배열, jsonl 은 한 줄에 레코드 하나."""
+
+  def __init__(self, output_file, output_format):
+    self.output_format = output_format
+    self.first = True
+    if output_format == "parquet":
+      self.file = None
+      self.output_file = output_file
+    else:
+      self.file = open(output_file, "w", encoding="utf-8")
+      if output_format == "json":
+        self.file.write("[\n")
+
+  def write(self, chunk):
+    if self.output_format == "parquet":
+      import pyarrow.parquet as pq
+
+      if self.file is None:
+        self.file = pq.ParquetWriter(self.output_file, chunk.schema, compression="zstd")
+      self.file.write_table(chunk)
+    else:
+      if self.output_format == "json" and not self.first:
+        self.file.write(",\n")
+      self.file.write(chunk)
+    self.first = False
+
+  def close(self):
+    if self.output_format == "json":
+      self.file.write("\n]\n")
+    if self.file is not None:
+      self.file.close()
+
+def output_format_of(output_file):
+  extension = os.path.splitext(output_file)[1].lower()
+  return {".jsonl": "jsonl", ".parquet": "parquet", ".json": "json"}.get(extension, "jsonl")
+
+def write_fake_data(output_file, num_records, seed=0, base_date=None, workers=None, chunk_size=CHUNK_SIZE):
+  """num_records 명의 데이터를 조각 단위로 병렬 생성해 output_file 에 저장 (형식은 확장자로 결정)"""
+  output_format = output_format_of(output_file)
+  base_date = base_date or datetime.date.today()
+  workers = workers or os.cpu_count() or 1
+  chunks = [
+    (chunk_index, start, min(start + chunk_size, num_records))
+    for chunk_index, start in enumerate(range(0, num_records, chunk_size))
+  ]
+
+  started = time.perf_counter()
+  written = 0
+  writer = ChunkWriter(output_file, output_format)
+  try:
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+      pending = deque()
+      for chunk_index, start, stop in chunks:
+        pending.append((stop - start, pool.submit(make_chunk, chunk_index, start, stop, seed, base_date, output_format)))
+        if len(pending) >= workers * PENDING_CHUNKS_PER_WORKER:
+          count, future = pending.popleft()
+          writer.write(future.result())
+          written += count
+          print(f"  {written:,} / {num_records:,} ({time.perf_counter() - started:.1f}s)", end="\r")
+      while pending:
+        count, future = pending.popleft()
+        writer.write(future.result())
+        written += count
+    print()
+  finally:
+    writer.close()
+  return time.perf_counter() - started
+
+# 메인 스크립트
+def main():
+  parser = argparse.ArgumentParser(description="가짜 사람 데이터 생성")
+  parser.add_argument("--records", type=int, default=100_000, help="생성할 사람의 수")
+  parser.add_argument("--output", default="fake_people_data_10.jsonl",
+                      help="저장할 파일 (.jsonl / .json / .parquet)")
+  parser.add_argument("--seed", type=int, default=0, help="같은 seed, 같은 기준일이면 같은 데이터")
+  parser.add_argument("--base-date", type=datetime.date.fromisoformat, default=None,
+                      help="생년월일/마지막 활동 시간의 기준일 (YYYY-MM-DD, 기본: 오늘)")
+  parser.add_argument("--workers", type=int, default=None, help="프로세스 수 (기본: CPU 수)")
+  parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="조각 하나의 레코드 수")
+  args = parser.parse_args()
+
+  print(f"{args.records:,}명의 데이터를 생성 중...")
+  elapsed = write_fake_data(args.output, args.records, args.seed, args.base_date, args.workers, args.chunk_size)
+  print(f"데이터가 저장되었습니다: {args.output} ({elapsed:.1f}초)")
+
+if __name__ == "__main__":
+  main()
@@ -1,17 +1,22 @@
-import mysql.connector
+import os
+import sys
 from mysql.connector import Error
 from datetime import datetime
 
+# simulate_pm 의 공용 DB 모듈(커넥션 풀, 백오프 재시도)을 사용
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'simulate_pm'))
+from db import get_connection
+
 def main():
     """
     MySQL 데이터베이스에 연결하여 데이터를 삽입하고 조회하는 메인 함수
     """
     # ----------------------------------------------------
     # 1. 데이터베이스 연결 정보 설정
+    # 공용 DB_CONFIG(ECAS_DB_* 환경 변수)에 이 테스트용 컨테이너 정보만 덮어씁니다.
     # ----------------------------------------------------
     db_config = {
         'host': '127.0.0.1',
-        'port': 3306,
         'user': 'root',
         'password': '1234', # 여기에 설정한 비밀번호를 입력하세요.
         'database': 'mydatabase'
@@ -22,7 +27,7 @@ def main():
         # ----------------------------------------------------
         # 2. 데이터베이스에 연결
         # ----------------------------------------------------
-        connection = mysql.connector.connect(**db_config)
+        connection = get_connection(max_attempts=3, **db_config)
 
         if connection.is_connected():
             print("MySQL 데이터베이스에 성공적으로 연결되었습니다.")
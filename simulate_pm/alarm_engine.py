@@ -0,0 +1,195 @@
+"""
+atlas_ecas_raw 의 val 에 대한 스트리밍 이상 알람
+
+data_inserter.py 가 한 tick(설비별 값 하나)을 적재할 때마다 update() 로 설비별 통계를 갱신하고,
+조건에 걸린 설비를 atlas_ecas_alarms 에 기록한다. 설비별 상태는 고정 크기 배열이므로
+tick 당 비용은 설비 수에만 비례하고, 쌓인 이력 길이와는 무관하다.
+
+설비별 상태:
+- EWMA 평균/분산 (EWMA_ALPHA)
+- 최근 ROLLING_WINDOW 개 값의 min/max (링 버퍼)
+- 표준화 잔차의 양/음 CUSUM
+
+알람 종류 (type, grade):
+- 'HIGH' / 'LOW': EWMA 평균 대비 Z_WARNING(1) / Z_CRITICAL(2) 표준편차 이상 벗어남
+- 'DRIFT_UP' / 'DRIFT_DOWN' (1): CUSUM 이 CUSUM_THRESHOLD 를 넘음 (알람 후 0 으로 초기화)
+- 'FLATLINE' (1): 최근 ROLLING_WINDOW 개 값의 폭(max - min)이 FLATLINE_EPSILON 미만 (진입 시 한 번)
+값이 MIN_SAMPLES 개 쌓이기 전에는 알람을 내지 않는다. PM 모드 변경 행처럼 val 이 없는 설비는 건너뛴다.
+
+상태는 checkpoint() 로 data/alarm_state.npz 에 원자적으로 저장하고, 시작할 때 읽어 이어서 계산한다.
+(재시작해도 atlas_ecas_raw 를 다시 읽지 않는다)
+update() 는 적재 트랜잭션 안에서 호출되므로, 호출 전에 snapshot() 을 떠 두고 롤백되면 restore() 로
+되돌린다. (그렇지 않으면 그 tick 은 반영된 것으로 남아 다시 들어와도 무시되고 알람이 사라진다)
+"""
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+logger = logging.getLogger('DataInserter.Alarms')
+
+STATE_PATH = 'data/alarm_state.npz'
+EWMA_ALPHA = 0.05
+ROLLING_WINDOW = 12        # 5분 tick 기준 1시간
+MIN_SAMPLES = 12
+Z_WARNING = 3.0
+Z_CRITICAL = 5.0
+CUSUM_SLACK = 0.5          # k: 이 이하의 작은 치우침은 누적하지 않음 (표준편차 단위)
+CUSUM_THRESHOLD = 5.0      # h
+FLATLINE_EPSILON = 1e-6
+VARIANCE_FLOOR = 1e-9
+
+INSERT_ALARM_QUERY = """
+INSERT INTO atlas_ecas_alarms (eqp_id, type, tm, grade, val)
+VALUES (%s, %s, %s, %s, %s)
+"""
+
+STATE_FIELDS = ('mean', 'var', 'count', 'cusum_pos', 'cusum_neg', 'window', 'flat_active')
+
+class AlarmEngine:
+    """설비 목록에 대한 알람 상태. update() 는 tick 마다 설비 순서대로 정렬된 값 배열을 받는다."""
+
+    def __init__(self, eqp_ids, state_path=STATE_PATH):
+        self.eqp_ids = np.asarray(eqp_ids, dtype=object)
+        self.state_path = state_path
+        n = len(self.eqp_ids)
+        self.mean = np.zeros(n)
+        self.var = np.zeros(n)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.cusum_pos = np.zeros(n)
+        self.cusum_neg = np.zeros(n)
+        self.window = np.full((n, ROLLING_WINDOW), np.nan, dtype=np.float32)
+        self.flat_active = np.zeros(n, dtype=bool)
+        self.window_pos = 0
+        self.last_tm = None
+        if state_path and os.path.exists(state_path):
+            self._restore(state_path)
+
+    def update(self, tm, vals):
+        """tick 하나(설비별 val, 없으면 NaN)를 반영하고 [(eqp_id, type, tm, grade, val), ...] 를 반환
+
+        이미 반영한 tm 이하의 tick 은 무시한다. (재시작 직후 같은 tick 이 다시 들어오는 경우)
+        """
+        if self.last_tm is not None and tm <= self.last_tm:
+            return []
+        vals = np.asarray(vals, dtype=np.float64)
+        valid = ~np.isnan(vals)
+        x = np.where(valid, vals, 0.0)
+
+        # 1. 갱신 전 통계로 점수 계산
+        ready = valid & (self.count >= MIN_SAMPLES)
+        std = np.sqrt(np.maximum(self.var, VARIANCE_FLOOR))
+        z = np.where(valid, (x - self.mean) / std, 0.0)
+
+        alarms = []
+        abs_z = np.abs(z)
+        grade = np.where(abs_z >= Z_CRITICAL, 2, np.where(abs_z >= Z_WARNING, 1, 0))
+        self._collect(alarms, ready & (grade > 0) & (z > 0), 'HIGH', tm, grade, vals)
+        self._collect(alarms, ready & (grade > 0) & (z < 0), 'LOW', tm, grade, vals)
+
+        # 2. CUSUM
+        self.cusum_pos = np.where(ready, np.maximum(0.0, self.cusum_pos + z - CUSUM_SLACK), self.cusum_pos)
+        self.cusum_neg = np.where(ready, np.maximum(0.0, self.cusum_neg - z - CUSUM_SLACK), self.cusum_neg)
+        drift_up = self.cusum_pos > CUSUM_THRESHOLD
+        drift_down = self.cusum_neg > CUSUM_THRESHOLD
+        self._collect(alarms, drift_up, 'DRIFT_UP', tm, 1, vals)
+        self._collect(alarms, drift_down, 'DRIFT_DOWN', tm, 1, vals)
+        self.cusum_pos[drift_up] = 0.0
+        self.cusum_neg[drift_down] = 0.0
+
+        # 3. EWMA 평균/분산 (첫 값은 평균으로 그대로 사용)
+        first = valid & (self.count == 0)
+        diff = x - self.mean
+        increment = EWMA_ALPHA * diff
+        self.mean = np.where(first, x, np.where(valid, self.mean + increment, self.mean))
+        self.var = np.where(valid & ~first, (1 - EWMA_ALPHA) * (self.var + diff * increment), self.var)
+        self.count += valid
+
+        # 4. 최근 값 링 버퍼와 FLATLINE
+        self.window[:, self.window_pos] = vals
+        self.window_pos = (self.window_pos + 1) % ROLLING_WINDOW
+        rolling_min, rolling_max = self.rolling_min_max()
+        full = ~np.isnan(self.window).any(axis=1)
+        flat = full & ((rolling_max - rolling_min) < FLATLINE_EPSILON)
+        self._collect(alarms, flat & ~self.flat_active, 'FLATLINE', tm, 1, vals)
+        self.flat_active = flat
+
+        self.last_tm = tm
+        return alarms
+
+    def snapshot(self):
+        """update() 로 바뀌는 상태의 사본 (restore() 에 넘긴다)"""
+        return {field: getattr(self, field).copy() for field in STATE_FIELDS}, self.window_pos, self.last_tm
+
+    def restore(self, snapshot):
+        """snapshot() 시점의 상태로 되돌린다. (update() 한 tick 의 적재가 롤백되었을 때)"""
+        fields, self.window_pos, self.last_tm = snapshot
+        for field, value in fields.items():
+            setattr(self, field, value)
+
+    def rolling_min_max(self):
+        """설비별 최근 ROLLING_WINDOW 개 값의 (min, max). 값이 없으면 NaN."""
+        missing = np.isnan(self.window)
+        rolling_min = np.where(missing, np.inf, self.window).min(axis=1)
+        rolling_max = np.where(missing, -np.inf, self.window).max(axis=1)
+        empty = missing.all(axis=1)
+        rolling_min[empty] = np.nan
+        rolling_max[empty] = np.nan
+        return rolling_min, rolling_max
+
+    def _collect(self, alarms, mask, alarm_type, tm, grade, vals):
+        indices = np.flatnonzero(mask)
+        grades = np.broadcast_to(grade, mask.shape)
+        for i in indices.tolist():
+            val = None if np.isnan(vals[i]) else round(float(vals[i]), 2)
+            alarms.append((self.eqp_ids[i], alarm_type, tm, int(grades[i]), val))
+
+    def checkpoint(self):
+        """상태를 임시 파일에 쓰고 이름을 바꿔 저장 (쓰는 도중 중단되어도 이전 checkpoint 가 남는다)"""
+        directory = os.path.dirname(self.state_path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.alarm_state.', suffix='.npz', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    eqp_ids=self.eqp_ids.astype(str),
+                    window_pos=self.window_pos,
+                    last_tm=np.datetime64(self.last_tm) if self.last_tm else np.datetime64('NaT'),
+                    **{field: getattr(self, field) for field in STATE_FIELDS}
+                )
+            os.replace(tmp_path, self.state_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _restore(self, path):
+        """checkpoint 를 읽어 설비 ID 가 같은 설비의 상태를 복원 (설비 목록이 바뀌어도 됨)"""
+        try:
+            with np.load(path, allow_pickle=False) as saved:
+                index = {eqp_id: i for i, eqp_id in enumerate(self.eqp_ids.tolist())}
+                src, dst = [], []
+                for i, eqp_id in enumerate(saved['eqp_ids'].tolist()):
+                    if eqp_id in index:
+                        src.append(i)
+                        dst.append(index[eqp_id])
+                saved_window = saved['window']
+                if saved_window.shape[1] != ROLLING_WINDOW:
+                    logger.warning("Alarm checkpoint has a different window size. Rolling window reset.")
+                for field in STATE_FIELDS:
+                    if field == 'window' and saved_window.shape[1] != ROLLING_WINDOW:
+                        continue
+                    getattr(self, field)[dst] = saved[field][src]
+                self.window_pos = int(saved['window_pos']) % ROLLING_WINDOW
+                last_tm = saved['last_tm']
+                self.last_tm = None if np.isnat(last_tm) else last_tm.astype('datetime64[us]').item()
+            logger.info(f"Restored alarm state for {len(dst)} equipments from {path} (last tick: {self.last_tm}).")
+        except (OSError, KeyError, ValueError) as e:
+            logger.error(f"Failed to restore alarm state from {path}: {e}. Starting fresh.")
+
+def insert_alarms(cursor, alarms):
+    """update() 가 반환한 알람을 기록. 커밋은 호출한 쪽에서 한다."""
+    if alarms:
+        cursor.executemany(INSERT_ALARM_QUERY, alarms)
@@ -0,0 +1,292 @@
+"""
+atlas_ecas_raw / atlas_ecas_alarms 의 Parquet 아카이브 (MySQL 밖의 cold tier)
+
+내보내기 (export_range):
+- 하루 단위로 tm 순서의 조회를 서버 측 커서(unbuffered)로 EXPORT_FETCH_SIZE 행씩 받아 쓴다.
+  (하루치 전체를 메모리에 올리지 않는다. 원본은 그룹별 버퍼 합이 MAX_BUFFERED_ROWS 를 넘으면 모두 내보내고,
+  알람은 받은 만큼 바로 row group 으로 쓴다)
+- 원본은 <root>/raw/date=YYYY-MM-DD/eqp_group=N/part-0.parquet 로, 알람은
+  <root>/alarms/date=YYYY-MM-DD/part-0.parquet 로 나눠 저장한다. (hive 파티션)
+- eqp_id 는 dictionary 인코딩, val 은 float32, tm 은 timestamp[ms]. 파일 안에서 tm 순서이므로
+  row group 통계로 시간 조건을 건너뛸 수 있다.
+- 하루치를 임시 디렉터리에 다 쓴 뒤 이름을 바꾸므로, 중간에 실패한 날은 남지 않는다.
+  이미 내보낸 날은 건너뛴다. (overwrite=True 이면 다시 쓴다)
+
+읽기 (read_raw / read_alarms / load_chart_data):
+- 날짜/설비 그룹 파티션과 tm, eqp_id 조건을 pyarrow.dataset 필터로 넘겨, 필요한 파일과 row group 만 읽는다.
+- load_chart_data() 는 ecas_chart 의 mock_data.json 과 같은 {'t', 'v', 'a'} (UTC epoch ms) 형태를 반환한다.
+
+    python archive.py export --start 2025-01-01 --end 2025-02-01
+"""
+import argparse
+import datetime
+import logging
+import os
+import shutil
+import zlib
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from db import connection
+
+logger = logging.getLogger('Archive')
+
+ARCHIVE_ROOT = os.environ.get('ECAS_ARCHIVE_ROOT', 'data/archive')
+EQUIPMENTS_PER_GROUP = 100
+EXPORT_FETCH_SIZE = 50000
+ROW_GROUP_SIZE = 100000   # 그룹별로 이만큼 모이면 row group 하나로 쓴다.
+MAX_BUFFERED_ROWS = 500000   # 모든 그룹의 버퍼 합이 이만큼 되면 모든 그룹을 row group 으로 내보낸다.
+COMPRESSION = 'zstd'
+
+RAW_SCHEMA = pa.schema([
+    ('eqp_id', pa.dictionary(pa.int32(), pa.string())),
+    ('tm', pa.timestamp('ms')),
+    ('val', pa.float32()),
+    ('pm_mode', pa.int8()),
+])
+
+ALARM_SCHEMA = pa.schema([
+    ('eqp_id', pa.dictionary(pa.int32(), pa.string())),
+    ('type', pa.dictionary(pa.int32(), pa.string())),
+    ('tm', pa.timestamp('ms')),
+    ('grade', pa.int8()),
+    ('val', pa.float32()),
+])
+
+# 파티션 값의 타입을 고정 (추론에 맡기면 date 가 날짜 타입으로 읽힐 수 있다)
+PARTITIONING = {
+    'raw': ds.partitioning(pa.schema([('date', pa.string()), ('eqp_group', pa.int32())]), flavor='hive'),
+    'alarms': ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive'),
+}
+
+def equipment_group(eqp_id):
+    """설비 ID 의 아카이브 그룹 번호 (EQP-001 ~ EQP-100 -> 0). 번호가 없는 ID 는 CRC32 로 나눈다."""
+    try:
+        return (int(eqp_id.rsplit('-', 1)[-1]) - 1) // EQUIPMENTS_PER_GROUP
+    except ValueError:
+        return zlib.crc32(eqp_id.encode()) % 1000
+
+def day_path(root, table, day):
+    return os.path.join(root, table, f"date={day:%Y-%m-%d}")
+
+def tmp_day_path(root, table, day):
+    """쓰는 중인 하루치. '.' 으로 시작하므로 읽기(pyarrow.dataset)에서는 무시된다."""
+    return os.path.join(root, table, f".date={day:%Y-%m-%d}.tmp")
+
+class _GroupWriter:
+    """하루치 원본을 설비 그룹별 파일로 나눠 쓰고, ROW_GROUP_SIZE 행씩 row group 으로 내보낸다.
+
+    그룹이 많으면 그룹마다 ROW_GROUP_SIZE 까지 모으는 동안 하루치가 거의 다 메모리에 남으므로,
+    버퍼 합이 MAX_BUFFERED_ROWS 에 닿으면 모든 그룹을 함께 내보낸다. (row group 마다 tm 구간이 이어져 있어
+    통계로 건너뛰기는 그대로 된다)
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.writers = {}
+        self.buffers = {}
+        self.buffered = 0
+
+    def add(self, rows):
+        for eqp_id, tm, val, pm_mode in rows:
+            group = equipment_group(eqp_id)
+            buffer = self.buffers.get(group)
+            if buffer is None:
+                buffer = self.buffers[group] = ([], [], [], [])
+            buffer[0].append(eqp_id)
+            buffer[1].append(tm)
+            buffer[2].append(val)
+            buffer[3].append(pm_mode)
+            self.buffered += 1
+            if len(buffer[0]) >= ROW_GROUP_SIZE:
+                self._write(group)
+        if self.buffered >= MAX_BUFFERED_ROWS:
+            self.flush()
+
+    def flush(self):
+        for group in list(self.buffers):
+            self._write(group)
+
+    def _write(self, group):
+        eqp_ids, tms, vals, pm_modes = self.buffers.pop(group)
+        self.buffered -= len(eqp_ids)
+        table = pa.table([
+            pa.array(eqp_ids, pa.string()).dictionary_encode(),
+            pa.array(tms, pa.timestamp('ms')),
+            pa.array(vals, pa.float32()),
+            pa.array(pm_modes, pa.int8()),
+        ], schema=RAW_SCHEMA)
+        writer = self.writers.get(group)
+        if writer is None:
+            group_dir = os.path.join(self.directory, f"eqp_group={group}")
+            os.makedirs(group_dir, exist_ok=True)
+            writer = self.writers[group] = pq.ParquetWriter(
+                os.path.join(group_dir, 'part-0.parquet'), RAW_SCHEMA, compression=COMPRESSION,
+                use_dictionary=['eqp_id']
+            )
+        writer.write_table(table)
+
+    def close(self):
+        self.flush()
+        for writer in self.writers.values():
+            writer.close()
+
+def _stream(conn, query, params):
+    """서버 측(unbuffered) 커서로 EXPORT_FETCH_SIZE 행씩 내보낸다."""
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+def _publish(tmp_dir, final_dir):
+    """임시 디렉터리에 다 쓴 하루치를 최종 위치로 옮긴다."""
+    if os.path.exists(final_dir):
+        shutil.rmtree(final_dir)
+    os.replace(tmp_dir, final_dir)
+
+def export_raw_day(conn, day, root=ARCHIVE_ROOT):
+    """하루치 원본을 내보내고 행 수를 반환"""
+    final_dir = day_path(root, 'raw', day)
+    tmp_dir = tmp_day_path(root, 'raw', day)
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    writer = _GroupWriter(tmp_dir)
+    count = 0
+    try:
+        for rows in _stream(conn, """
+        SELECT eqp_id, tm, val, pm_mode FROM atlas_ecas_raw
+        WHERE tm >= %s AND tm < %s
+        ORDER BY tm
+        """, (day, day + datetime.timedelta(days=1))):
+            writer.add(rows)
+            count += len(rows)
+        writer.close()
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    _publish(tmp_dir, final_dir)
+    return count
+
+def export_alarms_day(conn, day, root=ARCHIVE_ROOT):
+    """하루치 알람을 내보내고 행 수를 반환 (받은 EXPORT_FETCH_SIZE 행마다 row group 하나)"""
+    final_dir = day_path(root, 'alarms', day)
+    tmp_dir = tmp_day_path(root, 'alarms', day)
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    count = 0
+    try:
+        with pq.ParquetWriter(os.path.join(tmp_dir, 'part-0.parquet'), ALARM_SCHEMA, compression=COMPRESSION) as writer:
+            for rows in _stream(conn, """
+            SELECT eqp_id, type, tm, grade, val FROM atlas_ecas_alarms
+            WHERE tm >= %s AND tm < %s
+            ORDER BY tm
+            """, (day, day + datetime.timedelta(days=1))):
+                eqp_ids, types, tms, grades, vals = zip(*rows)
+                writer.write_table(pa.table([
+                    pa.array(eqp_ids, pa.string()).dictionary_encode(),
+                    pa.array(types, pa.string()).dictionary_encode(),
+                    pa.array(tms, pa.timestamp('ms')),
+                    pa.array(grades, pa.int8()),
+                    pa.array(vals, pa.float32()),
+                ], schema=ALARM_SCHEMA))
+                count += len(rows)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    _publish(tmp_dir, final_dir)
+    return count
+
+def export_range(conn, start, end, root=ARCHIVE_ROOT, overwrite=False):
+    """[start, end) 를 포함하는 날짜들을 하루씩 내보낸다. 이미 내보낸 날은 overwrite 가 아니면 건너뛴다.
+
+    알람을 먼저 내보내므로, 원본 디렉터리가 있는 날은 알람까지 끝난 날이다.
+    """
+    day = datetime.datetime(start.year, start.month, start.day)
+    exported = 0
+    while day < end:
+        if overwrite or not os.path.exists(day_path(root, 'raw', day)):
+            alarm_count = export_alarms_day(conn, day, root)
+            raw_count = export_raw_day(conn, day, root)
+            logger.info(f"Exported {day:%Y-%m-%d}: {raw_count} raw rows, {alarm_count} alarms.")
+            exported += 1
+        day += datetime.timedelta(days=1)
+    return exported
+
+def _time_filter(start, end):
+    """date 파티션과 tm 에 대한 필터. 파티션 조건으로 디렉터리를, tm 조건으로 row group 을 건너뛴다."""
+    expression = None
+    if start is not None:
+        expression = (ds.field('date') >= f"{start:%Y-%m-%d}") & (ds.field('tm') >= pa.scalar(start, pa.timestamp('ms')))
+    if end is not None:
+        condition = (ds.field('date') <= f"{end:%Y-%m-%d}") & (ds.field('tm') < pa.scalar(end, pa.timestamp('ms')))
+        expression = condition if expression is None else expression & condition
+    return expression
+
+def _and(left, right):
+    return right if left is None else left & right
+
+def _dataset(root, table):
+    return ds.dataset(os.path.join(root, table), format='parquet', partitioning=PARTITIONING[table])
+
+def read_raw(eqp_ids=None, start=None, end=None, root=ARCHIVE_ROOT, columns=('eqp_id', 'tm', 'val', 'pm_mode')):
+    """원본 아카이브에서 [start, end) 와 eqp_ids 에 해당하는 행만 읽어 tm 순 pyarrow.Table 로 반환"""
+    expression = _time_filter(start, end)
+    if eqp_ids:
+        groups = sorted({equipment_group(eqp_id) for eqp_id in eqp_ids})
+        expression = _and(expression, ds.field('eqp_group').isin(groups))
+        expression = _and(expression, ds.field('eqp_id').isin(list(eqp_ids)))
+    table = _dataset(root, 'raw').to_table(columns=list(columns), filter=expression)
+    return table.sort_by('tm') if 'tm' in columns else table
+
+def read_alarms(eqp_ids=None, start=None, end=None, root=ARCHIVE_ROOT):
+    """알람 아카이브에서 [start, end) 와 eqp_ids 에 해당하는 알람을 tm 순으로 반환"""
+    expression = _time_filter(start, end)
+    if eqp_ids:
+        expression = _and(expression, ds.field('eqp_id').isin(list(eqp_ids)))
+    return _dataset(root, 'alarms').to_table(
+        columns=['eqp_id', 'type', 'tm', 'grade', 'val'], filter=expression
+    ).sort_by('tm')
+
+def _epoch_ms(tm_column, tz):
+    """타임존 없는 tm(현지 시간)을 UTC epoch ms 로"""
+    return pc.cast(pc.assume_timezone(tm_column, tz), pa.int64()).to_numpy(zero_copy_only=False)
+
+def load_chart_data(eqp_id, start, end, root=ARCHIVE_ROOT, tz='Asia/Seoul'):
+    """ecas_chart 의 mock_data.json 과 같은 {'t': [...], 'v': [...], 'a': [...]} 를 아카이브에서 만든다.
+
+    t, a 는 UTC epoch ms (tm 은 tz 기준 현지 시간으로 저장되어 있다고 본다), v 는 val (PM 모드 행 제외).
+    """
+    raw = read_raw([eqp_id], start, end, root, columns=('tm', 'val'))
+    raw = raw.filter(pc.is_valid(raw['val']))
+    alarms = read_alarms([eqp_id], start, end, root)
+    return {
+        't': _epoch_ms(raw['tm'], tz),
+        'v': raw['val'].to_numpy(zero_copy_only=False),
+        'a': _epoch_ms(alarms['tm'], tz),
+    }
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="atlas_ecas_raw / atlas_ecas_alarms Parquet 아카이브")
+    parser.add_argument('command', choices=['export'])
+    parser.add_argument('--start', type=datetime.datetime.fromisoformat, required=True)
+    parser.add_argument('--end', type=datetime.datetime.fromisoformat, required=True, help="이 날짜 전날까지 내보냄")
+    parser.add_argument('--root', default=ARCHIVE_ROOT)
+    parser.add_argument('--overwrite', action='store_true', help="이미 내보낸 날도 다시 씀")
+    args = parser.parse_args()
+
+    with connection() as conn:
+        exported = export_range(conn, args.start, args.end, args.root, args.overwrite)
+    print(f"Exported {exported} days to {args.root}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+data_inserter.py 와 mailer.py 를 하나의 프로세스, 하나의 asyncio 이벤트 루프에서 실행
+
+다음 작업이 각각 asyncio task 로 돌며, 같은 커넥션 풀(db.py)을 나눠 쓴다.
+- inserter: 설비 묶음(--groups)마다 하나씩. 5분마다 한 tick 을 적재한다. (bulk 모드에서만 여러 묶음 가능)
+- detector: PM 모드 변경 감지 (events 모드 이벤트 처리 + CHECK_INTERVAL_SECONDS 마다 전체 상태 비교)
+- dispatcher: 발송 대기 변경을 라인별 digest 로 발송
+- 로그: 각 로거의 BufferedDBLogHandler 가 자체 flusher 스레드로 기록하고, 종료 시 남은 로그를 비운다.
+
+DB 작업은 기존 동기 함수(mysql.connector)를 그대로 스레드에서 실행하고(asyncio.to_thread),
+동시에 실행되는 DB 작업 수를 풀 크기로 제한한다. 그래서 한 묶음의 적재가 느려도 변경 감지와 발송이
+그 뒤에 줄 서지 않고, 여러 묶음의 적재도 서로 겹쳐서 진행된다.
+
+상태 저장소(sqlite 는 커넥션을 만든 스레드에서만 쓸 수 있음)는 detector 전용 스레드 하나에서 열고,
+감지/저장/닫기를 모두 그 스레드에서 한다.
+
+SIGINT / SIGTERM 을 받으면 새 작업을 시작하지 않고, 실행 중인 DB 작업(커밋/롤백)이 끝나기를 기다린 뒤
+상태 저장소를 저장하고 로그를 비우고 종료한다.
+
+    ECAS_INGEST_MODE=bulk ECAS_NUM_EQUIPMENTS=100000 python async_runner.py --groups 8
+    python async_runner.py --no-inserter   # mailer 역할만
+"""
+import argparse
+import asyncio
+import logging
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import alarm_engine
+import data_inserter
+import mailer
+from db import POOL_SIZE, connection
+
+logger = data_inserter.setup_logger('AsyncRunner', 'logs/async_runner.log')
+
+ERROR_RETRY_SECONDS = 60
+SHUTDOWN_TIMEOUT_SECONDS = 60
+ALARM_STATE_PATH_FORMAT = 'data/alarm_state.group{}.npz'
+
+class Runner:
+    """task 들이 공유하는 종료 신호와 DB 작업 슬롯"""
+
+    def __init__(self):
+        self.stop = asyncio.Event()
+        # 풀(autocommit 여부별로 POOL_SIZE 개)이 고갈되지 않도록 동시에 실행하는 DB 작업 수를 제한
+        self.db_slots = asyncio.Semaphore(POOL_SIZE)
+
+    async def run_db_job(self, func, *args, executor=None):
+        """동기 DB 작업 func(*args) 를 스레드에서 실행 (executor 를 주면 그 executor 의 스레드에서)
+
+        스레드 안의 작업은 중간에 멈출 수 없으므로, task 가 취소되어도 작업(커밋/롤백, 커넥션 반납)이
+        끝날 때까지 기다린 뒤 취소를 전달한다.
+        """
+        async with self.db_slots:
+            if executor is None:
+                job = asyncio.ensure_future(asyncio.to_thread(func, *args))
+            else:
+                job = asyncio.get_running_loop().run_in_executor(executor, func, *args)
+            try:
+                return await asyncio.shield(job)
+            except asyncio.CancelledError:
+                await asyncio.wait([job])
+                raise
+
+    async def sleep(self, seconds):
+        """seconds 동안 기다린다. 그 사이 종료 신호가 오면 바로 돌아와 True 를 반환."""
+        try:
+            await asyncio.wait_for(self.stop.wait(), timeout=max(0.0, seconds))
+        except asyncio.TimeoutError:
+            pass
+        return self.stop.is_set()
+
+    async def every(self, name, interval, func, *args, executor=None):
+        """종료 신호가 올 때까지 interval 초(시작 시각 기준)마다 func(*args) 를 실행"""
+        while not self.stop.is_set():
+            started = time.monotonic()
+            try:
+                await self.run_db_job(func, *args, executor=executor)
+            except Exception as e:
+                logger.error(f"[{name}] An unexpected error occurred: {e}", exc_info=True)
+                if await self.sleep(ERROR_RETRY_SECONDS):
+                    break
+                continue
+            if await self.sleep(interval - (time.monotonic() - started)):
+                break
+        logger.info(f"[{name}] stopped.")
+
+def split_groups(eqp_ids, groups):
+    """설비 ID 목록을 groups 개의 연속 구간으로 나눈다."""
+    size = -(-len(eqp_ids) // groups)
+    return [eqp_ids[i:i + size] for i in range(0, len(eqp_ids), size)]
+
+async def start_inserters(runner, groups):
+    """초기 PM 상태를 맞춘 뒤 설비 묶음별 inserter task 를 만든다."""
+    def sync_states():
+        with connection() as db_connection:
+            data_inserter.sync_initial_pm_states(db_connection)
+    await runner.run_db_job(sync_states)
+
+    if data_inserter.INGEST_MODE != 'bulk':
+        if groups > 1:
+            logger.warning("--groups is only supported in bulk mode. Using a single group.")
+        engine = data_inserter.make_alarm_engine(data_inserter.EQUIPMENT_IDS)
+        return [asyncio.create_task(
+            runner.every('inserter', data_inserter.INSERT_INTERVAL_SECONDS, data_inserter.run_insert_cycle, engine)
+        )]
+    eqp_groups = split_groups(data_inserter.EQUIPMENT_IDS, groups)
+    return [
+        asyncio.create_task(runner.every(
+            f'inserter-{i + 1}', data_inserter.INSERT_INTERVAL_SECONDS, data_inserter.run_bulk_cycle,
+            # 묶음마다 알람 상태를 따로 저장한다.
+            data_inserter.make_bulk_group(group_ids, alarm_state_path=(
+                ALARM_STATE_PATH_FORMAT.format(i + 1) if len(eqp_groups) > 1 else alarm_engine.STATE_PATH
+            ))
+        ))
+        for i, group_ids in enumerate(eqp_groups)
+    ]
+
+def start_mailer(runner, status_store, detector_executor):
+    """변경 감지 task 와 발송 task 를 만든다. 상태 저장소는 detector task 만, detector_executor 스레드에서 사용한다."""
+    tracker = {'statuses': {}, 'last_id': None}
+    detector_state = {'offset': None, 'next_check_at': 0.0}
+
+    def detect():
+        if mailer.CHANGE_DETECTION_MODE == 'events':
+            detector_state['offset'] = mailer.poll_events(status_store, detector_state['offset'])
+        if time.monotonic() >= detector_state['next_check_at']:
+            mailer.run_status_check(status_store, tracker)
+            detector_state['next_check_at'] = time.monotonic() + mailer.CHECK_INTERVAL_SECONDS
+
+    detect_interval = (mailer.EVENT_POLL_SECONDS if mailer.CHANGE_DETECTION_MODE == 'events'
+                       else mailer.CHECK_INTERVAL_SECONDS)
+    return [
+        asyncio.create_task(runner.every('detector', detect_interval, detect, executor=detector_executor)),
+        asyncio.create_task(runner.every('dispatcher', mailer.EVENT_POLL_SECONDS, mailer.dispatch_notifications)),
+    ]
+
+async def run(args):
+    runner = Runner()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, runner.stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows: Ctrl+C 는 KeyboardInterrupt 로 처리된다.
+            pass
+
+    status_store = None
+    # 상태 저장소를 열고, 쓰고, 닫는 스레드 (sqlite 커넥션은 만든 스레드에서만 쓸 수 있다)
+    detector_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='detector')
+    tasks = []
+    try:
+        if not args.no_inserter:
+            tasks += await start_inserters(runner, args.groups)
+        if not args.no_mailer:
+            status_store = await loop.run_in_executor(
+                detector_executor, mailer.open_status_store, mailer.STATUS_STORE_BACKEND
+            )
+            tasks += start_mailer(runner, status_store, detector_executor)
+        logger.info(f"Async runner started with {len(tasks)} tasks.")
+        await runner.stop.wait()
+    finally:
+        # 각 task 는 진행 중인 DB 작업을 마치고 스스로 끝난다. 너무 오래 걸리면 취소한다.
+        runner.stop.set()
+        logger.info("Shutting down...")
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=SHUTDOWN_TIMEOUT_SECONDS)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        if status_store is not None:
+            def close_store():
+                mailer.save_statuses(status_store)
+                status_store.close()
+            await loop.run_in_executor(detector_executor, close_store)
+        detector_executor.shutdown(wait=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="data_inserter / mailer 를 하나의 asyncio 프로세스에서 실행")
+    parser.add_argument('--groups', type=int, default=1, help="inserter 설비 묶음 수 (bulk 모드)")
+    parser.add_argument('--no-inserter', action='store_true', help="데이터 적재 task 를 띄우지 않음")
+    parser.add_argument('--no-mailer', action='store_true', help="변경 감지/발송 task 를 띄우지 않음")
+    args = parser.parse_args()
+    if args.groups < 1:
+        parser.error("--groups must be at least 1")
+
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        logger.info("Process stopped by user.")
+    # 버퍼에 남은 로그를 모두 기록한 뒤 종료
+    logging.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+atlas_ecas_raw 과거 데이터 백필 (시간 압축 시뮬레이션)
+
+data_inserter.py 를 실시간으로 돌리지 않고, 시작~종료 시간 사이의 5분 간격 데이터를
+같은 PM 토글 규칙(tick 마다 1/10 확률로 0 <-> 1, 토글된 행은 val 대신 pm_mode 기록)으로 생성해
+큰 배치로 적재한다. 설비 범위를 워커 수만큼 나눠 프로세스별로 병렬 적재한다.
+
+- (eqp_id, tm) 유니크 제약에 걸리는 행은 INSERT IGNORE 로 건너뛰므로, 같은 구간을 다시 돌려도 안전하다.
+- 각 설비의 마지막 토글은 equipment_pm_state 에 반영된다. (tm 이 더 최신인 기존 상태는 덮어쓰지 않음)
+- 적재가 끝나면 해당 구간의 시간/일 롤업을 원본에서 다시 계산한다. (INSERT IGNORE 로 건너뛴 행을
+  두 번 더하지 않도록 증분 대신 재계산)
+
+사용 예:
+    python backfill.py --start 2025-01-01 --end 2025-04-01 --equipments 1000 --workers 8
+"""
+import argparse
+import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import bulk_ingest
+from db import connection
+from rollup import rebuild_rollups
+
+TICK = datetime.timedelta(minutes=5)
+TARGET_BATCH_ROWS = 200000  # 워커가 한 번에 생성/적재하는 행 수 (대략)
+ROLLUP_EQP_BATCH = 1000  # 롤업 재계산 시 한 번에 처리하는 설비 수
+
+def align_to_tick(tm):
+    """tm 을 5분 격자에 맞춰 내림"""
+    return tm.replace(minute=tm.minute - tm.minute % 5, second=0, microsecond=0)
+
+def split_equipments(num_equipments, workers):
+    """1 ~ num_equipments 를 workers 개의 연속 구간 (start, count) 으로 나눈다."""
+    bounds = np.linspace(0, num_equipments, workers + 1).astype(int)
+    return [(int(lo) + 1, int(hi - lo)) for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo]
+
+def simulate_block(pm_states, num_ticks, rng):
+    """num_ticks x 설비 수 블록의 토글/상태/값을 한 번에 생성
+
+    tick t 의 상태는 초기 상태에 t 까지의 토글 횟수 홀짝을 XOR 한 값이다.
+    pm_states 는 블록 마지막 상태로 제자리 갱신된다.
+    """
+    changed = rng.random((num_ticks, len(pm_states))) < bulk_ingest.PM_TOGGLE_PROBABILITY
+    parity = np.cumsum(changed, axis=0, dtype=np.int32) & 1
+    states = (pm_states[np.newaxis, :] ^ parity).astype(np.int8)
+    vals = np.round(rng.uniform(100.0, 500.0, changed.shape), 2)
+    pm_states[:] = states[-1]
+    return changed, states, vals
+
+def backfill_worker(eqp_start, eqp_count, start, end, seed, chunk_size, commit_size):
+    """설비 구간 하나를 start ~ end 동안 백필하고 (시도한 행 수, 삽입된 행 수)를 반환"""
+    rng = np.random.default_rng(seed)
+    eqp_ids = bulk_ingest.make_equipment_ids(eqp_count, start=eqp_start)
+    pm_states = np.zeros(eqp_count, dtype=np.int8)
+    last_toggle = {}
+    ticks_per_block = max(1, TARGET_BATCH_ROWS // eqp_count)
+    total_ticks = int((end - start) / TICK) + 1
+
+    attempted = 0
+    inserted = 0
+    with connection() as conn:
+        for block_start in range(0, total_ticks, ticks_per_block):
+            num_ticks = min(ticks_per_block, total_ticks - block_start)
+            changed, states, vals = simulate_block(pm_states, num_ticks, rng)
+            rows = []
+            for t in range(num_ticks):
+                tm = start + (block_start + t) * TICK
+                rows.extend(bulk_ingest.render_rows(eqp_ids, tm, vals[t], changed[t], states[t]))
+                for eqp_id, pm_mode in zip(eqp_ids[changed[t]], states[t][changed[t]].tolist()):
+                    last_toggle[eqp_id] = (eqp_id, pm_mode, tm)
+            attempted += len(rows)
+            inserted += bulk_ingest.insert_rows(conn, rows, chunk_size=chunk_size, commit_size=commit_size,
+                                                ignore_duplicates=True)
+        # 마지막 토글만 상태 테이블에 반영 (upsert 는 더 최신 tm 만 덮어쓴다)
+        bulk_ingest.insert_rows(conn, [], list(last_toggle.values()))
+        for i in range(0, eqp_count, ROLLUP_EQP_BATCH):
+            rebuild_rollups(conn, start, end, eqp_ids[i:i + ROLLUP_EQP_BATCH].tolist())
+    return attempted, inserted
+
+def parse_time(value):
+    return datetime.datetime.fromisoformat(value)
+
+def main():
+    parser = argparse.ArgumentParser(description="atlas_ecas_raw 과거 데이터 백필")
+    parser.add_argument('--start', type=parse_time, required=True, help="시작 시간 (예: 2025-01-01 또는 2025-01-01T00:00)")
+    parser.add_argument('--end', type=parse_time, required=True, help="종료 시간 (포함)")
+    parser.add_argument('--equipments', type=int, default=100, help="설비 수 (EQP-001 부터)")
+    parser.add_argument('--workers', type=int, default=4, help="병렬 워커 프로세스 수")
+    parser.add_argument('--chunk-size', type=int, default=bulk_ingest.CHUNK_SIZE)
+    parser.add_argument('--commit-size', type=int, default=bulk_ingest.COMMIT_SIZE)
+    parser.add_argument('--seed', type=int, default=0, help="난수 시드 (워커별로 seed + 구간 번호 사용)")
+    args = parser.parse_args()
+
+    start, end = align_to_tick(args.start), align_to_tick(args.end)
+    if end < start:
+        parser.error("--end must not be earlier than --start")
+    partitions = split_equipments(args.equipments, args.workers)
+    print(f"Backfilling {args.equipments} equipments from {start} to {end} with {len(partitions)} workers...")
+
+    started = time.perf_counter()
+    attempted = 0
+    inserted = 0
+    with ProcessPoolExecutor(max_workers=len(partitions)) as executor:
+        futures = [
+            executor.submit(backfill_worker, eqp_start, eqp_count, start, end, args.seed + i,
+                            args.chunk_size, args.commit_size)
+            for i, (eqp_start, eqp_count) in enumerate(partitions)
+        ]
+        for future in as_completed(futures):
+            worker_attempted, worker_inserted = future.result()
+            attempted += worker_attempted
+            inserted += worker_inserted
+    elapsed = time.perf_counter() - started
+
+    print(f"Inserted {inserted:,} of {attempted:,} rows ({attempted - inserted:,} duplicates skipped) "
+          f"in {elapsed:.1f}s ({inserted / elapsed:,.0f} rows/sec).")
+
+if __name__ == "__main__":
+    main()
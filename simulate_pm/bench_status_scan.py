@@ -0,0 +1,123 @@
+"""
+mailer.py 의 상태 조회 방식 벤치마크: full_scan(ROW_NUMBER 윈도우 쿼리) vs incremental(high-water mark)
+
+별도의 벤치마크용 데이터베이스에 atlas_ecas_raw 를 만들고 지정한 행 수만큼 채운 뒤,
+한 주기(5분 tick, 설비 수만큼의 신규 행)가 추가되었을 때 두 방식의 조회 시간을 비교한다.
+두 방식이 만든 상태 맵이 동일한지도 함께 확인한다.
+
+접속 정보는 다른 스크립트와 같이 db.py 의 ECAS_DB_* 환경 변수를 쓴다. 벤치마크 DB 를 만들어야 하므로
+CREATE DATABASE 권한이 있는 계정이 필요하다. (docker-compose.yml 의 MySQL 이면 root)
+
+사용 예:
+    python bench_status_scan.py --rows 1000000 10000000 50000000
+    ECAS_DB_USER=root ECAS_DB_PASSWORD=... python bench_status_scan.py --rows 1000000
+"""
+import argparse
+import datetime
+import os
+import time
+
+import mailer
+from db import get_connection
+
+NUM_EQUIPMENTS = 100
+TICKS_PER_CHUNK = 10000  # 한 번에 채우는 tick 수 (100 설비 기준 100만 행)
+BASE_TIME = datetime.datetime(2020, 1, 1)
+SQL_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def prepare_database(conn, database):
+    """벤치마크용 데이터베이스와 테이블(atlas_ecas_raw, ecas_logs)을 새로 만든다."""
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+    cursor.execute(f"USE {database}")
+    cursor.execute("DROP TABLE IF EXISTS atlas_ecas_raw")
+    for file_name in ('init.sql', 'create_log_table.sql'):
+        with open(os.path.join(SQL_DIR, file_name)) as f:
+            script = f.read()
+        for statement in script.split(';'):
+            statement = statement.strip()
+            # init.sql 의 DB 생성/전환 구문은 벤치마크 DB 에서는 건너뛴다.
+            if not statement or statement.upper().startswith(('CREATE DATABASE', 'USE ')):
+                continue
+            cursor.execute(statement)
+    # tick 번호를 만들기 위한 숫자 테이블 (0 ~ TICKS_PER_CHUNK-1)
+    cursor.execute("DROP TABLE IF EXISTS bench_seq")
+    cursor.execute("CREATE TABLE bench_seq (n INT PRIMARY KEY)")
+    cursor.executemany("INSERT INTO bench_seq (n) VALUES (%s)", [(n,) for n in range(TICKS_PER_CHUNK)])
+    cursor.execute("DROP TABLE IF EXISTS bench_eqp")
+    cursor.execute("CREATE TABLE bench_eqp (eqp_id VARCHAR(255) PRIMARY KEY)")
+    cursor.executemany(
+        "INSERT INTO bench_eqp (eqp_id) VALUES (%s)",
+        [(f'EQP-{i:03d}',) for i in range(1, NUM_EQUIPMENTS + 1)]
+    )
+    conn.commit()
+    cursor.close()
+
+def fill_rows(conn, start_tick, end_tick):
+    """tick [start_tick, end_tick) 구간의 데이터를 서버 측 INSERT ... SELECT 로 채운다.
+
+    data_inserter.py 와 같이 약 1/10 의 행에 pm_mode 가 기록되고, 나머지 행에는 val 만 기록된다.
+    """
+    cursor = conn.cursor()
+    tick = start_tick
+    while tick < end_tick:
+        count = min(TICKS_PER_CHUNK, end_tick - tick)
+        cursor.execute("""
+        INSERT INTO atlas_ecas_raw (eqp_id, tm, val, pm_mode)
+        SELECT
+            eqp_id,
+            tm,
+            IF(r < 0.1, NULL, ROUND(100 + RAND() * 400, 2)),
+            IF(r < 0.1, IF(RAND() < 0.5, 1, 0), NULL)
+        FROM (
+            SELECT
+                e.eqp_id,
+                %s + INTERVAL ((%s + s.n) * 5) MINUTE AS tm,
+                RAND() AS r
+            FROM bench_seq s CROSS JOIN bench_eqp e
+            WHERE s.n < %s
+        ) t
+        """, (BASE_TIME, tick, count))
+        conn.commit()
+        tick += count
+    cursor.close()
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+def run_benchmark(conn, total_rows):
+    """현재 테이블을 total_rows 까지 채운 뒤, 한 tick 을 추가하고 두 방식의 조회 시간을 측정한다."""
+    target_ticks = total_rows // NUM_EQUIPMENTS
+    current_ticks = mailer.fetch_max_id(conn) // NUM_EQUIPMENTS
+    if current_ticks < target_ticks:
+        fill_rows(conn, current_ticks, target_ticks)
+
+    # incremental: 시작 시점 스냅샷(1회 비용)은 측정에서 제외하고 주기당 비용만 측정
+    # 벤치마크 데이터는 BASE_TIME 부터 시작하므로 tm 하한을 BASE_TIME 으로 둔다.
+    tracked, last_id = mailer.bootstrap_statuses(conn, since=BASE_TIME)
+    fill_rows(conn, target_ticks, target_ticks + 1)
+
+    full, full_sec = timed(mailer.get_latest_statuses, conn, None, BASE_TIME)
+    last_id, incr_sec = timed(mailer.fetch_status_changes, conn, tracked, last_id, BASE_TIME)
+
+    same = {k: v['pm_mode'] for k, v in full.items()} == {k: v['pm_mode'] for k, v in tracked.items()}
+    print(f"{total_rows:>12,} rows | full_scan {full_sec * 1000:10.1f} ms | "
+          f"incremental {incr_sec * 1000:8.1f} ms | same statuses: {same}")
+
+def main():
+    parser = argparse.ArgumentParser(description="full_scan vs incremental 상태 조회 벤치마크")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000, 50_000_000])
+    parser.add_argument('--database', default='ecas_bench')
+    args = parser.parse_args()
+
+    # ECAS_DB_* 접속 정보로 접속한 뒤 prepare_database 에서 벤치마크 DB 로 전환한다.
+    conn = get_connection(max_attempts=3)
+    prepare_database(conn, args.database)
+    for total_rows in sorted(args.rows):
+        run_benchmark(conn, total_rows)
+    conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+atlas_ecas_raw 대량 적재 모듈 (수만~수십만 설비용)
+
+- 설비별 random.randint / random.uniform 루프 대신 NumPy 로 한 tick 분량을 한 번에 생성한다.
+- 생성한 행을 SQL 리터럴로 만들어 chunk_size 행씩 다중 행 INSERT 로 보내고, commit_size 행마다 커밋한다.
+  (executemany 의 행별 파라미터 escape 비용을 없앤다)
+
+data_inserter.py 의 bulk 모드에서 사용하며, 설비 ID 는 make_equipment_ids() 로 만든 값만 사용해야 한다.
+(리터럴로 직접 렌더링하므로 따옴표 등이 들어간 임의 문자열은 허용하지 않는다)
+"""
+import time
+
+import numpy as np
+
+from alarm_engine import insert_alarms
+from pm_events import publish_events
+from pm_state import upsert_pm_states
+from rollup import COLUMNS as ROLLUP_COLUMNS, MERGE_CLAUSE as ROLLUP_MERGE_CLAUSE, ROLLUPS, bucket_start
+
+CHUNK_SIZE = 10000    # INSERT 문 하나에 담는 행 수
+COMMIT_SIZE = 100000  # 커밋 단위 행 수
+PM_TOGGLE_PROBABILITY = 0.1  # data_inserter.py 와 같은 1/10 확률
+
+INSERT_PREFIX = "INSERT INTO atlas_ecas_raw (eqp_id, tm, val, pm_mode) VALUES "
+INSERT_IGNORE_PREFIX = "INSERT IGNORE INTO atlas_ecas_raw (eqp_id, tm, val, pm_mode) VALUES "
+
+def make_equipment_ids(num_equipments, start=1):
+    """data_inserter.py 와 같은 형식(EQP-001 ...)의 설비 ID 배열"""
+    return np.array([f'EQP-{i:03d}' for i in range(start, start + num_equipments)], dtype=object)
+
+def generate_tick(pm_states, rng, toggle_probability=PM_TOGGLE_PROBABILITY):
+    """한 tick 분량의 값과 PM 모드 변경 여부를 생성
+
+    pm_states(설비별 0/1, int8 배열)는 제자리에서 갱신된다.
+    반환: (changed, vals) - changed 인 설비는 val 대신 새 pm_mode 가 기록된다.
+    """
+    num_equipments = len(pm_states)
+    changed = rng.random(num_equipments) < toggle_probability
+    # 현재 ON(1)이면 0으로, 아니면 1로 변경
+    pm_states[changed] = np.where(pm_states[changed] == 1, 0, 1)
+    vals = np.round(rng.uniform(100.0, 500.0, num_equipments), 2)
+    return changed, vals
+
+def render_rows(eqp_ids, tm, vals, changed, pm_states):
+    """INSERT ... VALUES 뒤에 붙일 '(...)' 리터럴 목록을 만든다."""
+    tm_literal = tm.strftime('%Y-%m-%d %H:%M:%S')
+    return [
+        f"('{eqp_id}','{tm_literal}',NULL,{pm_mode})" if is_changed
+        else f"('{eqp_id}','{tm_literal}',{val:.2f},NULL)"
+        for eqp_id, val, is_changed, pm_mode
+        in zip(eqp_ids, vals.tolist(), changed.tolist(), pm_states.tolist())
+    ]
+
+def render_rollup_rows(eqp_ids, tm, vals, changed, pm_states):
+    """한 tick 의 행을 롤업 테이블별 '(...)' 리터럴 목록으로 만든다. {테이블: [리터럴, ...]}
+
+    한 tick 에는 설비당 한 행뿐이므로 집계 없이 바로 롤업 행이 된다.
+    """
+    tm_literal = tm.strftime('%Y-%m-%d %H:%M:%S')
+    rendered = {}
+    for resolution, (table, _, _) in ROLLUPS.items():
+        bucket_literal = bucket_start(tm, resolution).strftime('%Y-%m-%d %H:%M:%S')
+        rendered[table] = [
+            f"('{eqp_id}','{bucket_literal}',NULL,NULL,0,0,NULL,NULL,{int(pm_mode == 1)},{int(pm_mode == 0)})"
+            if is_changed else
+            f"('{eqp_id}','{bucket_literal}',{val:.2f},{val:.2f},{val:.2f},1,'{tm_literal}',{val:.2f},0,0)"
+            for eqp_id, val, is_changed, pm_mode
+            in zip(eqp_ids, vals.tolist(), changed.tolist(), pm_states.tolist())
+        ]
+    return rendered
+
+def insert_rows(conn, rows, pm_state_updates=(), chunk_size=CHUNK_SIZE, commit_size=COMMIT_SIZE,
+                ignore_duplicates=False, rollup_rows=None, pm_events=(), alarms=(), row_eqp_ids=None):
+    """렌더링된 행을 chunk_size 행씩 다중 행 INSERT 로 넣고, commit_size 행마다 커밋
+
+    rollup_rows(render_rollup_rows() 결과, rows 와 같은 순서), pm_state_updates, pm_events, alarms 는
+    해당 설비의 원본 행과 같은 트랜잭션에서 롤업 테이블, equipment_pm_state, 이벤트 outbox,
+    atlas_ecas_alarms 에 반영한다. 그래서 중간 커밋 후 실패해도 커밋된 원본 행과 부가 테이블이 어긋나지 않는다.
+    - row_eqp_ids: rows 각 행의 설비 ID. 부가 행을 어느 커밋 구간에 넣을지 정한다.
+      없는데 부가 행이 있으면 중간 커밋 없이 한 트랜잭션으로 넣는다.
+    - 원본 행이 없는 설비의 부가 행은 마지막 커밋에 넣는다.
+    ignore_duplicates=True 이면 (eqp_id, tm) 이 이미 있는 행은 건너뛴다.
+    반환: 실제로 삽입된 행 수
+    """
+    prefix = INSERT_IGNORE_PREFIX if ignore_duplicates else INSERT_PREFIX
+    has_side_rows = bool(rollup_rows or pm_state_updates or pm_events or alarms)
+    if row_eqp_ids is None and has_side_rows:
+        commit_size = max(len(rows), 1)
+    bounds = [(start, min(start + commit_size, len(rows))) for start in range(0, len(rows), commit_size)] or [(0, 0)]
+    # 설비 ID -> 커밋 구간 번호. eqp_id 가 첫 값인 부가 행을 구간별로 나눈다
+    row_slice = {eqp_id: i // commit_size for i, eqp_id in enumerate(() if row_eqp_ids is None else row_eqp_ids)}
+    side_rows = []
+    for records in (pm_state_updates, pm_events, alarms):
+        grouped = [[] for _ in bounds]
+        for record in records:
+            grouped[row_slice.get(record[0], len(bounds) - 1)].append(record)
+        side_rows.append(grouped)
+    cursor = conn.cursor()
+    inserted = 0
+    try:
+        for index, (slice_start, slice_end) in enumerate(bounds):
+            for start in range(slice_start, slice_end, chunk_size):
+                cursor.execute(prefix + ",".join(rows[start:min(start + chunk_size, slice_end)]))
+                inserted += cursor.rowcount
+            for table, table_rows in (rollup_rows or {}).items():
+                for start in range(slice_start, slice_end, chunk_size):
+                    cursor.execute(
+                        f"INSERT INTO {table} {ROLLUP_COLUMNS} VALUES "
+                        + ",".join(table_rows[start:min(start + chunk_size, slice_end)]) + ROLLUP_MERGE_CLAUSE
+                    )
+            upsert_pm_states(cursor, side_rows[0][index])
+            publish_events(cursor, side_rows[1][index])
+            insert_alarms(cursor, side_rows[2][index])
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return inserted
+
+def ingest_tick(conn, eqp_ids, pm_states, rng, tm, chunk_size=CHUNK_SIZE, commit_size=COMMIT_SIZE,
+                alarm_engine=None):
+    """한 tick 을 생성해서 적재하고 (삽입 행 수, 변경 설비 수, 알람 수, 생성 초, 적재 초)를 반환
+
+    alarm_engine(eqp_ids 와 같은 순서의 AlarmEngine)이 있으면 val 을 평가해 알람도 함께 기록한다.
+    """
+    started = time.perf_counter()
+    changed, vals = generate_tick(pm_states, rng)
+    rows = render_rows(eqp_ids, tm, vals, changed, pm_states)
+    pm_state_updates = [
+        (eqp_id, pm_mode, tm)
+        for eqp_id, pm_mode in zip(eqp_ids[changed], pm_states[changed].tolist())
+    ]
+    # 상태는 0/1 토글이므로 변경 전 값은 1 - 변경 후 값
+    pm_events = [(eqp_id, 1 - pm_mode, pm_mode, tm) for eqp_id, pm_mode, _ in pm_state_updates]
+    rollup_rows = render_rollup_rows(eqp_ids, tm, vals, changed, pm_states)
+    # PM 모드가 바뀐 설비는 val 이 기록되지 않는다. 적재가 실패하면 알람 상태를 이 tick 전으로 되돌린다.
+    alarm_snapshot = alarm_engine.snapshot() if alarm_engine is not None else None
+    alarms = alarm_engine.update(tm, np.where(changed, np.nan, vals)) if alarm_engine is not None else []
+    generated = time.perf_counter()
+    try:
+        inserted = insert_rows(conn, rows, pm_state_updates, chunk_size, commit_size,
+                               rollup_rows=rollup_rows, pm_events=pm_events, alarms=alarms, row_eqp_ids=eqp_ids)
+    except Exception:
+        if alarm_snapshot is not None:
+            alarm_engine.restore(alarm_snapshot)
+        raise
+    finished = time.perf_counter()
+    return inserted, len(pm_state_updates), len(alarms), generated - started, finished - generated
@@ -6,6 +6,16 @@ import logging
 from logging.handlers import TimedRotatingFileHandler
 import os
 
+import numpy as np
+
+import alarm_engine
+import bulk_ingest
+from db import connection, get_connection
+from db_log_handler import BufferedDBLogHandler
+from pm_events import publish_events
+from pm_state import load_pm_states, rebuild_pm_state, upsert_pm_states
+from rollup import accumulate_rollups
+
 # --- 로깅 설정 ---
 def cleanup_old_logs(log_dir, days_to_keep):
     """지정된 기간보다 오래된 로그 파일을 삭제하는 함수"""
@@ -43,78 +53,69 @@ def setup_logger(name, log_file, level=logging.INFO):
     return logger
 
 logger = setup_logger('DataInserter', 'logs/data_inserter.log')
-
-# --- DB 연결 정보 ---
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'ecas_user',
-    'password': 'ecas_password',
-    'database': 'ecas_db',
-    'port': 3306
-}
+# 파일 로그와 함께 ecas_logs 테이블에도 배치로 기록
+logger.addHandler(BufferedDBLogHandler(
+    lambda: get_connection(autocommit=True, retry=False),
+    source_script=os.path.basename(__file__),
+    fallback_path='logs/data_inserter_fallback.log'
+))
 
 # --- 시뮬레이션 설정 ---
-NUM_EQUIPMENTS = 100
+NUM_EQUIPMENTS = int(os.environ.get('ECAS_NUM_EQUIPMENTS', 100))
 INSERT_INTERVAL_SECONDS = 300  # 5분
 EQUIPMENT_IDS = [f'EQP-{i:03d}' for i in range(1, NUM_EQUIPMENTS + 1)]
+# 적재 방식
+# - 'standard': 설비별 루프로 생성 후 executemany (기존 방식)
+# - 'bulk': NumPy 로 한 tick 을 한 번에 생성하고 chunk 단위 다중 행 INSERT (수만 대 이상의 설비용)
+INGEST_MODE = os.environ.get('ECAS_INGEST_MODE', 'standard')
+BULK_CHUNK_SIZE = int(os.environ.get('ECAS_BULK_CHUNK_SIZE', bulk_ingest.CHUNK_SIZE))
+BULK_COMMIT_SIZE = int(os.environ.get('ECAS_BULK_COMMIT_SIZE', bulk_ingest.COMMIT_SIZE))
+# val 이상 알람 평가 (alarm_engine.py). '0' 이면 끈다.
+ALARMS_ENABLED = os.environ.get('ECAS_ALARMS', '1') == '1'
 
 # 각 설비의 PM 모드 상태를 저장 (메모리)
 # 초기 상태는 모두 OFF (0)으로 설정 후, DB와 동기화
 equipment_pm_states = {eqp_id: 0 for eqp_id in EQUIPMENT_IDS}
 
-def connect_to_db():
-    """데이터베이스에 연결을 시도하고 커넥션 객체를 반환"""
-    while True:
-        try:
-            conn = mysql.connector.connect(**DB_CONFIG)
-            logger.info("Successfully connected to the database.")
-            return conn
-        except mysql.connector.Error as err:
-            logger.error(f"Database connection failed: {err}")
-            logger.info("Retrying in 10 seconds...")
-            time.sleep(10)
-
 def sync_initial_pm_states(conn):
-    """DB에서 최신 PM 모드 상태를 가져와 메모리와 동기화"""
+    """DB(equipment_pm_state)에서 최신 PM 모드 상태를 가져와 메모리와 동기화"""
     logger.info("Syncing initial PM mode states from database...")
-    query = """
-    WITH RankedLogs AS (
-        SELECT
-            eqp_id,
-            pm_mode,
-            ROW_NUMBER() OVER (PARTITION BY eqp_id ORDER BY tm DESC) as rn
-        FROM
-            atlas_ecas_raw
-        WHERE
-            pm_mode IS NOT NULL
-    )
-    SELECT
-        eqp_id,
-        pm_mode
-    FROM
-        RankedLogs
-    WHERE
-        rn = 1;
-    """
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(query)
+        pm_states = load_pm_states(conn)
+        if not pm_states:
+            # 테이블을 처음 도입했거나 비어 있는 경우, atlas_ecas_raw 에서 한 번 계산해 채운다.
+            logger.info("equipment_pm_state is empty. Rebuilding from atlas_ecas_raw...")
+            rebuild_pm_state(conn)
+            pm_states = load_pm_states(conn)
         updated_count = 0
-        for row in cursor.fetchall():
-            eqp_id = row['eqp_id']
-            pm_mode = row['pm_mode']
+        for eqp_id, state in pm_states.items():
             if eqp_id in equipment_pm_states:
-                equipment_pm_states[eqp_id] = pm_mode
+                equipment_pm_states[eqp_id] = state['pm_mode']
                 updated_count += 1
         logger.info(f"Successfully synced PM modes for {updated_count} equipments.")
     except mysql.connector.Error as err:
         logger.error(f"Failed to sync initial PM states: {err}")
-    finally:
-        if 'cursor' in locals() and cursor:
-            cursor.close()
 
-def insert_simulation_data(conn):
-    """100개 설비의 시뮬레이션 데이터를 DB에 삽입"""
+def make_alarm_engine(eqp_ids, state_path=alarm_engine.STATE_PATH):
+    """알람이 켜져 있으면 checkpoint 에서 상태를 복원한 AlarmEngine, 꺼져 있으면 None"""
+    if not ALARMS_ENABLED:
+        return None
+    return alarm_engine.AlarmEngine(eqp_ids, state_path)
+
+def checkpoint_alarms(engine):
+    """커밋이 끝난 tick 까지의 알람 상태를 저장. 실패해도 적재는 계속한다."""
+    if engine is None:
+        return
+    try:
+        engine.checkpoint()
+    except OSError as e:
+        logger.error(f"Failed to checkpoint alarm state: {e}")
+
+def insert_simulation_data(conn, engine=None):
+    """NUM_EQUIPMENTS 개 설비의 시뮬레이션 데이터를 DB에 삽입
+
+    engine(EQUIPMENT_IDS 순서의 AlarmEngine)이 있으면 val 을 평가해 알람을 같은 트랜잭션에 기록한다.
+    """
     cursor = conn.cursor()
     insert_query = """
     INSERT INTO atlas_ecas_raw (eqp_id, tm, val, pm_mode)
@@ -122,6 +123,9 @@ def insert_simulation_data(conn):
     """
     
     records_to_insert = []
+    # PM 모드가 바뀐 설비만 equipment_pm_state 와 이벤트 outbox 에 반영
+    pm_state_updates = []
+    pm_events = []
     current_time = datetime.datetime.now()
 
     for eqp_id in EQUIPMENT_IDS:
@@ -133,6 +137,7 @@ def insert_simulation_data(conn):
             new_state = 0 if current_state == 1 else 1
             equipment_pm_states[eqp_id] = new_state
             logger.info(f"PM mode for {eqp_id} changed from {current_state} to {new_state}")
+            pm_events.append((eqp_id, current_state, new_state, current_time))
             changed = True
 
         # 데이터 생성
@@ -141,33 +146,89 @@ def insert_simulation_data(conn):
         pm_mode = equipment_pm_states.get(eqp_id) if changed else None
 
         records_to_insert.append((eqp_id, tm, val, pm_mode))
+        if changed:
+            pm_state_updates.append((eqp_id, pm_mode, tm))
 
+    # 커밋이 실패하면 알람 상태도 이 tick 전으로 되돌린다.
+    alarm_snapshot = engine.snapshot() if engine else None
     try:
         cursor.executemany(insert_query, records_to_insert)
+        inserted_count = cursor.rowcount
+        # 원본 데이터와 최신 상태 테이블, 롤업, 변경 이벤트를 같은 트랜잭션에서 커밋
+        upsert_pm_states(cursor, pm_state_updates)
+        publish_events(cursor, pm_events)
+        accumulate_rollups(cursor, records_to_insert)
+        alarms = engine.update(current_time, [record[2] for record in records_to_insert]) if engine else []
+        alarm_engine.insert_alarms(cursor, alarms)
         conn.commit()
-        logger.info(f"Successfully inserted {cursor.rowcount} records.")
+        logger.info(f"Successfully inserted {inserted_count} records ({len(pm_state_updates)} PM state updates, "
+                    f"{len(alarms)} alarms).")
     except mysql.connector.Error as err:
         logger.error(f"Failed to insert data: {err}")
         conn.rollback()
+        if alarm_snapshot is not None:
+            engine.restore(alarm_snapshot)
+        return
     finally:
         cursor.close()
+    checkpoint_alarms(engine)
+
+def insert_simulation_data_bulk(conn, eqp_ids, pm_states, rng, engine=None):
+    """bulk 모드: NumPy 로 전체 설비의 한 tick 을 생성해 chunk 단위로 적재하고 처리량을 기록"""
+    try:
+        inserted, changed_count, alarm_count, gen_sec, insert_sec = bulk_ingest.ingest_tick(
+            conn, eqp_ids, pm_states, rng, datetime.datetime.now(),
+            chunk_size=BULK_CHUNK_SIZE, commit_size=BULK_COMMIT_SIZE, alarm_engine=engine
+        )
+    except mysql.connector.Error as err:
+        logger.error(f"Failed to bulk insert data: {err}")
+        return
+    checkpoint_alarms(engine)
+    total_sec = gen_sec + insert_sec
+    rows_per_sec = inserted / total_sec if total_sec > 0 else 0.0
+    logger.info(
+        f"Bulk inserted {inserted} records ({changed_count} PM state updates, {alarm_count} alarms) in {total_sec:.3f}s "
+        f"(generate {gen_sec:.3f}s, insert {insert_sec:.3f}s, {rows_per_sec:,.0f} rows/sec)."
+    )
+
+def make_bulk_group(eqp_ids, alarm_state_path=alarm_engine.STATE_PATH):
+    """bulk 모드로 적재할 설비 묶음: (설비 ID 배열, 설비별 PM 상태 배열, 난수 생성기, AlarmEngine 또는 None)
+
+    PM 상태는 sync_initial_pm_states() 로 맞춘 equipment_pm_states 에서 가져온다.
+    """
+    bulk_eqp_ids = np.array(eqp_ids, dtype=object)
+    bulk_pm_states = np.array([equipment_pm_states.get(eqp_id) or 0 for eqp_id in eqp_ids], dtype=np.int8)
+    return bulk_eqp_ids, bulk_pm_states, np.random.default_rng(), make_alarm_engine(eqp_ids, alarm_state_path)
+
+def run_insert_cycle(engine=None):
+    """standard 모드의 한 주기"""
+    # 주기마다 풀에서 상태가 확인된 커넥션을 꺼내 쓰고 반납한다. (끊겼으면 백오프하며 재연결)
+    with connection() as db_connection:
+        insert_simulation_data(db_connection, engine)
+
+def run_bulk_cycle(bulk_group):
+    """bulk 모드에서 설비 묶음 하나의 한 주기"""
+    with connection() as db_connection:
+        insert_simulation_data_bulk(db_connection, *bulk_group)
 
 def main():
     """메인 실행 함수"""
-    logger.info("Data inserter process started.")
-    db_connection = connect_to_db()
-
+    logger.info(f"Data inserter process started. (mode: {INGEST_MODE}, equipments: {NUM_EQUIPMENTS})")
     # 스크립트 시작 시, DB의 최신 상태와 동기화
-    sync_initial_pm_states(db_connection)
+    with connection() as db_connection:
+        sync_initial_pm_states(db_connection)
+
+    if INGEST_MODE == 'bulk':
+        bulk_group = make_bulk_group(EQUIPMENT_IDS)
+    else:
+        engine = make_alarm_engine(EQUIPMENT_IDS)
     
     while True:
         try:
-            # DB 연결이 끊어졌는지 확인하고 재연결
-            if not db_connection.is_connected():
-                logger.warning("Database connection lost. Reconnecting...")
-                db_connection = connect_to_db()
-            
-            insert_simulation_data(db_connection)
+            if INGEST_MODE == 'bulk':
+                run_bulk_cycle(bulk_group)
+            else:
+                run_insert_cycle(engine)
             
             logger.info(f"Waiting for {INSERT_INTERVAL_SECONDS} seconds for the next cycle.")
             time.sleep(INSERT_INTERVAL_SECONDS)
@@ -180,9 +241,8 @@ def main():
             # 예기치 않은 오류 발생 시 잠시 대기 후 재시도
             time.sleep(60)
 
-    if db_connection and db_connection.is_connected():
-        db_connection.close()
-        logger.info("Database connection closed.")
+    # 버퍼에 남은 로그를 모두 기록한 뒤 종료
+    logging.shutdown()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,187 @@
+"""
+simulate_pm 공용 DB 접근 모듈
+
+- DB_CONFIG: 모든 스크립트가 공유하는 접속 정보 (환경 변수 ECAS_DB_* 로 덮어쓸 수 있음)
+- get_pool(): 프로세스당 하나의 커넥션 풀 (autocommit 여부별로 구분)
+- get_connection() / connection(): 상태를 확인한 뒤 풀에서 커넥션을 꺼낸다.
+  실패하면 지수 백오프 + 지터로 재시도하므로, DB 가 잠깐 끊겨도 모든 프로세스가 같은 간격으로
+  동시에 재접속하지 않는다.
+- prepared_cursor(): 자주 실행되는 조회 쿼리를 물리 커넥션별로 한 번만 prepare 해서 재사용한다.
+"""
+import contextlib
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+
+import mysql.connector
+from mysql.connector import pooling
+
+logger = logging.getLogger(__name__)
+
+# --- DB 연결 정보 ---
+DB_CONFIG = {
+    'host': os.environ.get('ECAS_DB_HOST', 'localhost'),
+    'user': os.environ.get('ECAS_DB_USER', 'ecas_user'),
+    'password': os.environ.get('ECAS_DB_PASSWORD', 'ecas_password'),
+    'database': os.environ.get('ECAS_DB_NAME', 'ecas_db'),
+    'port': int(os.environ.get('ECAS_DB_PORT', 3306))
+}
+
+# --- 풀 / 재접속 설정 ---
+POOL_SIZE = int(os.environ.get('ECAS_DB_POOL_SIZE', 5))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+# --- prepare 해서 재사용하는 조회 쿼리 ---
+# atlas_ecas_raw 조회는 모두 tm 하한을 받아, 파티션 테이블에서 필요한 파티션만 읽도록 한다.
+# 다중 행 INSERT(atlas_ecas_raw, ecas_logs, equipment_pm_state) 는 텍스트 프로토콜의 executemany 가
+# 한 번의 왕복으로 보내므로, prepared 로 바꾸면 오히려 행마다 왕복이 생긴다. 그래서 여기에는 넣지 않는다.
+PREPARED_QUERIES = {
+    'latest_statuses': """
+        WITH RankedLogs AS (
+            SELECT eqp_id, pm_mode, tm,
+                   ROW_NUMBER() OVER (PARTITION BY eqp_id ORDER BY tm DESC) as rn
+            FROM atlas_ecas_raw
+            WHERE pm_mode IS NOT NULL AND tm >= %s
+        )
+        SELECT eqp_id, pm_mode, tm FROM RankedLogs WHERE rn = 1
+    """,
+    'latest_statuses_upto_id': """
+        WITH RankedLogs AS (
+            SELECT eqp_id, pm_mode, tm,
+                   ROW_NUMBER() OVER (PARTITION BY eqp_id ORDER BY tm DESC) as rn
+            FROM atlas_ecas_raw
+            WHERE pm_mode IS NOT NULL AND id <= %s AND tm >= %s
+        )
+        SELECT eqp_id, pm_mode, tm FROM RankedLogs WHERE rn = 1
+    """,
+    'max_id': "SELECT COALESCE(MAX(id), 0) FROM atlas_ecas_raw",
+    'new_status_rows': """
+        SELECT id, eqp_id, pm_mode, tm
+        FROM atlas_ecas_raw
+        WHERE id > %s AND id <= %s AND tm >= %s AND pm_mode IS NOT NULL
+        ORDER BY id
+    """,
+    'load_pm_state': "SELECT eqp_id, pm_mode, tm FROM equipment_pm_state",
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+# 물리 커넥션 -> (connection_id, {쿼리 이름: prepared cursor})
+_prepared_cursors = weakref.WeakKeyDictionary()
+
+def load_db_config(**overrides):
+    """공용 접속 정보에 overrides 를 덮어쓴 사본을 반환"""
+    config = dict(DB_CONFIG)
+    config.update(overrides)
+    return config
+
+def backoff_delays(base=BACKOFF_BASE_SECONDS, cap=BACKOFF_MAX_SECONDS):
+    """지수 백오프 + full jitter 대기 시간을 무한히 생성 (0 ~ min(cap, base * 2^n))"""
+    attempt = 0
+    while True:
+        yield random.uniform(0, min(cap, base * (2 ** attempt)))
+        attempt += 1
+
+def retry_with_backoff(func, max_attempts=None, description="database operation"):
+    """func() 가 mysql.connector.Error 없이 끝날 때까지 백오프하며 재시도"""
+    delays = backoff_delays()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return func()
+        except mysql.connector.Error as err:
+            if max_attempts is not None and attempt >= max_attempts:
+                raise
+            delay = next(delays)
+            logger.error(f"{description} failed (attempt {attempt}): {err}")
+            logger.info(f"Retrying in {delay:.1f} seconds...")
+            time.sleep(delay)
+
+def get_pool(autocommit=False, **overrides):
+    """autocommit 여부와 접속 정보별로 프로세스당 하나의 커넥션 풀을 만든다."""
+    config = load_db_config(**overrides)
+    key = (autocommit, tuple(sorted(config.items())))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = pooling.MySQLConnectionPool(
+                pool_name=f"ecas_pool_{len(_pools)}",
+                pool_size=POOL_SIZE,
+                # 세션을 초기화하면 prepared statement 도 해제되므로 반납 시 초기화하지 않는다.
+                pool_reset_session=False,
+                autocommit=autocommit,
+                **config
+            )
+            _pools[key] = pool
+    return pool
+
+def _checkout(pool):
+    """풀에서 커넥션을 꺼내 살아 있는지 확인한다. 끊겨 있으면 한 번 재연결한다."""
+    conn = pool.get_connection()
+    try:
+        conn.ping(reconnect=True, attempts=1, delay=0)
+    except mysql.connector.Error:
+        conn.close()
+        raise
+    return conn
+
+def get_connection(autocommit=False, retry=True, max_attempts=None, **overrides):
+    """상태가 확인된 풀 커넥션을 반환. close() 하면 풀로 돌아간다.
+
+    retry=False 이면 실패 시 바로 mysql.connector.Error 를 던진다.
+    """
+    pool = get_pool(autocommit=autocommit, **overrides)
+    if not retry:
+        return _checkout(pool)
+    return retry_with_backoff(lambda: _checkout(pool), max_attempts=max_attempts,
+                              description="Database connection")
+
+@contextlib.contextmanager
+def connection(autocommit=False, **overrides):
+    """with 문이 끝나면 풀로 반납되는 커넥션"""
+    conn = get_connection(autocommit=autocommit, **overrides)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def _physical_connection(conn):
+    # PooledMySQLConnection 은 실제 커넥션을 _cnx 로 감싸고 있다.
+    return getattr(conn, '_cnx', conn)
+
+def prepared_cursor(conn, name):
+    """PREPARED_QUERIES[name] 을 실행할 prepared cursor 를 물리 커넥션별로 캐시해서 반환
+
+    같은 cursor 로 같은 쿼리를 다시 execute 하면 서버에서 다시 prepare 하지 않는다.
+    결과는 튜플로 반환되며, 다음 실행 전에 모두 fetch 해야 한다.
+    """
+    physical = _physical_connection(conn)
+    cached = _prepared_cursors.get(physical)
+    if cached is None or cached[0] != physical.connection_id:
+        # 재연결되면 서버 세션이 바뀌어 이전 statement 는 쓸 수 없다.
+        cached = (physical.connection_id, {})
+        _prepared_cursors[physical] = cached
+    cursors = cached[1]
+    cursor = cursors.get(name)
+    if cursor is None:
+        cursor = physical.cursor(prepared=True)
+        cursors[name] = cursor
+    return cursor
+
+def execute_prepared(conn, name, params=()):
+    """prepared 쿼리를 실행하고 모든 행을 튜플 목록으로 반환"""
+    cursor = prepared_cursor(conn, name)
+    try:
+        cursor.execute(PREPARED_QUERIES[name], params)
+        return cursor.fetchall()
+    except mysql.connector.Error:
+        # 재연결 등으로 statement 가 사라졌을 수 있으므로 다음 호출에서 다시 prepare 한다.
+        cached = _prepared_cursors.get(_physical_connection(conn))
+        if cached is not None:
+            cached[1].pop(name, None)
+        raise
@@ -0,0 +1,239 @@
+"""
+ecas_logs 테이블용 버퍼링 logging 핸들러
+
+로그 레코드를 메모리 큐에 쌓아 두고, 백그라운드 스레드가 일정 개수(batch_size) 또는
+일정 시간(flush_interval)마다 여러 행을 한 번에 INSERT 한다. 호출하는 쪽(메일러/인서터의 루프)은
+DB 왕복을 기다리지 않는다.
+
+- 큐 크기는 max_queue_size 로 제한되며, 가득 찼을 때의 동작은 overflow_policy 로 정한다.
+  'drop_oldest': 가장 오래된 레코드를 버리고 새 레코드를 넣는다.
+  'drop_new'   : 새 레코드를 버린다.
+  'block'      : 자리가 날 때까지 (최대 block_timeout 초) 기다린다.
+- DB 에 기록할 수 없으면 fallback_path 파일에 대신 기록하고, 다음 배치에서 다시 연결을 시도한다.
+- close() 시 남은 레코드를 모두 기록한다. (logging.shutdown() 에서도 호출된다)
+
+사용 예:
+    handler = BufferedDBLogHandler(connect, source_script='mailer.py')
+    logger.addHandler(handler)
+    logger.warning("Change detected", extra={'eqp_id': 'EQP-001'})
+"""
+import datetime
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+import mysql.connector
+
+INSERT_LOG_QUERY = """
+INSERT INTO ecas_logs (log_time, log_level, source_script, eqp_id, message)
+VALUES (%s, %s, %s, %s, %s)
+"""
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_new', 'block')
+
+class BufferedDBLogHandler(logging.Handler):
+    """로그 레코드를 모아서 ecas_logs 에 배치로 INSERT 하는 비동기 핸들러"""
+
+    def __init__(self, connect, source_script, batch_size=100, flush_interval=2.0,
+                 max_queue_size=10000, overflow_policy='drop_oldest', block_timeout=1.0,
+                 fallback_path='logs/ecas_logs_fallback.log', reconnect_interval=10.0,
+                 level=logging.NOTSET):
+        """
+        connect: 인자 없이 호출하면 새 DB 커넥션을 반환하는 함수 (핸들러 전용 커넥션으로 사용)
+        source_script: ecas_logs.source_script 에 기록할 이름
+        """
+        super().__init__(level)
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow_policy must be one of {OVERFLOW_POLICIES}: {overflow_policy}")
+        self.connect = connect
+        self.source_script = source_script
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.fallback_path = fallback_path
+        self.reconnect_interval = reconnect_interval
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._conn = None
+        self._next_connect_at = 0.0
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name='db-log-flusher', daemon=True)
+        self._worker.start()
+
+    # --- 생산자 쪽 (로그를 남기는 스레드) ---
+    def emit(self, record):
+        try:
+            row = (
+                datetime.datetime.fromtimestamp(record.created),
+                record.levelname,
+                self.source_script,
+                getattr(record, 'eqp_id', None),
+                self.format(record),
+            )
+        except Exception:
+            self.handleError(record)
+            return
+        self._enqueue(row)
+
+    def _enqueue(self, item):
+        if self.overflow_policy == 'block':
+            try:
+                self._queue.put(item, timeout=self.block_timeout)
+            except queue.Full:
+                self._count_drop()
+            return
+
+        try:
+            self._queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+        if self.overflow_policy == 'drop_oldest':
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self._queue.put_nowait(item)
+            except queue.Full:
+                pass
+        self._count_drop()
+
+    def _count_drop(self):
+        with self._dropped_lock:
+            self._dropped += 1
+
+    def flush(self, timeout=5.0):
+        """지금까지 큐에 들어간 레코드가 기록될 때까지 (최대 timeout 초) 기다린다."""
+        if not self._worker.is_alive():
+            return
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def close(self):
+        """백그라운드 스레드를 멈추고 남은 레코드를 모두 기록한다."""
+        if self._worker.is_alive():
+            self._stop.set()
+            self._worker.join()
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except mysql.connector.Error:
+                pass
+            self._conn = None
+        super().close()
+
+    # --- 소비자 쪽 (백그라운드 스레드) ---
+    def _run(self):
+        while True:
+            batch, markers = self._collect_batch()
+            self._write(batch)
+            for marker in markers:
+                marker.set()
+            if self._stop.is_set() and self._queue.empty():
+                break
+
+    def _collect_batch(self):
+        """batch_size 개가 모이거나 flush_interval 이 지날 때까지 큐에서 꺼낸다."""
+        batch, markers = [], []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if self._stop.is_set():
+                # 종료 중에는 기다리지 않고 남은 것만 꺼낸다.
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=min(remaining, 0.5))
+                except queue.Empty:
+                    continue
+            if isinstance(item, threading.Event):
+                # flush() 요청: 지금까지 모은 것을 바로 기록
+                markers.append(item)
+                break
+            batch.append(item)
+        return batch, markers
+
+    def _take_dropped_notice(self):
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, 0
+        if not dropped:
+            return None
+        return (datetime.datetime.now(), 'WARNING', self.source_script, None,
+                f"{dropped} log records were dropped because the log queue was full.")
+
+    def _write(self, batch):
+        notice = self._take_dropped_notice()
+        if notice:
+            batch.append(notice)
+        if not batch:
+            return
+        conn = self._get_connection()
+        if conn is None:
+            self._write_fallback(batch)
+            return
+        try:
+            cursor = conn.cursor()
+            # mysql.connector 는 단순 INSERT ... VALUES 의 executemany 를 하나의 다중 행 INSERT 로 보낸다.
+            cursor.executemany(INSERT_LOG_QUERY, batch)
+            cursor.close()
+            if not conn.autocommit:
+                conn.commit()
+        except mysql.connector.Error as err:
+            print(f"!!! CRITICAL: FAILED TO LOG TO DATABASE: {err} !!!", file=sys.stderr)
+            self._drop_connection()
+            self._write_fallback(batch)
+
+    def _get_connection(self):
+        if self._conn is not None:
+            try:
+                if self._conn.is_connected():
+                    return self._conn
+            except mysql.connector.Error:
+                pass
+            self._drop_connection()
+        if time.monotonic() < self._next_connect_at:
+            return None
+        try:
+            self._conn = self.connect()
+            return self._conn
+        except mysql.connector.Error as err:
+            print(f"!!! CRITICAL: LOG DATABASE UNREACHABLE: {err} !!!", file=sys.stderr)
+            self._next_connect_at = time.monotonic() + self.reconnect_interval
+            return None
+
+    def _drop_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except mysql.connector.Error:
+                pass
+        self._conn = None
+        self._next_connect_at = time.monotonic() + self.reconnect_interval
+
+    def _write_fallback(self, batch):
+        """DB 에 기록하지 못한 레코드를 로컬 파일에 남긴다."""
+        try:
+            log_dir = os.path.dirname(self.fallback_path)
+            if log_dir and not os.path.exists(log_dir):
+                os.makedirs(log_dir)
+            with open(self.fallback_path, 'a', encoding='utf-8') as f:
+                for log_time, level, source_script, eqp_id, message in batch:
+                    f.write(f"{log_time} - {source_script} - {level} - {eqp_id or '-'} - {message}\n")
+        except OSError as e:
+            print(f"!!! CRITICAL: FAILED TO WRITE FALLBACK LOG: {e} !!!", file=sys.stderr)
@@ -20,3 +20,91 @@ CREATE TABLE atlas_ecas_raw (
 
 -- 데이터 조회 성능 향상을 위해 인덱스를 추가합니다.
 CREATE INDEX idx_eqp_id_tm ON atlas_ecas_raw (eqp_id, tm DESC);
+
+-- tm 기준 일/월 파티션과 보존 기간 관리가 필요하면 테이블 생성 후 아래 명령을 실행합니다.
+--   python partition_maintenance.py migrate   (PK 를 (id, tm) 으로 바꾸고 RANGE COLUMNS(tm) 파티션으로 변환)
+--   python partition_maintenance.py run       (미래 파티션 생성 / 만료 파티션 삭제를 주기적으로 실행)
+
+-- 설비별 최신 PM 모드 상태 (data_inserter.py 가 atlas_ecas_raw 삽입과 같은 트랜잭션에서 갱신)
+-- mailer.py / data_inserter.py 는 atlas_ecas_raw 전체를 윈도우 쿼리로 훑는 대신 이 테이블을 PK 로 읽는다.
+-- 크래시 등으로 어긋난 경우 `python pm_state.py rebuild` 로 atlas_ecas_raw 에서 다시 계산한다.
+CREATE TABLE IF NOT EXISTS equipment_pm_state (
+    eqp_id VARCHAR(255) NOT NULL PRIMARY KEY,   -- 설비 ID
+    pm_mode TINYINT,                            -- 마지막으로 기록된 PM 모드
+    tm DATETIME NOT NULL                        -- 해당 PM 모드가 기록된 시간
+);
+
+-- 차트 조회용 다운샘플링 롤업 (설비별 시간/일 단위). rollup.py 참고
+-- data_inserter.py 가 적재할 때마다 증분 갱신하고, backfill.py 는 적재한 구간을 다시 계산한다.
+CREATE TABLE IF NOT EXISTS atlas_ecas_rollup_hourly (
+    eqp_id VARCHAR(255) NOT NULL,               -- 설비 ID
+    bucket DATETIME NOT NULL,                   -- 구간 시작 시간 (정시)
+    val_min FLOAT,                              -- 최소값
+    val_max FLOAT,                              -- 최대값
+    val_sum DOUBLE NOT NULL DEFAULT 0,          -- 합계 (평균 = val_sum / val_count)
+    val_count INT NOT NULL DEFAULT 0,           -- val 이 있는 행 수
+    last_tm DATETIME,                           -- 마지막 val 의 시간
+    last_val FLOAT,                             -- 마지막 val
+    pm_on_count INT NOT NULL DEFAULT 0,         -- pm_mode = 1 로 기록된 횟수
+    pm_off_count INT NOT NULL DEFAULT 0,        -- pm_mode = 0 으로 기록된 횟수
+    PRIMARY KEY (eqp_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS atlas_ecas_rollup_daily LIKE atlas_ecas_rollup_hourly;
+
+-- PM 모드 변경 이벤트 outbox. data_inserter.py 가 atlas_ecas_raw 삽입과 같은 트랜잭션에서 기록하고,
+-- mailer.py 는 event_consumer_offsets 에 저장한 offset 이후의 이벤트만 읽어 처리한다. (pm_events.py 참고)
+CREATE TABLE IF NOT EXISTS pm_mode_events (
+    event_id BIGINT AUTO_INCREMENT PRIMARY KEY, -- 이벤트 순번 (소비자 offset 기준)
+    eqp_id VARCHAR(255) NOT NULL,               -- 설비 ID
+    prev_pm_mode TINYINT,                       -- 변경 전 PM 모드
+    pm_mode TINYINT,                            -- 변경 후 PM 모드
+    tm DATETIME NOT NULL,                       -- 변경 시간 (atlas_ecas_raw.tm)
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS event_consumer_offsets (
+    consumer VARCHAR(100) NOT NULL PRIMARY KEY, -- 소비자 이름 (예: 'mailer')
+    last_event_id BIGINT NOT NULL DEFAULT 0,    -- 처리를 마친 마지막 event_id
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- PM 모드 변경 알림 발송 기록. mailer.py 가 감지한 변경을 'pending' 으로 기록하고,
+-- 라인별 digest 로 보낸 뒤 'sent' 로 바꾼다. 재시작해도 보낸 변경은 다시 보내지 않는다. (mail_dispatch.py 참고)
+-- 수신 거부 등으로 MAX_DELIVERY_ATTEMPTS 번 실패한 변경은 'failed' 로 바꾸고 더 보내지 않는다.
+CREATE TABLE IF NOT EXISTS pm_notification_deliveries (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    change_key VARCHAR(320) NOT NULL,           -- 'eqp_id|tm|pm_mode'. 같은 변경은 한 번만 기록
+    eqp_id VARCHAR(255) NOT NULL,               -- 설비 ID
+    line VARCHAR(50) NOT NULL,                  -- digest 묶음 단위 (라인)
+    prev_pm_mode VARCHAR(32),                   -- 변경 전 상태 (표시용 문자열)
+    pm_mode TINYINT,                            -- 변경 후 PM 모드
+    tm DATETIME NOT NULL,                       -- 변경 시간
+    status ENUM('pending', 'sent', 'failed') NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,            -- 발송 시도 횟수
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sent_at DATETIME,
+    UNIQUE KEY uk_change_key (change_key),
+    INDEX idx_status_id (status, id)
+);
+
+-- sharded_mailer.py 워커들의 shard lease. 만료된 lease 의 shard 는 다른 워커가 가져간다.
+CREATE TABLE IF NOT EXISTS mailer_shard_leases (
+    shard_id INT NOT NULL PRIMARY KEY,          -- CRC32(eqp_id) % shard 수
+    owner VARCHAR(255),                         -- lease 를 가진 워커 이름 (없으면 NULL)
+    expires_at DATETIME(3),                     -- lease 만료 시간
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- val 이상 알람. mysql_setup/README_mysql 의 atlas_ecas_alarms (type, tm, grade) 에 설비 ID 와 값을 더했다.
+-- data_inserter.py 가 적재하는 tick 마다 alarm_engine.py 로 평가해 같은 트랜잭션에서 기록한다.
+CREATE TABLE IF NOT EXISTS atlas_ecas_alarms (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,       -- 자동 증가하는 고유 식별자 (PK)
+    eqp_id VARCHAR(255) NOT NULL,               -- 설비 ID
+    type VARCHAR(255) NOT NULL,                 -- 알람 종류 (HIGH, LOW, DRIFT_UP, DRIFT_DOWN, FLATLINE)
+    tm DATETIME NOT NULL,                       -- 알람이 발생한 tick 의 시간
+    grade INT NOT NULL,                         -- 1: 경고, 2: 심각
+    val FLOAT,                                  -- 알람을 일으킨 값
+    INDEX idx_alarms_eqp_tm (eqp_id, tm),
+    INDEX idx_alarms_tm (tm)
+);
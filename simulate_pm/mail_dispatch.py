@@ -0,0 +1,291 @@
+"""
+PM 모드 변경 알림 발송 (라인별 digest)
+
+mailer.py 가 한 주기에 감지한 변경을 설비마다 메일 한 통씩 보내지 않고,
+1. record_changes(): pm_notification_deliveries 테이블에 'pending' 으로 기록하고
+   (change_key 유니크 키로 같은 변경은 한 번만 기록된다. events / polling 양쪽에서 감지해도 한 건)
+2. dispatch_pending(): pending 변경을 라인별로 묶어 digest 한 통씩, 하나의 SMTP 연결로 보낸 뒤
+   'sent' 로 바꾼다.
+
+발송 기록이 DB 에 있으므로 재시작해도 이미 보낸 변경은 다시 보내지 않고, 보내지 못한 변경은
+다음 주기에 이어서 보낸다. (SMTP 전송 직후 'sent' 갱신 전에 중단된 digest 한 통만 중복될 수 있다)
+- 연결 오류: 서버 문제이므로 이번 주기의 발송을 멈춘다.
+- 수신 거부 등 메시지 하나의 문제: 그 digest 만 실패로 기록하고 다음 digest 를 보낸다.
+  MAX_DELIVERY_ATTEMPTS 번 실패한 변경은 'failed' 로 바꿔 더 이상 보내지 않는다. (뒤의 변경을 막지 않도록)
+
+설정(환경 변수):
+    ECAS_SMTP_HOST: SMTP 서버. 비어 있으면 실제로 보내지 않고 로그로만 남긴다. (기본)
+    ECAS_SMTP_PORT, ECAS_SMTP_USER, ECAS_SMTP_PASSWORD, ECAS_SMTP_STARTTLS(1/0)
+    ECAS_MAIL_FROM: 보내는 주소
+    ECAS_MAIL_TO: 기본 수신자 (쉼표 구분). 라인별 수신자는 LINE_RECIPIENTS 에 지정
+    ECAS_MAIL_RATE_PER_SECOND: 초당 최대 발송 수 (기본 2)
+    ECAS_MAIL_MAX_ATTEMPTS: 변경 하나를 'failed' 로 포기하기 전까지의 발송 시도 횟수 (기본 5)
+
+로컬 테스트용 SMTP 서버:
+    python -m aiosmtpd -n -l localhost:8025
+    ECAS_SMTP_HOST=localhost ECAS_SMTP_PORT=8025 python mailer.py
+"""
+import datetime
+import logging
+import os
+import smtplib
+import time
+from email.message import EmailMessage
+from email.utils import make_msgid
+
+from db import backoff_delays
+
+logger = logging.getLogger('Mailer.Dispatch')
+
+SMTP_HOST = os.environ.get('ECAS_SMTP_HOST', '')
+SMTP_PORT = int(os.environ.get('ECAS_SMTP_PORT', 25))
+SMTP_USER = os.environ.get('ECAS_SMTP_USER', '')
+SMTP_PASSWORD = os.environ.get('ECAS_SMTP_PASSWORD', '')
+SMTP_STARTTLS = os.environ.get('ECAS_SMTP_STARTTLS', '0') == '1'
+SMTP_TIMEOUT_SECONDS = 30
+MAIL_FROM = os.environ.get('ECAS_MAIL_FROM', 'ecas-monitor@localhost')
+DEFAULT_RECIPIENTS = [addr.strip() for addr in os.environ.get('ECAS_MAIL_TO', 'ecas-pm@localhost').split(',')
+                      if addr.strip()]
+MAIL_RATE_PER_SECOND = float(os.environ.get('ECAS_MAIL_RATE_PER_SECOND', 2))
+MAX_SEND_ATTEMPTS = 3   # digest 한 통을 보낼 때 연결 오류 재시도 횟수
+MAX_DELIVERY_ATTEMPTS = int(os.environ.get('ECAS_MAIL_MAX_ATTEMPTS', 5))   # 주기를 넘어 변경 하나를 보내 볼 횟수
+# 서버가 메시지를 거부한 경우 (연결은 살아 있으므로 다시 연결해 재시도하지 않고 다음 digest 로 넘어간다)
+REJECTION_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+# 설비 번호 기준 라인 구분 (EQP-001 ~ EQP-050 -> LINE-01, ...)
+EQUIPMENTS_PER_LINE = 50
+# 라인별 수신자. 없는 라인은 DEFAULT_RECIPIENTS 로 보낸다.
+LINE_RECIPIENTS = {}
+# 한 번에 읽는 pending 변경 수, digest 한 통에 담는 최대 변경 수
+PENDING_BATCH_SIZE = 5000
+MAX_CHANGES_PER_DIGEST = 500
+
+RECORD_CHANGE_QUERY = """
+INSERT IGNORE INTO pm_notification_deliveries (change_key, eqp_id, line, prev_pm_mode, pm_mode, tm)
+VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+FETCH_PENDING_QUERY = """
+SELECT id, eqp_id, line, prev_pm_mode, pm_mode, tm
+FROM pm_notification_deliveries
+WHERE status = 'pending' AND attempts < %s
+ORDER BY id
+LIMIT %s
+"""
+
+def format_pm_mode(mode):
+    """pm_mode 값을 사람이 읽기 쉬운 형태로 변환"""
+    if mode == 1:
+        return "ON"
+    if mode == 0:
+        return "OFF"
+    if mode is None:
+        return "RELEASED (NULL)"
+    return str(mode)
+
+def line_of(eqp_id):
+    """설비 ID 가 속한 라인 이름. 번호를 읽을 수 없는 ID 는 'LINE-ETC'."""
+    try:
+        number = int(eqp_id.rsplit('-', 1)[-1])
+    except ValueError:
+        return 'LINE-ETC'
+    return f"LINE-{(number - 1) // EQUIPMENTS_PER_LINE + 1:02d}"
+
+def recipients_for(line):
+    return LINE_RECIPIENTS.get(line, DEFAULT_RECIPIENTS)
+
+def change_key(eqp_id, pm_mode, tm):
+    """같은 변경(설비, 시간, 새 pm_mode)을 가리키는 유니크 키"""
+    tm_str = tm.strftime('%Y-%m-%d %H:%M:%S') if isinstance(tm, datetime.datetime) else str(tm)[:19]
+    return f"{eqp_id}|{tm_str}|{pm_mode}"
+
+def record_changes(conn, changes):
+    """(eqp_id, previous_pm, current_pm, tm) 목록을 발송 대기로 기록. 이미 있는 변경은 건너뛴다.
+
+    previous_pm 은 표시용 문자열로 저장한다. ('Not Available' 등 pm_mode 가 아닌 값도 올 수 있음)
+    """
+    if not changes:
+        return 0
+    rows = [
+        (change_key(eqp_id, current_pm, tm), eqp_id, line_of(eqp_id), format_pm_mode(previous_pm), current_pm, tm)
+        for eqp_id, previous_pm, current_pm, tm in changes
+    ]
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(RECORD_CHANGE_QUERY, rows)
+        recorded = cursor.rowcount
+        if not conn.autocommit:
+            conn.commit()
+        return recorded
+    finally:
+        cursor.close()
+
+def fetch_pending(conn, limit=PENDING_BATCH_SIZE):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(FETCH_PENDING_QUERY, (MAX_DELIVERY_ATTEMPTS, limit))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+def mark_attempt(conn, delivery_ids, sent):
+    """발송 시도 결과를 기록. sent=True 이면 'sent' 로 바꾸고 발송 시간을 남긴다.
+
+    실패로 MAX_DELIVERY_ATTEMPTS 번째 시도가 된 변경은 'failed' 로 바꾼다.
+    """
+    placeholders = ', '.join(['%s'] * len(delivery_ids))
+    if sent:
+        query = (f"UPDATE pm_notification_deliveries SET status = 'sent', sent_at = NOW(), attempts = attempts + 1 "
+                 f"WHERE id IN ({placeholders})")
+        params = tuple(delivery_ids)
+    else:
+        # MySQL 은 SET 을 왼쪽부터 적용하므로 status 를 attempts 보다 먼저 계산한다.
+        query = (f"UPDATE pm_notification_deliveries "
+                 f"SET status = IF(attempts + 1 >= %s, 'failed', status), attempts = attempts + 1 "
+                 f"WHERE id IN ({placeholders})")
+        params = (MAX_DELIVERY_ATTEMPTS, *delivery_ids)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        if not conn.autocommit:
+            conn.commit()
+    finally:
+        cursor.close()
+
+def build_digest(line, rows):
+    """라인 하나의 변경 목록(fetch_pending() 행)으로 digest 메일을 만든다."""
+    lines = [
+        f"- {tm:%Y-%m-%d %H:%M:%S}  {eqp_id}: {prev_pm_mode} -> {format_pm_mode(pm_mode)}"
+        for _, eqp_id, _, prev_pm_mode, pm_mode, tm in rows
+    ]
+    message = EmailMessage()
+    message['Subject'] = f"[ECAS PM 알림] {line} 설비 {len(rows)}대의 PM 모드 변경"
+    message['From'] = MAIL_FROM
+    message['To'] = ', '.join(recipients_for(line))
+    # 같은 digest 를 다시 보내더라도 수신 측에서 중복을 알아볼 수 있도록 첫/마지막 delivery id 를 넣는다.
+    message['Message-ID'] = make_msgid(idstring=f"ecas-pm-{rows[0][0]}-{rows[-1][0]}")
+    message.set_content(
+        "안녕하세요.\n\n"
+        f"{line} 의 PM 모드 변경 {len(rows)}건을 알려드립니다.\n\n"
+        + "\n".join(lines)
+        + "\n\n감사합니다.\nECAS 모니터링 시스템\n"
+    )
+    return message
+
+class SmtpSender:
+    """SMTP 연결 하나를 열어 두고 여러 digest 를 보낸다. 초당 MAIL_RATE_PER_SECOND 통으로 제한."""
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, rate_per_second=MAIL_RATE_PER_SECOND):
+        self.host = host
+        self.port = port
+        self.min_interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._smtp = None
+        self._last_sent = 0.0
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT_SECONDS)
+        if SMTP_STARTTLS:
+            smtp.starttls()
+        if SMTP_USER:
+            smtp.login(SMTP_USER, SMTP_PASSWORD)
+        return smtp
+
+    def send(self, message):
+        """message 를 보낸다. 연결이 끊겼으면 다시 연결해 MAX_SEND_ATTEMPTS 번까지 재시도.
+
+        서버가 메시지를 거부하면(REJECTION_ERRORS) 재시도하지 않고 바로 올린다. (연결은 그대로 쓴다)
+        """
+        wait = self._last_sent + self.min_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        delays = backoff_delays(base=1.0, cap=10.0)
+        for attempt in range(1, MAX_SEND_ATTEMPTS + 1):
+            try:
+                if self._smtp is None:
+                    self._smtp = self._connect()
+                self._smtp.send_message(message)
+                self._last_sent = time.monotonic()
+                return
+            except REJECTION_ERRORS:
+                self._last_sent = time.monotonic()
+                raise
+            except (smtplib.SMTPException, OSError) as e:
+                self._discard()
+                if attempt == MAX_SEND_ATTEMPTS:
+                    raise
+                delay = next(delays)
+                logger.warning(f"SMTP send failed (attempt {attempt}): {e}. Retrying in {delay:.1f} seconds...")
+                time.sleep(delay)
+
+    def _discard(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.close()
+            except OSError:
+                pass
+            self._smtp = None
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+class LogSender:
+    """SMTP 서버가 설정되지 않았을 때: digest 를 로그로만 남긴다."""
+
+    def send(self, message):
+        logger.info("--- SENDING EMAIL (SIMULATION) ---")
+        logger.info(f"To: {message['To']}")
+        logger.info(f"Subject: {message['Subject']}")
+        logger.info(f"Body: {message.get_content()}")
+
+    def close(self):
+        pass
+
+def make_sender():
+    return SmtpSender() if SMTP_HOST else LogSender()
+
+def dispatch_pending(conn, sender=None):
+    """pending 변경을 라인별 digest 로 보내고 (보낸 digest 수, 보낸 변경 수)를 반환
+
+    실패한 digest 의 변경은 pending 으로 남아 다음 호출에서 다시 보낸다. (MAX_DELIVERY_ATTEMPTS 번까지)
+    서버가 digest 를 거부하면 다음 digest 로 넘어가고, 연결 오류이면 이번 주기는 멈춘다.
+    """
+    rows = fetch_pending(conn)
+    if not rows:
+        return 0, 0
+    groups = {}
+    for row in rows:
+        groups.setdefault(row[2], []).append(row)
+
+    own_sender = sender is None
+    sender = sender or make_sender()
+    digests = 0
+    changes = 0
+    try:
+        for line, line_rows in groups.items():
+            for start in range(0, len(line_rows), MAX_CHANGES_PER_DIGEST):
+                chunk = line_rows[start:start + MAX_CHANGES_PER_DIGEST]
+                delivery_ids = [row[0] for row in chunk]
+                try:
+                    sender.send(build_digest(line, chunk))
+                except REJECTION_ERRORS as e:
+                    logger.error(f"Digest for {line} ({len(chunk)} changes) was rejected: {e}")
+                    mark_attempt(conn, delivery_ids, sent=False)
+                    continue
+                except (smtplib.SMTPException, OSError) as e:
+                    # 재시도까지 실패했으면 서버 문제일 가능성이 크므로 이번 주기는 여기서 멈춘다.
+                    logger.error(f"Failed to send digest for {line} ({len(chunk)} changes): {e}")
+                    mark_attempt(conn, delivery_ids, sent=False)
+                    return digests, changes
+                mark_attempt(conn, delivery_ids, sent=True)
+                digests += 1
+                changes += len(chunk)
+                logger.info(f"Sent digest for {line} ({len(chunk)} changes).")
+    finally:
+        if own_sender:
+            sender.close()
+    return digests, changes
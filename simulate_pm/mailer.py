@@ -1,203 +1,296 @@
 import mysql.connector
 import time
-import json
-from logging.handlers import TimedRotatingFileHandler
+import logging
 import os
 import datetime
+import sqlite3
 
-# --- DB 연결 정보 ---
-DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'ecas_user',
-    'password': 'ecas_password',
-    'database': 'ecas_db',
-    'port': 3306
-}
+from db import connection, execute_prepared, get_connection
+from db_log_handler import BufferedDBLogHandler
+from partition_maintenance import retention_cutoff
+from pm_events import commit_offset, fetch_events, fetch_shard_events, load_offset
+from mail_dispatch import dispatch_pending, record_changes
+from pm_state import load_pm_states
+from status_store import format_tm, open_status_store
 
 # --- 설정 ---
 SCRIPT_NAME = os.path.basename(__file__)
 CHECK_INTERVAL_SECONDS = 120  # 2분
-STATUS_FILE_PATH = 'data/equipment_status.json'
+# 마지막으로 알린 설비 상태 저장소: 'json' (data/equipment_status.json) 또는
+# 'sqlite' (data/equipment_status.db, 바뀐 설비만 기록하므로 설비 수가 많을 때 사용)
+STATUS_STORE_BACKEND = os.environ.get('ECAS_STATUS_BACKEND', 'json')
+# 상태 조회 방식 (ECAS_STATUS_SCAN_MODE)
+# - 'state_table': data_inserter.py 가 갱신하는 equipment_pm_state 테이블을 읽음 (설비 수만큼의 행)
+# - 'incremental': 시작 시 한 번만 전체 조회 후, 이후에는 high-water mark(id) 이후의 신규 행만 읽어 반영
+# - 'full_scan': 매 주기마다 ROW_NUMBER() 윈도우 쿼리로 전체 테이블을 조회 (기존 방식)
+STATUS_SCAN_MODE = os.environ.get('ECAS_STATUS_SCAN_MODE', 'state_table')
+# 동시에 커밋되는 트랜잭션 때문에 id 가 뒤늦게 보이는 경우를 대비해, 직전 high-water mark 에서
+# 이만큼 앞의 id 부터 다시 읽는다. (같은 행을 다시 반영해도 결과는 동일)
+CDC_OVERLAP_IDS = 1000
+# incremental 모드에서 신규 행을 찾을 때의 tm 하한 (현재 시간 기준). 파티션 프루닝용이며,
+# 이보다 오래된 tm 으로 뒤늦게 들어온 행(백필 등)은 어차피 최신 상태가 아니므로 읽지 않아도 된다.
+CDC_TM_LOOKBACK = datetime.timedelta(days=1)
+# 변경 감지 방식 (ECAS_CHANGE_DETECTION_MODE)
+# - 'events': data_inserter.py 가 같은 트랜잭션에서 기록하는 pm_mode_events 를 EVENT_POLL_SECONDS 마다
+#   offset 이후만 읽어 바로 알린다. (새 이벤트가 없으면 PK 조회 한 번으로 끝남)
+#   CHECK_INTERVAL_SECONDS 마다의 전체 상태 비교(polling)는 fallback 으로 계속 동작한다.
+# - 'polling': CHECK_INTERVAL_SECONDS 마다 전체 상태 비교만 한다. (기존 방식)
+CHANGE_DETECTION_MODE = os.environ.get('ECAS_CHANGE_DETECTION_MODE', 'events')
+EVENT_POLL_SECONDS = 2
+EVENT_CONSUMER_NAME = 'mailer'
 
-def log_to_db(conn, level, message, eqp_id=None):
-    """로그를 데이터베이스의 ecas_logs 테이블에 기록합니다."""
-    insert_query = """
-    INSERT INTO ecas_logs (log_level, source_script, eqp_id, message)
-    VALUES (%s, %s, %s, %s)
-    """
-    try:
-        cursor = conn.cursor()
-        cursor.execute(insert_query, (level, SCRIPT_NAME, eqp_id, message))
-        # autocommit=True 이므로 conn.commit()이 필요 없습니다.
-        cursor.close()
-    except mysql.connector.Error as err:
-        # DB 로깅 실패 시, 최후의 수단으로 표준 출력에 에러를 표시합니다.
-        print(f"!!! CRITICAL: FAILED TO LOG TO DATABASE: {err} !!!")
-        print(f"!!! ORIGINAL LOG: [{level}] {message} !!!")
+def setup_logger(name):
+    """ecas_logs 테이블에 배치로 기록하는 로거를 설정합니다."""
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        # 로그 전용 커넥션. 메인 루프의 커넥션과 별개로 백그라운드 스레드에서만 사용된다.
+        handler = BufferedDBLogHandler(
+            lambda: get_connection(autocommit=True, retry=False),
+            source_script=SCRIPT_NAME,
+            fallback_path='logs/mailer_fallback.log'
+        )
+        logger.addHandler(handler)
+    return logger
 
-def connect_to_db():
-    """데이터베이스에 연결을 시도하고 커넥션 객체를 반환"""
-    while True:
-        try:
-            # autocommit=True를 추가하여 각 쿼리가 독립적인 트랜잭션으로 실행되도록 함. get_latest_statuses 함수의 "트랜잭션 스냅샵" 문제 해결.
-            conn = mysql.connector.connect(**DB_CONFIG, autocommit=True)
-            log_to_db(conn, 'INFO', "Successfully connected to the database.")
-            return conn
-        except mysql.connector.Error as err:
-            print(f"Database connection failed: {err}")
-            print("Retrying in 10 seconds...")
-            time.sleep(10)
-
-def get_latest_statuses(conn):
-    """각 설비의 가장 최근 상태(pm_mode와 tm)를 조회"""
-    statuses = {}
-    query = """
-    WITH RankedLogs AS (
-        SELECT
-            eqp_id,
-            pm_mode,
-            tm,
-            ROW_NUMBER() OVER (PARTITION BY eqp_id ORDER BY tm DESC) as rn
-        FROM
-            atlas_ecas_raw
-        WHERE
-            pm_mode IS NOT NULL
-    )
-    SELECT
-        eqp_id,
-        pm_mode,
-        tm
-    FROM
-        RankedLogs
-    WHERE
-        rn = 1;
+logger = setup_logger('Mailer')
+
+def get_latest_statuses(conn, max_id=None, since=None):
+    """각 설비의 가장 최근 상태(pm_mode와 tm)를 조회
+
+    max_id 가 주어지면 id <= max_id 인 행만 대상으로 한다. (incremental 모드의 초기 스냅샷용)
+    since(기본: 보존 기간 시작) 이전의 행은 읽지 않으므로, 파티션 테이블에서는 보존 기간 안의 파티션만 읽는다.
     """
+    statuses = {}
+    since = since or retention_cutoff()
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(query)
-        for row in cursor.fetchall():
+        if max_id is None:
+            rows = execute_prepared(conn, 'latest_statuses', (since,))
+        else:
+            rows = execute_prepared(conn, 'latest_statuses_upto_id', (max_id, since))
+        for eqp_id, pm_mode, tm in rows:
             # pm_mode와 tm을 함께 딕셔너리로 저장
-            statuses[row['eqp_id']] = {
-                'pm_mode': row['pm_mode'],
-                'tm': row['tm']
+            statuses[eqp_id] = {
+                'pm_mode': pm_mode,
+                'tm': tm
             }
-            # log_to_db(f"Fetched status for eqp_id {row['eqp_id']}: pm_mode={row['pm_mode']}, tm={row['tm']}")
-        log_to_db(conn, 'INFO', f"Fetched latest statuses for {len(statuses)} equipments.")
+            # logger.info(f"Fetched status for eqp_id {eqp_id}: pm_mode={pm_mode}, tm={tm}")
+        logger.info(f"Fetched latest statuses for {len(statuses)} equipments.")
     except mysql.connector.Error as err:
-        log_to_db(conn, 'ERROR', f"Failed to fetch latest statuses: {err}")
-    finally:
-        if 'cursor' in locals() and cursor:
-            cursor.close()
+        logger.error(f"Failed to fetch latest statuses: {err}")
     return statuses
 
-def load_previous_statuses(conn):
-    """파일에서 이전 설비 상태를 로드"""
+def get_state_table_statuses(conn):
+    """equipment_pm_state 테이블에서 각 설비의 최신 상태를 조회"""
     try:
-        status_dir = os.path.dirname(STATUS_FILE_PATH)
-        if not os.path.exists(status_dir):
-            os.makedirs(status_dir)
-            
-        with open(STATUS_FILE_PATH, 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        log_to_db(conn, 'WARNING', "Status file not found. Starting with an empty state.")
-        return {}
-    except json.JSONDecodeError:
-        log_to_db(conn, 'ERROR', "Failed to decode status file. Starting with an empty state.")
+        statuses = load_pm_states(conn)
+        logger.info(f"Fetched latest statuses for {len(statuses)} equipments from equipment_pm_state.")
+        return statuses
+    except mysql.connector.Error as err:
+        logger.error(f"Failed to fetch statuses from equipment_pm_state: {err}")
         return {}
 
-def save_current_statuses(statuses, conn):
-    """현재 설비 상태를 파일에 저장"""
+def fetch_max_id(conn):
+    """atlas_ecas_raw 의 현재 최대 id 를 조회 (PK 이므로 인덱스만 읽는다)"""
+    return execute_prepared(conn, 'max_id')[0][0]
+
+def bootstrap_statuses(conn, since=None):
+    """incremental 모드의 시작점: high-water mark 와 그 시점까지의 최신 상태를 함께 조회
+
+    max_id 를 먼저 고정한 뒤 id <= max_id 로 윈도우 쿼리를 실행하므로,
+    두 쿼리 사이에 들어온 행은 다음 fetch_status_changes() 에서 빠짐없이 읽힌다.
+    """
+    try:
+        last_id = fetch_max_id(conn)
+    except mysql.connector.Error as err:
+        logger.error(f"Failed to fetch high-water mark: {err}")
+        return {}, None
+    statuses = get_latest_statuses(conn, max_id=last_id, since=since)
+    if not statuses and last_id:
+        # 스냅샷 조회가 실패한 경우, 다음 주기에 다시 시작한다.
+        return {}, None
+    logger.info(f"Incremental status tracking started at id {last_id}.")
+    return statuses, last_id
+
+def fold_status_row(statuses, eqp_id, pm_mode, tm):
+    """신규 행 하나를 상태 맵에 반영. 더 최신(tm 기준) 행일 때만 덮어쓴다."""
+    current = statuses.get(eqp_id)
+    if current is None or current['tm'] is None or tm >= current['tm']:
+        statuses[eqp_id] = {'pm_mode': pm_mode, 'tm': tm}
+
+def fetch_status_changes(conn, statuses, last_id, since=None):
+    """high-water mark 이후의 신규 행만 읽어 statuses 에 반영하고, 새 high-water mark 를 반환
+
+    한 주기의 비용은 전체 행 수가 아니라 그 사이 새로 들어온 행 수에 비례한다.
+    full_scan 과 마찬가지로 설비별로 tm 이 가장 큰 pm_mode 가 최종 상태가 된다.
+    since(기본: 현재 - CDC_TM_LOOKBACK) 이전 tm 의 행은 읽지 않는다.
+    """
+    since = since or datetime.datetime.now() - CDC_TM_LOOKBACK
+    try:
+        max_id = fetch_max_id(conn)
+        if max_id <= last_id:
+            return last_id
+        rows = execute_prepared(conn, 'new_status_rows', (max(0, last_id - CDC_OVERLAP_IDS), max_id, since))
+        for _, eqp_id, pm_mode, tm in rows:
+            fold_status_row(statuses, eqp_id, pm_mode, tm)
+        logger.info(f"Folded {len(rows)} new pm_mode rows (id {last_id} -> {max_id}).")
+        return max_id
+    except mysql.connector.Error as err:
+        logger.error(f"Failed to fetch new statuses: {err}")
+        return last_id
+
+def save_statuses(status_store):
+    """바뀐 상태가 있으면 저장소에 기록. 실패하면 False (변경분은 메모리에 남아 다음에 다시 기록한다)"""
     try:
-        with open(STATUS_FILE_PATH, 'w') as f:
-            # datetime 객체를 JSON으로 저장하기 위해 default=str 사용
-            json.dump(statuses, f, indent=4, default=str)
-        log_to_db(conn, 'INFO', f"Successfully saved current statuses to {STATUS_FILE_PATH}")
-    except IOError as e:
-        log_to_db(conn, 'ERROR', f"Failed to save statuses to file: {e}")
-
-def format_pm_mode(mode):
-    """pm_mode 값을 사람이 읽기 쉬운 형태로 변환"""
-    if mode == 1:
-        return "ON"
-    if mode == 0:
-        return "OFF"
-    if mode is None:
-        return "RELEASED (NULL)"
-    return str(mode)
+        status_store.flush()
+        return True
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"Failed to save statuses to {status_store.path}: {e}")
+        return False
+
+def fetch_current_statuses(conn, tracker):
+    """STATUS_SCAN_MODE 에 따라 현재 설비 상태를 조회. tracker 는 incremental 모드의 상태 맵/high-water mark"""
+    if STATUS_SCAN_MODE == 'state_table':
+        return get_state_table_statuses(conn)
+    if STATUS_SCAN_MODE == 'incremental':
+        if tracker['last_id'] is None:
+            tracker['statuses'], tracker['last_id'] = bootstrap_statuses(conn)
+        else:
+            tracker['last_id'] = fetch_status_changes(conn, tracker['statuses'], tracker['last_id'])
+        return dict(tracker['statuses'])
+    return get_latest_statuses(conn)
+
+def check_status_changes(conn, status_store, current_statuses):
+    """저장된 이전 상태와 현재 상태를 비교해 변경된 설비를 발송 대기로 기록하고, 현재 상태를 저장"""
+    changes = []
+    for eqp_id, current_status in current_statuses.items():
+        previous_status = status_store.get(eqp_id)
+        
+        current_pm = current_status.get('pm_mode')
+        previous_pm = previous_status.get('pm_mode', 'Not Available')
+        # logger.info(f"Equipment {eqp_id}: Previous PM: {previous_pm}, Current PM: {current_pm}")
+        
+        if previous_pm != current_pm:
+            changes.append((eqp_id, previous_pm, current_pm, current_status.get('tm')))
+
+    # 발송 대기 기록이 먼저 커밋되어야, 상태를 저장한 뒤 중단되어도 알림이 빠지지 않는다.
+    record_detected_changes(conn, changes)
+    # 최신 상태를 저장 (바뀐 설비가 없으면 쓰지 않음)
+    status_store.replace(current_statuses)
+    save_statuses(status_store)
+
+def record_detected_changes(conn, changes):
+    """감지한 변경을 발송 대기로 기록 (실제 발송은 주기마다 dispatch_pending() 이 라인별로 묶어서 한다)"""
+    if changes:
+        recorded = record_changes(conn, changes)
+        logger.warning(f"Detected {len(changes)} pm_mode changes ({recorded} new).")
+
+def consume_events(conn, offset, status_store, consumer=EVENT_CONSUMER_NAME, shard=None):
+    """offset 이후의 PM 모드 변경 이벤트를 처리하고 새 offset 을 반환
+
+    변경을 발송 대기로 기록하고, 상태 저장소에 반영해 저장한 뒤에 offset 을 커밋한다.
+    그 사이에 중단되어 같은 이벤트를 다시 읽더라도, 저장된 상태가 이미 새 pm_mode 를 가지고 있고
+    발송 대기 테이블도 같은 변경을 한 번만 기록하므로 알림이 다시 나가지 않는다.
+    polling 으로 이미 더 최신 상태를 반영한 설비의 (더 오래된) 이벤트는 무시한다.
+    shard=(shard 번호, 전체 shard 수) 이면 그 shard 설비의 이벤트만 처리한다.
+    """
+    if shard is None:
+        events = fetch_events(conn, offset)
+        new_offset = events[-1][0] if events else offset
+    else:
+        events, new_offset = fetch_shard_events(conn, offset, *shard)
+    if new_offset == offset:
+        return offset
+
+    changes = []
+    updates = {}
+    for event_id, eqp_id, prev_pm_mode, pm_mode, tm in events:
+        known = updates.get(eqp_id) or status_store.get(eqp_id)
+        if known and known.get('tm') and format_tm(tm) < known['tm']:
+            continue
+        previous_pm = known.get('pm_mode', 'Not Available')
+        if previous_pm != pm_mode:
+            changes.append((eqp_id, previous_pm, pm_mode, tm))
+        updates[eqp_id] = {'pm_mode': pm_mode, 'tm': format_tm(tm)}
+
+    record_detected_changes(conn, changes)
+    for eqp_id, status in updates.items():
+        status_store.set(eqp_id, status['pm_mode'], status['tm'])
+    if not save_statuses(status_store):
+        # 저장하지 못한 구간은 offset 을 옮기지 않고 다음 주기에 다시 읽는다.
+        return offset
+
+    if not commit_offset(conn, consumer, offset, new_offset):
+        logger.warning(f"Event offset of '{consumer}' was moved by another consumer. Reloading offset.")
+        return load_offset(conn, consumer)
+    if events:
+        logger.info(f"Processed {len(events)} pm_mode events for '{consumer}' (offset {offset} -> {new_offset}).")
+    return new_offset
+
+def poll_events(status_store, event_offset, consumer=EVENT_CONSUMER_NAME, shard=None):
+    """events 모드의 한 주기: offset 이후 이벤트를 처리하고 새 offset 을 반환 (offset 이 None 이면 DB 에서 읽음)"""
+    # 주기마다 풀에서 상태가 확인된 커넥션을 꺼내 쓰고 반납한다. (끊겼으면 백오프하며 재연결)
+    with connection(autocommit=True) as db_connection:
+        if event_offset is None:
+            event_offset = load_offset(db_connection, consumer)
+        return consume_events(db_connection, event_offset, status_store, consumer, shard)
+
+def run_status_check(status_store, tracker):
+    """전체 상태 비교 한 번: polling 모드의 본 경로이자, events 모드의 fallback"""
+    logger.info("Checking for pm_mode changes...")
+    with connection(autocommit=True) as db_connection:
+        current_statuses = fetch_current_statuses(db_connection, tracker)
+        if current_statuses:
+            check_status_changes(db_connection, status_store, current_statuses)
+            logger.info(f"Check complete. Next check in {CHECK_INTERVAL_SECONDS} seconds.")
+        else:
+            logger.warning("Could not fetch current statuses. Skipping this cycle.")
+
+def dispatch_notifications():
+    """지금까지 쌓인 발송 대기 변경을 라인별 digest 로 보낸다. (이전에 실패한 것 포함)"""
+    with connection(autocommit=True) as db_connection:
+        return dispatch_pending(db_connection)
 
 def main():
     """메인 실행 함수"""
-    db_connection = connect_to_db()
-    log_to_db(db_connection, 'INFO', f"Mailer process '{SCRIPT_NAME}' started.")
+    logger.info(f"Mailer process '{SCRIPT_NAME}' started. "
+                f"(detection: {CHANGE_DETECTION_MODE}, status scan: {STATUS_SCAN_MODE})")
+
+    # 마지막으로 알린 상태. 파일은 여기서 한 번만 읽고, 이후에는 메모리 상태를 기준으로 비교한다.
+    status_store = open_status_store(STATUS_STORE_BACKEND)
+    logger.info(f"Loaded {len(status_store)} statuses from {status_store.path}")
+    # incremental 모드에서 사용하는 메모리 상의 상태 맵과 high-water mark
+    tracker = {'statuses': {}, 'last_id': None}
+    event_offset = None
+    next_check_at = 0.0
 
     while True:
         try:
-            if not db_connection.is_connected():
-                log_to_db(db_connection, 'WARNING', "Database connection lost. Reconnecting...")
-                db_connection = connect_to_db()
-
-            log_to_db(db_connection, 'INFO', "Checking for pm_mode changes...")
-
-            previous_statuses = load_previous_statuses(db_connection)
-            current_statuses = get_latest_statuses(db_connection)
-
-            if not current_statuses:
-                log_to_db(db_connection, 'WARNING', "Could not fetch current statuses. Skipping this cycle.")
-                time.sleep(CHECK_INTERVAL_SECONDS)
-                continue
-
-            # 변경된 설비 감지 및 메일 본문 생성
-            for eqp_id, current_status in current_statuses.items():
-                previous_status = previous_statuses.get(eqp_id, {})
-                
-                current_pm = current_status.get('pm_mode')
-                previous_pm = previous_status.get('pm_mode', 'Not Available')
-                # log_to_db(f"Equipment {eqp_id}: Previous PM: {previous_pm}, Current PM: {current_pm}")
-                
-                if previous_pm != current_pm:
-                    change_time_str = current_status.get('tm', datetime.datetime.now().isoformat())
-                    if isinstance(change_time_str, datetime.datetime):
-                         change_time_str = change_time_str.strftime('%Y-%m-%d %H:%M:%S')
-
-                    log_to_db(db_connection, 'WARNING', f"Change detected for {eqp_id}: from '{previous_pm}' to '{current_pm}'")
-
-                    # --- 메일 본문 생성 ---
-                    mail_subject = f"[ECAS PM 알림] 설비 {eqp_id}의 PM 모드 변경"
-                    mail_body = f"""
-                    안녕하세요.
-                    
-                    설비 {eqp_id}의 PM 모드가 변경되어 알림 메일을 보냅니다.
-                    
-                    - 변경 시간: {change_time_str}
-                    - 설비 ID: {eqp_id}
-                    - 이전 상태: {format_pm_mode(previous_pm)}
-                    - 현재 상태: {format_pm_mode(current_pm)}
-                    
-                    감사합니다.
-                    ECAS 모니터링 시스템
-                    """
-
-                    log_to_db(db_connection, 'INFO', "--- SENDING EMAIL (SIMULATION) ---")
-                    log_to_db(db_connection, 'INFO', f"Subject: {mail_subject}")
-                    log_to_db(db_connection, 'INFO', f"Body: {mail_body}")
-
-            # 최신 상태를 파일에 저장
-            save_current_statuses(current_statuses, db_connection)
-
-            log_to_db(db_connection, 'INFO', f"Check complete. Waiting for {CHECK_INTERVAL_SECONDS} seconds.")
-            time.sleep(CHECK_INTERVAL_SECONDS)
+            if CHANGE_DETECTION_MODE == 'events':
+                event_offset = poll_events(status_store, event_offset)
+
+            if time.monotonic() >= next_check_at:
+                run_status_check(status_store, tracker)
+                next_check_at = time.monotonic() + CHECK_INTERVAL_SECONDS
+
+            dispatch_notifications()
+
+            if CHANGE_DETECTION_MODE == 'events':
+                time.sleep(EVENT_POLL_SECONDS)
+            else:
+                time.sleep(max(0.0, next_check_at - time.monotonic()))
 
         except KeyboardInterrupt:
-            log_to_db(db_connection, 'WARNING', "Process stopped by user.")
+            logger.warning("Process stopped by user.")
             break
         except Exception as e:
-            log_to_db(db_connection, 'ERROR', f"An unexpected error occurred: {e}", exc_info=True)
+            logger.error(f"An unexpected error occurred: {e}", exc_info=True)
             time.sleep(60)
 
-    if db_connection and db_connection.is_connected():
-        log_to_db(db_connection, 'INFO', "Database connection closed.")
-        db_connection.close()
+    save_statuses(status_store)
+    status_store.close()
+    # 버퍼에 남은 로그를 모두 기록한 뒤 종료
+    logging.shutdown()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,209 @@
+"""
+atlas_ecas_raw 시간 파티셔닝 및 보존 기간 관리
+
+atlas_ecas_raw 를 tm 기준 RANGE COLUMNS 파티션(일 또는 월 단위)으로 바꾸고,
+앞으로 쓸 파티션은 미리 만들고 보존 기간이 지난 파티션은 DROP PARTITION 으로 지운다.
+(대량 DELETE 없이 메타데이터 작업으로 오래된 데이터를 정리)
+
+    python partition_maintenance.py migrate   # 기존 테이블을 파티션 테이블로 변환 (1회)
+    python partition_maintenance.py maintain  # 미래 파티션 생성 + 만료 파티션 삭제 (1회 실행, cron 용)
+    python partition_maintenance.py run       # maintain 을 MAINTENANCE_INTERVAL_SECONDS 마다 반복
+
+설정(환경 변수):
+    ECAS_PARTITION_GRANULARITY: 'day' 또는 'month' (기본 day)
+    ECAS_RETENTION_DAYS: 보존 기간 일수 (기본 90)
+    ECAS_PRECREATE_PARTITIONS: 미리 만들어 둘 미래 파티션 개수 (기본 7)
+    ECAS_ARCHIVE_BEFORE_DROP: '1' 이면 만료 파티션을 지우기 전에 Parquet 아카이브(archive.py)로 내보낸다.
+"""
+import datetime
+import logging
+import os
+import sys
+import time
+
+import mysql.connector
+
+from db import connection
+
+logger = logging.getLogger('PartitionMaintenance')
+
+PARTITION_GRANULARITY = os.environ.get('ECAS_PARTITION_GRANULARITY', 'day')
+RETENTION_DAYS = int(os.environ.get('ECAS_RETENTION_DAYS', 90))
+PRECREATE_PARTITIONS = int(os.environ.get('ECAS_PRECREATE_PARTITIONS', 7))
+ARCHIVE_BEFORE_DROP = os.environ.get('ECAS_ARCHIVE_BEFORE_DROP', '0') == '1'
+MAINTENANCE_INTERVAL_SECONDS = 3600  # 1시간
+
+TABLE_NAME = 'atlas_ecas_raw'
+FUTURE_PARTITION = 'p_future'
+
+def retention_cutoff(now=None):
+    """이 시간보다 오래된 데이터는 보존 기간이 지났다. 조회 쿼리의 tm 하한으로도 사용한다."""
+    now = now or datetime.datetime.now()
+    return now - datetime.timedelta(days=RETENTION_DAYS)
+
+def period_start(tm, granularity=PARTITION_GRANULARITY):
+    """tm 이 속한 파티션 구간의 시작 시간"""
+    if granularity == 'month':
+        return datetime.datetime(tm.year, tm.month, 1)
+    return datetime.datetime(tm.year, tm.month, tm.day)
+
+def next_period(start, granularity=PARTITION_GRANULARITY):
+    if granularity == 'month':
+        return datetime.datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + datetime.timedelta(days=1)
+
+def partition_name(start):
+    return f"p{start:%Y%m%d}"
+
+def partition_clause(start, granularity=PARTITION_GRANULARITY):
+    """[start, 다음 구간 시작) 을 담는 파티션 정의"""
+    upper = next_period(start, granularity)
+    return f"PARTITION {partition_name(start)} VALUES LESS THAN ('{upper:%Y-%m-%d %H:%M:%S}')"
+
+def list_partitions(conn):
+    """(파티션 이름, 상한 datetime 또는 None(MAXVALUE)) 목록. 파티션 테이블이 아니면 빈 목록."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+        """, (TABLE_NAME,))
+        partitions = []
+        for name, description in cursor.fetchall():
+            if description == 'MAXVALUE':
+                partitions.append((name, None))
+            else:
+                partitions.append((name, datetime.datetime.fromisoformat(description.strip("'"))))
+        return partitions
+    finally:
+        cursor.close()
+
+def migrate(conn):
+    """기존 atlas_ecas_raw 를 tm 기준 파티션 테이블로 변환
+
+    MySQL 파티션 테이블은 모든 유니크 키에 파티션 키가 있어야 하므로 PK 를 (id, tm) 으로 바꾼다.
+    (eqp_id, tm) 유니크 제약과 (eqp_id, tm DESC) 인덱스는 그대로 유지된다.
+    """
+    if list_partitions(conn):
+        logger.info(f"{TABLE_NAME} is already partitioned.")
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT MIN(tm) FROM {TABLE_NAME}")
+        oldest = cursor.fetchone()[0] or datetime.datetime.now()
+        start = period_start(max(oldest, retention_cutoff()))
+        last = period_start(datetime.datetime.now())
+        for _ in range(PRECREATE_PARTITIONS):
+            last = next_period(last)
+
+        clauses = []
+        # 보존 기간 이전 데이터는 첫 파티션에 모아 두었다가 다음 maintain 에서 삭제된다.
+        clauses.append(f"PARTITION p_history VALUES LESS THAN ('{start:%Y-%m-%d %H:%M:%S}')")
+        current = start
+        while current <= last:
+            clauses.append(partition_clause(current))
+            current = next_period(current)
+        clauses.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+
+        logger.info(f"Changing primary key of {TABLE_NAME} to (id, tm)...")
+        cursor.execute(f"ALTER TABLE {TABLE_NAME} DROP PRIMARY KEY, ADD PRIMARY KEY (id, tm)")
+        logger.info(f"Partitioning {TABLE_NAME} into {len(clauses)} partitions by {PARTITION_GRANULARITY}...")
+        cursor.execute(
+            f"ALTER TABLE {TABLE_NAME} PARTITION BY RANGE COLUMNS(tm) (\n    "
+            + ",\n    ".join(clauses) + "\n)"
+        )
+    finally:
+        cursor.close()
+
+def archive_partitions(conn, names, upper):
+    """삭제할 파티션의 데이터를 Parquet 아카이브로 내보낸다. 실패하면 False (이번에는 삭제하지 않음)"""
+    # pyarrow 는 아카이브를 켤 때만 필요하다.
+    import archive
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT MIN(tm) FROM {TABLE_NAME} PARTITION ({', '.join(names)})")
+        oldest = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+    if oldest is None:
+        return True
+    try:
+        exported = archive.export_range(conn, oldest, upper)
+    except (OSError, mysql.connector.Error) as e:
+        logger.error(f"Failed to archive partitions {', '.join(names)}: {e}. Skipping drop.")
+        return False
+    logger.info(f"Archived {exported} days ({oldest:%Y-%m-%d} ~ {upper:%Y-%m-%d}) before dropping partitions.")
+    return True
+
+def maintain(conn, now=None):
+    """미래 파티션을 PRECREATE_PARTITIONS 개까지 만들고, 보존 기간이 지난 파티션을 삭제"""
+    now = now or datetime.datetime.now()
+    partitions = list_partitions(conn)
+    if not partitions:
+        logger.warning(f"{TABLE_NAME} is not partitioned. Run 'python partition_maintenance.py migrate' first.")
+        return
+    cursor = conn.cursor()
+    try:
+        # 1. 미래 파티션 생성: 비어 있는 p_future 를 쪼개므로 데이터 이동이 없다.
+        bounded = [upper for _, upper in partitions if upper is not None]
+        next_start = max(bounded) if bounded else period_start(now)
+        target = period_start(now)
+        for _ in range(PRECREATE_PARTITIONS):
+            target = next_period(target)
+        clauses = []
+        while next_start <= target:
+            clauses.append(partition_clause(next_start))
+            next_start = next_period(next_start)
+        if clauses:
+            clauses.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+            cursor.execute(
+                f"ALTER TABLE {TABLE_NAME} REORGANIZE PARTITION {FUTURE_PARTITION} INTO (\n    "
+                + ",\n    ".join(clauses) + "\n)"
+            )
+            logger.info(f"Created {len(clauses) - 1} future partitions.")
+
+        # 2. 만료 파티션 삭제: 상한이 보존 기간 시작 이전인 파티션은 모든 행이 만료되었다.
+        cutoff = retention_cutoff(now)
+        expired = [name for name, upper in partitions if upper is not None and upper <= cutoff]
+        if expired and ARCHIVE_BEFORE_DROP:
+            if not archive_partitions(conn, expired, max(upper for name, upper in partitions if name in expired)):
+                return
+        if expired:
+            cursor.execute(f"ALTER TABLE {TABLE_NAME} DROP PARTITION {', '.join(expired)}")
+            logger.info(f"Dropped {len(expired)} expired partitions: {', '.join(expired)}")
+    finally:
+        cursor.close()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    command = sys.argv[1] if len(sys.argv) == 2 else None
+    if command not in ('migrate', 'maintain', 'run'):
+        print("Usage: python partition_maintenance.py [migrate|maintain|run]")
+        sys.exit(1)
+
+    if command == 'migrate':
+        with connection() as conn:
+            migrate(conn)
+            maintain(conn)
+        return
+    if command == 'maintain':
+        with connection() as conn:
+            maintain(conn)
+        return
+
+    while True:
+        try:
+            with connection() as conn:
+                maintain(conn)
+            time.sleep(MAINTENANCE_INTERVAL_SECONDS)
+        except KeyboardInterrupt:
+            logger.info("Process stopped by user.")
+            break
+        except mysql.connector.Error as err:
+            logger.error(f"Partition maintenance failed: {err}")
+            time.sleep(60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+PM 모드 변경 이벤트 outbox (pm_mode_events) 와 소비자 offset (event_consumer_offsets)
+
+- 생산자(data_inserter.py): atlas_ecas_raw 삽입과 같은 트랜잭션에서 publish_events() 로 변경을 기록한다.
+  따라서 원본에 반영된 변경은 반드시 이벤트로도 남고, 롤백된 변경은 이벤트도 남지 않는다.
+- 소비자(mailer.py): load_offset() 이후의 이벤트를 fetch_events() 로 event_id 순서대로 읽어 처리하고,
+  처리를 마친 마지막 event_id 를 commit_offset() 으로 저장한다.
+  commit_offset() 은 이전 offset 이 그대로일 때만 갱신하므로(compare-and-set), 같은 이름의 소비자가
+  둘 떠 있어도 같은 구간을 두 번 커밋하지 않는다.
+
+event_id 는 PK 이므로 새 이벤트가 없을 때의 조회는 인덱스 한 번 확인으로 끝난다.
+"""
+PUBLISH_EVENT_QUERY = """
+INSERT INTO pm_mode_events (eqp_id, prev_pm_mode, pm_mode, tm)
+VALUES (%s, %s, %s, %s)
+"""
+
+FETCH_EVENTS_QUERY = """
+SELECT event_id, eqp_id, prev_pm_mode, pm_mode, tm
+FROM pm_mode_events
+WHERE event_id > %s
+ORDER BY event_id
+LIMIT %s
+"""
+
+FETCH_SHARD_EVENTS_QUERY = """
+SELECT event_id, eqp_id, prev_pm_mode, pm_mode, tm
+FROM pm_mode_events
+WHERE event_id > %s AND event_id <= %s AND CRC32(eqp_id) %% %s = %s
+ORDER BY event_id
+LIMIT %s
+"""
+
+EVENT_BATCH_SIZE = 1000
+
+def publish_events(cursor, events):
+    """(eqp_id, prev_pm_mode, pm_mode, tm) 목록을 outbox 에 기록. 커밋은 호출한 쪽에서 한다."""
+    if events:
+        cursor.executemany(PUBLISH_EVENT_QUERY, events)
+
+def load_offset(conn, consumer):
+    """소비자의 마지막 처리 event_id. 처음이면 0 으로 등록한다."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "INSERT IGNORE INTO event_consumer_offsets (consumer, last_event_id) VALUES (%s, 0)",
+            (consumer,)
+        )
+        cursor.execute("SELECT last_event_id FROM event_consumer_offsets WHERE consumer = %s", (consumer,))
+        offset = cursor.fetchone()[0]
+        if not conn.autocommit:
+            conn.commit()
+        return offset
+    finally:
+        cursor.close()
+
+def fetch_events(conn, after_event_id, limit=EVENT_BATCH_SIZE):
+    """after_event_id 이후의 이벤트를 event_id 순서로 최대 limit 개 반환"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(FETCH_EVENTS_QUERY, (after_event_id, limit))
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+def fetch_shard_events(conn, after_event_id, shard, num_shards, limit=EVENT_BATCH_SIZE):
+    """CRC32(eqp_id) % num_shards == shard 인 설비의 이벤트만 읽는다. (sharded_mailer.py 용)
+
+    반환: (이벤트 목록, 확인을 마친 마지막 event_id)
+    다른 shard 의 이벤트만 있는 구간도 확인한 만큼 offset 을 옮길 수 있도록, 조회 범위를
+    현재 최대 event_id 까지로 고정하고 그 값을 함께 반환한다.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COALESCE(MAX(event_id), 0) FROM pm_mode_events")
+        upto_event_id = cursor.fetchone()[0]
+        if upto_event_id <= after_event_id:
+            return [], after_event_id
+        cursor.execute(FETCH_SHARD_EVENTS_QUERY, (after_event_id, upto_event_id, num_shards, shard, limit))
+        events = cursor.fetchall()
+        if len(events) == limit:
+            upto_event_id = events[-1][0]
+        return events, upto_event_id
+    finally:
+        cursor.close()
+
+def commit_offset(conn, consumer, expected_event_id, new_event_id):
+    """offset 을 expected_event_id -> new_event_id 로 옮긴다. 다른 소비자가 먼저 옮겼으면 False."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "UPDATE event_consumer_offsets SET last_event_id = %s WHERE consumer = %s AND last_event_id = %s",
+            (new_event_id, consumer, expected_event_id)
+        )
+        updated = cursor.rowcount == 1
+        if not conn.autocommit:
+            conn.commit()
+        return updated
+    finally:
+        cursor.close()
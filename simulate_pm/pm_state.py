@@ -0,0 +1,88 @@
+"""
+equipment_pm_state 테이블(설비별 최신 PM 모드) 관리 모듈
+
+- data_inserter.py 는 atlas_ecas_raw 삽입과 같은 트랜잭션에서 upsert_pm_states() 로 이 테이블을 갱신한다.
+- data_inserter.py / mailer.py 는 load_pm_states() 로 설비 수만큼의 행만 읽는다.
+- 크래시 등으로 테이블이 어긋났을 때는 아래 명령으로 atlas_ecas_raw 에서 다시 계산한다.
+
+    python pm_state.py rebuild
+"""
+import sys
+
+import mysql.connector
+
+from db import connection, execute_prepared
+
+# 더 최신(tm 기준) 값일 때만 덮어쓴다. pm_mode 를 먼저 갱신해야 비교 시점의 tm 이 기존 값이다.
+UPSERT_PM_STATE_QUERY = """
+INSERT INTO equipment_pm_state (eqp_id, pm_mode, tm)
+VALUES (%s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    pm_mode = IF(VALUES(tm) >= tm, VALUES(pm_mode), pm_mode),
+    tm = GREATEST(tm, VALUES(tm))
+"""
+
+REBUILD_PM_STATE_QUERY = """
+INSERT INTO equipment_pm_state (eqp_id, pm_mode, tm)
+WITH RankedLogs AS (
+    SELECT
+        eqp_id,
+        pm_mode,
+        tm,
+        ROW_NUMBER() OVER (PARTITION BY eqp_id ORDER BY tm DESC) as rn
+    FROM
+        atlas_ecas_raw
+    WHERE
+        pm_mode IS NOT NULL
+)
+SELECT
+    eqp_id,
+    pm_mode,
+    tm
+FROM
+    RankedLogs
+WHERE
+    rn = 1
+"""
+
+def upsert_pm_states(cursor, records):
+    """(eqp_id, pm_mode, tm) 목록을 equipment_pm_state 에 반영. 커밋은 호출한 쪽에서 한다."""
+    if records:
+        cursor.executemany(UPSERT_PM_STATE_QUERY, records)
+
+def load_pm_states(conn):
+    """equipment_pm_state 전체를 {eqp_id: {'pm_mode': ..., 'tm': ...}} 형태로 반환"""
+    return {
+        eqp_id: {'pm_mode': pm_mode, 'tm': tm}
+        for eqp_id, pm_mode, tm in execute_prepared(conn, 'load_pm_state')
+    }
+
+def rebuild_pm_state(conn):
+    """atlas_ecas_raw 전체에서 equipment_pm_state 를 다시 계산 (하나의 트랜잭션으로 교체)"""
+    cursor = conn.cursor()
+    try:
+        # autocommit 연결에서도 DELETE 와 INSERT 가 하나의 트랜잭션으로 묶이도록 한다.
+        if not conn.in_transaction:
+            conn.start_transaction()
+        cursor.execute("DELETE FROM equipment_pm_state")
+        cursor.execute(REBUILD_PM_STATE_QUERY)
+        row_count = cursor.rowcount
+        conn.commit()
+        return row_count
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] != 'rebuild':
+        print("Usage: python pm_state.py rebuild")
+        sys.exit(1)
+
+    with connection() as conn:
+        row_count = rebuild_pm_state(conn)
+    print(f"Rebuilt equipment_pm_state with {row_count} equipments.")
+
+if __name__ == "__main__":
+    main()
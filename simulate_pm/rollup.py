@@ -0,0 +1,203 @@
+"""
+atlas_ecas_raw 다운샘플링 롤업 (5분 원본 -> 시간 -> 일)
+
+설비별 시간/일 구간마다 min, max, 합계/개수(평균), 마지막 값, PM 모드 기록 횟수를 유지한다.
+
+- accumulate_rollups(): data_inserter.py 가 방금 넣은 행을 메모리에서 집계해 롤업에 더한다.
+  (원본 테이블을 다시 읽지 않으며, 원본 삽입과 같은 트랜잭션에서 실행한다)
+- rebuild_rollups(): 지정 구간(일 단위로 확장)을 원본에서 다시 계산한다. 백필 후 또는 복구용.
+- choose_resolution() / query_series(): 조회 구간과 차트 픽셀 폭에 맞는 가장 거친 해상도를 골라 읽는다.
+  ecas_chart/batch_charts.py 의 DB 차트가 여러 설비를 한 번에 읽을 때는 query_series_many() 를 쓴다.
+
+    python rollup.py rebuild --start 2025-01-01 --end 2025-02-01
+"""
+import argparse
+import datetime
+
+from db import connection
+
+RAW_STEP = datetime.timedelta(minutes=5)
+
+# 해상도 이름 -> (테이블, 구간 길이, 구간 시작 SQL 식)
+ROLLUPS = {
+    'hourly': ('atlas_ecas_rollup_hourly', datetime.timedelta(hours=1), "DATE_FORMAT(tm, '%%Y-%%m-%%d %%H:00:00')"),
+    'daily': ('atlas_ecas_rollup_daily', datetime.timedelta(days=1), "DATE(tm)"),
+}
+# 픽셀당 최소 포인트 수. 이보다 포인트가 적어지는 해상도는 고르지 않는다.
+MIN_POINTS_PER_PIXEL = 0.5
+
+# 기존 행과 새 집계를 합친다. last_val 은 last_tm 을 갱신하기 전에 비교해야 한다.
+# 새 값은 행 별칭(new)으로 참조한다. (VALUES(col) 은 MySQL 8.0.20 부터 deprecated 라 문장마다 경고가 난다)
+MERGE_CLAUSE = """
+AS new
+ON DUPLICATE KEY UPDATE
+    val_min = COALESCE(LEAST(val_min, new.val_min), val_min, new.val_min),
+    val_max = COALESCE(GREATEST(val_max, new.val_max), val_max, new.val_max),
+    val_sum = val_sum + new.val_sum,
+    val_count = val_count + new.val_count,
+    last_val = IF(new.last_tm IS NOT NULL AND (last_tm IS NULL OR new.last_tm >= last_tm),
+                  new.last_val, last_val),
+    last_tm = COALESCE(GREATEST(last_tm, new.last_tm), last_tm, new.last_tm),
+    pm_on_count = pm_on_count + new.pm_on_count,
+    pm_off_count = pm_off_count + new.pm_off_count
+"""
+
+COLUMNS = "(eqp_id, bucket, val_min, val_max, val_sum, val_count, last_tm, last_val, pm_on_count, pm_off_count)"
+
+def bucket_start(tm, resolution):
+    if resolution == 'daily':
+        return tm.replace(hour=0, minute=0, second=0, microsecond=0)
+    return tm.replace(minute=0, second=0, microsecond=0)
+
+def aggregate_records(records, resolution):
+    """(eqp_id, tm, val, pm_mode) 목록을 (eqp_id, bucket) 별 롤업 행으로 집계"""
+    groups = {}
+    for eqp_id, tm, val, pm_mode in records:
+        key = (eqp_id, bucket_start(tm, resolution))
+        agg = groups.get(key)
+        if agg is None:
+            agg = groups[key] = [None, None, 0.0, 0, None, None, 0, 0]
+        if val is not None:
+            agg[0] = val if agg[0] is None else min(agg[0], val)
+            agg[1] = val if agg[1] is None else max(agg[1], val)
+            agg[2] += val
+            agg[3] += 1
+            if agg[4] is None or tm >= agg[4]:
+                agg[4], agg[5] = tm, val
+        if pm_mode == 1:
+            agg[6] += 1
+        elif pm_mode == 0:
+            agg[7] += 1
+    return [key + tuple(agg) for key, agg in groups.items()]
+
+def accumulate_rollups(cursor, records):
+    """방금 삽입한 원본 행을 시간/일 롤업에 더한다. 커밋은 호출한 쪽에서 한다.
+
+    같은 행을 두 번 넘기면 두 번 더해지므로, 실제로 삽입된 행만 넘겨야 한다.
+    """
+    for resolution, (table, _, _) in ROLLUPS.items():
+        rows = aggregate_records(records, resolution)
+        if rows:
+            cursor.executemany(
+                f"INSERT INTO {table} {COLUMNS} VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)" + MERGE_CLAUSE,
+                rows
+            )
+
+def rebuild_rollups(conn, start, end, eqp_ids=None):
+    """[start, end] 를 포함하는 날짜 구간의 롤업을 원본에서 다시 계산 (구간별로 교체)
+
+    일 롤업이 부분 집계가 되지 않도록 구간을 자정 기준으로 넓힌다.
+    eqp_ids 를 주면 해당 설비만 다시 계산한다.
+    """
+    day_start = bucket_start(start, 'daily')
+    day_end = bucket_start(end, 'daily') + datetime.timedelta(days=1)
+    eqp_filter, eqp_params = "", ()
+    if eqp_ids:
+        eqp_filter = f" AND eqp_id IN ({', '.join(['%s'] * len(eqp_ids))})"
+        eqp_params = tuple(eqp_ids)
+    cursor = conn.cursor()
+    try:
+        for table, _, bucket_expr in ROLLUPS.values():
+            cursor.execute(
+                f"DELETE FROM {table} WHERE bucket >= %s AND bucket < %s" + eqp_filter,
+                (day_start, day_end) + eqp_params
+            )
+            # last_val: 구간에서 val 이 있는 마지막 행의 값 (ROW_NUMBER 로 고른다.
+            # GROUP_CONCAT 은 group_concat_max_len 에서 잘려 재계산마다 경고가 난다)
+            cursor.execute(f"""
+            INSERT INTO {table} {COLUMNS}
+            SELECT
+                eqp_id,
+                bucket,
+                MIN(val),
+                MAX(val),
+                COALESCE(SUM(val), 0),
+                COUNT(val),
+                MAX(CASE WHEN val IS NOT NULL THEN tm END),
+                MAX(CASE WHEN rn = 1 THEN val END),
+                SUM(pm_mode = 1),
+                SUM(pm_mode = 0)
+            FROM (
+                SELECT
+                    eqp_id,
+                    {bucket_expr} AS bucket,
+                    tm,
+                    val,
+                    pm_mode,
+                    ROW_NUMBER() OVER (PARTITION BY eqp_id, {bucket_expr} ORDER BY val IS NULL, tm DESC) AS rn
+                FROM atlas_ecas_raw
+                WHERE tm >= %s AND tm < %s{eqp_filter}
+            ) ranked
+            GROUP BY eqp_id, bucket
+            """, (day_start, day_end) + eqp_params)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def choose_resolution(start, end, width_px):
+    """구간 길이와 픽셀 폭에 대해 포인트 수가 충분한 가장 거친 해상도를 고른다.
+
+    포인트 수가 width_px * MIN_POINTS_PER_PIXEL 이상인 해상도 중 가장 거친 것을 고르고,
+    어느 롤업도 충분하지 않으면(짧은 구간) 'raw' 를 반환한다.
+    """
+    span = end - start
+    min_points = width_px * MIN_POINTS_PER_PIXEL
+    for resolution in ('daily', 'hourly'):
+        step = ROLLUPS[resolution][1]
+        if span / step >= min_points:
+            return resolution
+    return 'raw'
+
+def query_series_many(conn, eqp_ids, start, end, width_px, resolution=None):
+    """여러 설비의 [start, end) 시계열을 한 번의 조회로 읽는다. (해상도는 query_series 와 같이 고른다)
+
+    반환: (해상도, [(eqp_id, tm, val_min, val_max, val_mean, val_count, last_val), ...]) eqp_id, tm 순
+    """
+    resolution = resolution or choose_resolution(start, end, width_px)
+    placeholders = ', '.join(['%s'] * len(eqp_ids))
+    cursor = conn.cursor()
+    try:
+        if resolution == 'raw':
+            cursor.execute(f"""
+            SELECT eqp_id, tm, val, val, val, 1, val
+            FROM atlas_ecas_raw
+            WHERE eqp_id IN ({placeholders}) AND tm >= %s AND tm < %s AND val IS NOT NULL
+            ORDER BY eqp_id, tm
+            """, (*eqp_ids, start, end))
+        else:
+            table = ROLLUPS[resolution][0]
+            cursor.execute(f"""
+            SELECT eqp_id, bucket, val_min, val_max, val_sum / NULLIF(val_count, 0), val_count, last_val
+            FROM {table}
+            WHERE eqp_id IN ({placeholders}) AND bucket >= %s AND bucket < %s
+            ORDER BY eqp_id, bucket
+            """, (*eqp_ids, bucket_start(start, resolution), end))
+        return resolution, cursor.fetchall()
+    finally:
+        cursor.close()
+
+def query_series(conn, eqp_id, start, end, width_px, resolution=None):
+    """설비 하나의 [start, end) 시계열을 적절한 해상도로 조회
+
+    반환: (해상도, [(tm, val_min, val_max, val_mean, val_count, last_val), ...])
+    raw 해상도에서는 min/max/mean/last 가 모두 원본 val 이고 count 는 1 이다.
+    """
+    resolution, rows = query_series_many(conn, [eqp_id], start, end, width_px, resolution)
+    return resolution, [row[1:] for row in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description="atlas_ecas_raw 롤업 재계산")
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('--start', type=datetime.datetime.fromisoformat, required=True)
+    parser.add_argument('--end', type=datetime.datetime.fromisoformat, required=True)
+    args = parser.parse_args()
+
+    with connection() as conn:
+        rebuild_rollups(conn, args.start, args.end)
+    print(f"Rebuilt rollups from {args.start} to {args.end}.")
+
+if __name__ == "__main__":
+    main()
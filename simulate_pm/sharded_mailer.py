@@ -0,0 +1,211 @@
+"""
+여러 프로세스(호스트)로 나눠 도는 mailer
+
+설비를 CRC32(eqp_id) % NUM_SHARDS 로 shard 에 나누고, 각 워커는 mailer_shard_leases 테이블에서
+lease 를 얻은 shard 의 설비만 조회/비교한다. (MySQL 의 CRC32() 와 zlib.crc32() 는 같은 값)
+
+- 워커는 매 주기 자기 lease 를 연장한다. LEASE_SECONDS 동안 연장하지 못한 워커(죽은 워커)의 shard 는
+  다른 워커가 가져간다.
+- 살아 있는 워커 수로 나눈 몫(올림)까지만 shard 를 가지며, 더 가진 워커는 남는 shard 를 내놓는다.
+  그래서 워커를 새로 띄우면 몇 주기 안에 shard 가 고르게 나뉜다.
+- shard 마다 이벤트 offset(event_consumer_offsets 의 'mailer-shard-<k>-of-<N>')을 따로 둔다.
+- lease 가 넘어가는 순간 두 워커가 같은 shard 를 잠깐 함께 처리해도, offset 은 compare-and-set 으로,
+  알림은 pm_notification_deliveries 의 change_key 로 한 번만 기록된다.
+- 알림 발송(dispatch_pending)은 shard 0 을 가진 워커 하나만 한다.
+
+    python sharded_mailer.py --name worker-1
+    python sharded_mailer.py --name worker-2
+
+설정(환경 변수):
+    ECAS_MAILER_SHARDS: shard 수 (기본 16). 바꾸면 shard 별 offset 도 새로 시작한다.
+"""
+import argparse
+import logging
+import math
+import os
+import socket
+import time
+
+import mysql.connector
+
+import mailer
+from db import connection
+
+logger = logging.getLogger('Mailer.Shard')
+
+NUM_SHARDS = int(os.environ.get('ECAS_MAILER_SHARDS', 16))
+LEASE_SECONDS = 30
+
+def shard_consumer(shard):
+    return f"mailer-shard-{shard}-of-{NUM_SHARDS}"
+
+def ensure_shards(conn):
+    """shard 행(0 ~ NUM_SHARDS-1)이 없으면 만든다."""
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(
+            "INSERT IGNORE INTO mailer_shard_leases (shard_id) VALUES (%s)",
+            [(shard,) for shard in range(NUM_SHARDS)]
+        )
+    finally:
+        cursor.close()
+
+def claim_shards(conn, worker):
+    """lease 를 연장하고, 공정한 몫에 맞춰 shard 를 더 얻거나 내놓은 뒤 가진 shard 목록을 반환"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+        UPDATE mailer_shard_leases SET expires_at = NOW(3) + INTERVAL %s SECOND
+        WHERE owner = %s AND expires_at > NOW(3) AND shard_id < %s
+        """, (LEASE_SECONDS, worker, NUM_SHARDS))
+        cursor.execute("""
+        SELECT shard_id FROM mailer_shard_leases
+        WHERE owner = %s AND expires_at > NOW(3) AND shard_id < %s
+        ORDER BY shard_id
+        """, (worker, NUM_SHARDS))
+        owned = [row[0] for row in cursor.fetchall()]
+        cursor.execute("""
+        SELECT COUNT(DISTINCT owner) FROM mailer_shard_leases
+        WHERE owner <> %s AND expires_at > NOW(3) AND shard_id < %s
+        """, (worker, NUM_SHARDS))
+        fair_share = math.ceil(NUM_SHARDS / (cursor.fetchone()[0] + 1))
+
+        if len(owned) > fair_share:
+            for shard in owned[fair_share:]:
+                cursor.execute(
+                    "UPDATE mailer_shard_leases SET owner = NULL, expires_at = NULL WHERE shard_id = %s AND owner = %s",
+                    (shard, worker)
+                )
+            logger.info(f"Released shards {owned[fair_share:]} for rebalancing.")
+            return owned[:fair_share]
+
+        if len(owned) < fair_share:
+            cursor.execute("""
+            SELECT shard_id FROM mailer_shard_leases
+            WHERE shard_id < %s AND (owner IS NULL OR expires_at <= NOW(3))
+            ORDER BY shard_id
+            LIMIT %s
+            """, (NUM_SHARDS, fair_share - len(owned)))
+            for (shard,) in cursor.fetchall():
+                # 다른 워커가 먼저 가져갔으면 rowcount 가 0 이다.
+                cursor.execute("""
+                UPDATE mailer_shard_leases SET owner = %s, expires_at = NOW(3) + INTERVAL %s SECOND
+                WHERE shard_id = %s AND (owner IS NULL OR expires_at <= NOW(3))
+                """, (worker, LEASE_SECONDS, shard))
+                if cursor.rowcount == 1:
+                    owned.append(shard)
+                    logger.info(f"Acquired shard {shard}.")
+        return sorted(owned)
+    finally:
+        cursor.close()
+
+def release_shards(conn, worker):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "UPDATE mailer_shard_leases SET owner = NULL, expires_at = NULL WHERE owner = %s", (worker,)
+        )
+    finally:
+        cursor.close()
+
+def get_shard_statuses(conn, shards):
+    """shards 에 속한 설비의 최신 상태만 조회 (STATUS_SCAN_MODE 가 full_scan 이면 atlas_ecas_raw 에서)"""
+    shard_filter = f"CRC32(eqp_id) %% %s IN ({', '.join(['%s'] * len(shards))})"
+    cursor = conn.cursor()
+    try:
+        if mailer.STATUS_SCAN_MODE == 'full_scan':
+            cursor.execute(f"""
+            WITH RankedLogs AS (
+                SELECT eqp_id, pm_mode, tm,
+                       ROW_NUMBER() OVER (PARTITION BY eqp_id ORDER BY tm DESC) as rn
+                FROM atlas_ecas_raw
+                WHERE pm_mode IS NOT NULL AND tm >= %s AND {shard_filter}
+            )
+            SELECT eqp_id, pm_mode, tm FROM RankedLogs WHERE rn = 1
+            """, (mailer.retention_cutoff(), NUM_SHARDS, *shards))
+        else:
+            cursor.execute(
+                f"SELECT eqp_id, pm_mode, tm FROM equipment_pm_state WHERE {shard_filter}",
+                (NUM_SHARDS, *shards)
+            )
+        return {eqp_id: {'pm_mode': pm_mode, 'tm': tm} for eqp_id, pm_mode, tm in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+def run_shard_check(status_store, shards):
+    """가진 shard 의 전체 상태 비교 (mailer.run_status_check 의 shard 판)"""
+    with connection(autocommit=True) as db_connection:
+        try:
+            current_statuses = get_shard_statuses(db_connection, shards) if shards else {}
+        except mysql.connector.Error as err:
+            logger.error(f"Failed to fetch statuses for shards {shards}: {err}")
+            return
+        # 가진 shard 가 바뀌면 내놓은 shard 의 설비는 저장소에서 빠진다.
+        mailer.check_status_changes(db_connection, status_store, current_statuses)
+    logger.info(f"Checked {len(current_statuses)} equipments in shards {shards}.")
+
+def main():
+    parser = argparse.ArgumentParser(description="shard 단위로 나눠 도는 mailer 워커")
+    parser.add_argument('--name', default=f"{socket.gethostname()}-{os.getpid()}",
+                        help="워커 이름 (lease 소유자, 상태 파일 이름에 사용)")
+    args = parser.parse_args()
+    worker = args.name
+
+    if mailer.STATUS_SCAN_MODE == 'incremental':
+        logger.warning("incremental scan mode is not sharded. Using equipment_pm_state instead.")
+    extension = 'db' if mailer.STATUS_STORE_BACKEND == 'sqlite' else 'json'
+    status_store = mailer.open_status_store(mailer.STATUS_STORE_BACKEND, f"data/equipment_status.{worker}.{extension}")
+    logger.info(f"Sharded mailer '{worker}' started with {NUM_SHARDS} shards. "
+                f"Loaded {len(status_store)} statuses from {status_store.path}")
+
+    with connection(autocommit=True) as db_connection:
+        ensure_shards(db_connection)
+
+    shards = []
+    offsets = {}
+    next_check_at = 0.0
+    while True:
+        try:
+            with connection(autocommit=True) as db_connection:
+                claimed = claim_shards(db_connection, worker)
+            if claimed != shards:
+                logger.info(f"Now owning shards {claimed}.")
+                offsets = {shard: offsets.get(shard) for shard in claimed}
+                shards = claimed
+                # 새로 얻은 shard 는 이전 워커가 놓친 변경이 있을 수 있으므로 바로 전체 비교
+                next_check_at = 0.0
+
+            if mailer.CHANGE_DETECTION_MODE == 'events':
+                for shard in shards:
+                    offsets[shard] = mailer.poll_events(
+                        status_store, offsets[shard], shard_consumer(shard), (shard, NUM_SHARDS)
+                    )
+
+            if time.monotonic() >= next_check_at:
+                run_shard_check(status_store, shards)
+                next_check_at = time.monotonic() + mailer.CHECK_INTERVAL_SECONDS
+
+            if 0 in shards:
+                mailer.dispatch_notifications()
+
+            time.sleep(mailer.EVENT_POLL_SECONDS)
+
+        except KeyboardInterrupt:
+            logger.warning("Process stopped by user.")
+            break
+        except Exception as e:
+            logger.error(f"An unexpected error occurred: {e}", exc_info=True)
+            time.sleep(min(60, LEASE_SECONDS // 2))
+
+    mailer.save_statuses(status_store)
+    status_store.close()
+    try:
+        # 다른 워커가 lease 만료를 기다리지 않고 바로 가져가도록 반납
+        with connection(autocommit=True) as db_connection:
+            release_shards(db_connection, worker)
+    except mysql.connector.Error as err:
+        logger.error(f"Failed to release shards: {err}")
+    logging.shutdown()
+
+if __name__ == "__main__":
+    main()
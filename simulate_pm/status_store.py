@@ -0,0 +1,168 @@
+"""
+mailer.py 가 알림을 보낸 마지막 설비 상태를 보관하는 저장소
+
+상태는 메모리의 딕셔너리({eqp_id: {'pm_mode': ..., 'tm': 'YYYY-MM-DD HH:MM:SS'}})로 들고 있고,
+파일은 시작할 때 한 번만 읽는다. flush() 는 바뀐 내용이 있을 때만 디스크에 쓴다.
+
+- 'json': data/equipment_status.json. 임시 파일에 쓰고 os.replace() 로 바꿔치기하므로,
+  쓰는 도중 중단되어도 이전 파일 또는 새 파일 중 하나가 온전히 남는다. (indent 없이 compact 저장)
+- 'sqlite': data/equipment_status.db. 바뀐 설비 행만 한 트랜잭션으로 upsert/delete 하므로
+  설비 수가 많아도(10만 대) 쓰기 비용이 변경 수에 비례한다. DB 파일을 새로 만들 때 기존 JSON 파일을 가져온다.
+"""
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+
+logger = logging.getLogger('Mailer.StatusStore')
+
+JSON_PATH = 'data/equipment_status.json'
+SQLITE_PATH = 'data/equipment_status.db'
+
+def format_tm(tm):
+    """datetime 또는 파일에서 읽은 문자열 tm 을 초 단위까지의 문자열로 통일 (사전순 비교 = 시간순 비교)"""
+    return str(tm)[:19] if tm is not None else None
+
+class StatusStore:
+    """메모리 상태 맵 + 변경분 추적. 실제 읽기/쓰기는 하위 클래스의 _load() / _write() 가 한다."""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._statuses = self._load()
+        self._dirty = set()
+
+    def __len__(self):
+        return len(self._statuses)
+
+    def get(self, eqp_id):
+        """저장된 상태 {'pm_mode', 'tm'} 또는 빈 딕셔너리"""
+        return self._statuses.get(eqp_id, {})
+
+    def items(self):
+        return self._statuses.items()
+
+    def set(self, eqp_id, pm_mode, tm):
+        """설비 하나의 상태를 기록. 값이 같으면 아무것도 바꾸지 않는다."""
+        status = {'pm_mode': pm_mode, 'tm': format_tm(tm)}
+        if self._statuses.get(eqp_id) != status:
+            self._statuses[eqp_id] = status
+            self._dirty.add(eqp_id)
+
+    def replace(self, statuses):
+        """전체 상태를 statuses({eqp_id: {'pm_mode', 'tm'}})로 맞춘다. 없는 설비는 지운다."""
+        for eqp_id in list(self._statuses):
+            if eqp_id not in statuses:
+                del self._statuses[eqp_id]
+                self._dirty.add(eqp_id)
+        for eqp_id, status in statuses.items():
+            self.set(eqp_id, status.get('pm_mode'), status.get('tm'))
+
+    def flush(self):
+        """바뀐 내용이 있으면 디스크에 쓴다. 쓰기에 실패하면 변경분을 유지해 다음 flush 에서 다시 시도한다."""
+        if not self._dirty:
+            return False
+        self._write(self._dirty)
+        logger.info(f"Saved {len(self._dirty)} changed statuses to {self.path}")
+        self._dirty = set()
+        return True
+
+    def close(self):
+        """저장소를 닫는다. 남은 변경분은 먼저 flush() 로 기록해야 한다."""
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _write(self, changed_ids):
+        raise NotImplementedError
+
+class JsonStatusStore(StatusStore):
+
+    def _load(self):
+        return read_json_statuses(self.path)
+
+    def _write(self, changed_ids):
+        directory = os.path.dirname(self.path) or '.'
+        fd, tmp_path = tempfile.mkstemp(prefix='.equipment_status.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self._statuses, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+class SqliteStatusStore(StatusStore):
+
+    def __init__(self, path, import_json_path=None):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        created = not os.path.exists(path)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS equipment_status (
+            eqp_id TEXT PRIMARY KEY,
+            pm_mode INTEGER,
+            tm TEXT
+        )
+        """)
+        super().__init__(path)
+        if created and import_json_path and os.path.exists(import_json_path):
+            self.replace(read_json_statuses(import_json_path))
+            logger.info(f"Imported {len(self._statuses)} statuses from {import_json_path}")
+            self.flush()
+
+    def _load(self):
+        rows = self._conn.execute("SELECT eqp_id, pm_mode, tm FROM equipment_status").fetchall()
+        return {eqp_id: {'pm_mode': pm_mode, 'tm': tm} for eqp_id, pm_mode, tm in rows}
+
+    def _write(self, changed_ids):
+        upserts = []
+        deletes = []
+        for eqp_id in changed_ids:
+            status = self._statuses.get(eqp_id)
+            if status is None:
+                deletes.append((eqp_id,))
+            else:
+                upserts.append((eqp_id, status['pm_mode'], status['tm']))
+        # with 블록이 한 트랜잭션: 중간에 실패하면 전부 롤백된다.
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO equipment_status (eqp_id, pm_mode, tm) VALUES (?, ?, ?) "
+                "ON CONFLICT(eqp_id) DO UPDATE SET pm_mode = excluded.pm_mode, tm = excluded.tm",
+                upserts
+            )
+            self._conn.executemany("DELETE FROM equipment_status WHERE eqp_id = ?", deletes)
+
+    def close(self):
+        self._conn.close()
+
+def read_json_statuses(path):
+    """JSON 상태 파일을 읽는다. 없거나 깨졌으면 빈 딕셔너리."""
+    try:
+        with open(path, 'r') as f:
+            statuses = json.load(f)
+    except FileNotFoundError:
+        logger.warning("Status file not found. Starting with an empty state.")
+        return {}
+    except json.JSONDecodeError:
+        logger.error("Failed to decode status file. Starting with an empty state.")
+        return {}
+    return {
+        eqp_id: {'pm_mode': status.get('pm_mode'), 'tm': format_tm(status.get('tm'))}
+        for eqp_id, status in statuses.items()
+    }
+
+def open_status_store(backend='json', path=None):
+    """backend('json' | 'sqlite') 에 맞는 저장소를 열어 파일의 상태를 읽어 둔다."""
+    if backend == 'sqlite':
+        return SqliteStatusStore(path or SQLITE_PATH, import_json_path=JSON_PATH)
+    if backend == 'json':
+        return JsonStatusStore(path or JSON_PATH)
+    raise ValueError(f"Unknown status store backend: {backend}")
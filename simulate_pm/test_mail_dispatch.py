@@ -0,0 +1,208 @@
+"""
+mail_dispatch.py 테스트: 로컬 SMTP 서버(aiosmtpd)로 dispatch_pending() 을 실행해 라인별 digest 와
+pm_notification_deliveries 의 status / attempts 기록을 확인한다.
+
+DB 는 sqlite 메모리 DB 에 같은 테이블을 만들고, mail_dispatch 의 쿼리를 그대로 실행한다.
+(%s, INSERT IGNORE, IF(), NOW() 만 sqlite 문법으로 바꾼다)
+
+    pip install pytest aiosmtpd
+    python -m pytest test_mail_dispatch.py
+"""
+import datetime
+import email
+import email.policy
+import socket
+import sqlite3
+
+import pytest
+
+controller_module = pytest.importorskip('aiosmtpd.controller')
+
+import mail_dispatch
+from mail_dispatch import SmtpSender, dispatch_pending, fetch_pending, record_changes
+
+DELIVERIES_TABLE = """
+CREATE TABLE pm_notification_deliveries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    change_key VARCHAR(320) NOT NULL UNIQUE,
+    eqp_id VARCHAR(255) NOT NULL,
+    line VARCHAR(50) NOT NULL,
+    prev_pm_mode VARCHAR(32),
+    pm_mode TINYINT,
+    tm DATETIME NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sent', 'failed')),
+    attempts INT NOT NULL DEFAULT 0,
+    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sent_at DATETIME
+)
+"""
+TM = datetime.datetime(2025, 1, 1, 9, 0, 0)
+
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DATETIME', lambda value: datetime.datetime.fromisoformat(value.decode()))
+
+class _Cursor:
+    """mysql.connector 커서처럼 %s 자리표시자와 MySQL 함수를 받는 sqlite 커서"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    @staticmethod
+    def _translate(query):
+        return (query.replace('%s', '?').replace('INSERT IGNORE', 'INSERT OR IGNORE')
+                .replace('IF(', 'IIF(').replace('NOW()', 'CURRENT_TIMESTAMP'))
+
+    def execute(self, query, params=()):
+        self._cursor.execute(self._translate(query), params)
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(self._translate(query), rows)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+class _Connection:
+    autocommit = False
+
+    def __init__(self):
+        self._conn = sqlite3.connect(':memory:', detect_types=sqlite3.PARSE_DECLTYPES)
+        self._conn.execute(DELIVERIES_TABLE)
+
+    def cursor(self):
+        return _Cursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def deliveries(self):
+        """{eqp_id: (status, attempts, sent_at 이 있는지)}"""
+        rows = self._conn.execute("SELECT eqp_id, status, attempts, sent_at FROM pm_notification_deliveries")
+        return {eqp_id: (status, attempts, sent_at is not None) for eqp_id, status, attempts, sent_at in rows}
+
+class _Handler:
+    """받은 메일을 모아 두고, 'reject' 로 시작하는 수신자는 550 으로 거부한다."""
+
+    def __init__(self):
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('reject'):
+            return '550 5.1.1 Mailbox unavailable'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        message = email.message_from_bytes(envelope.original_content, policy=email.policy.default)
+        self.messages.append((envelope.rcpt_tos, message))
+        return '250 Message accepted for delivery'
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture
+def smtp_server():
+    handler = _Handler()
+    controller = controller_module.Controller(handler, hostname='127.0.0.1', port=_free_port())
+    controller.start()
+    try:
+        yield controller, handler
+    finally:
+        controller.stop()
+
+@pytest.fixture
+def conn():
+    return _Connection()
+
+@pytest.fixture(autouse=True)
+def recipients(monkeypatch):
+    monkeypatch.setattr(mail_dispatch, 'DEFAULT_RECIPIENTS', ['ecas-pm@localhost'])
+    monkeypatch.setattr(mail_dispatch, 'LINE_RECIPIENTS', {})
+
+def _sender(smtp_server):
+    controller, _ = smtp_server
+    return SmtpSender(controller.hostname, controller.port, rate_per_second=0)
+
+def _changes(*eqp_ids):
+    return [(eqp_id, 0, 1, TM) for eqp_id in eqp_ids]
+
+def _dispatch(conn, smtp_server):
+    sender = _sender(smtp_server)
+    try:
+        return dispatch_pending(conn, sender)
+    finally:
+        sender.close()
+
+def test_digest_per_line(conn, smtp_server):
+    _, handler = smtp_server
+    record_changes(conn, _changes('EQP-001', 'EQP-002', 'EQP-050', 'EQP-051', 'EQP-100'))
+
+    assert _dispatch(conn, smtp_server) == (2, 5)
+
+    subjects = sorted(message['Subject'] for _, message in handler.messages)
+    assert subjects == [
+        "[ECAS PM 알림] LINE-01 설비 3대의 PM 모드 변경",
+        "[ECAS PM 알림] LINE-02 설비 2대의 PM 모드 변경",
+    ]
+    bodies = {message['Subject'].split()[3]: message.get_content() for _, message in handler.messages}
+    assert all(eqp_id in bodies['LINE-01'] for eqp_id in ('EQP-001', 'EQP-002', 'EQP-050'))
+    assert all(eqp_id in bodies['LINE-02'] for eqp_id in ('EQP-051', 'EQP-100'))
+    assert "OFF -> ON" in bodies['LINE-01']
+    assert all(rcpt_tos == ['ecas-pm@localhost'] for rcpt_tos, _ in handler.messages)
+    assert set(conn.deliveries().values()) == {('sent', 1, True)}
+
+def test_sent_changes_are_not_sent_again(conn, smtp_server):
+    _, handler = smtp_server
+    record_changes(conn, _changes('EQP-001'))
+    assert _dispatch(conn, smtp_server) == (1, 1)
+
+    # 같은 변경을 다시 감지해도 기록되지 않고, 다음 주기에 보낼 것이 없다
+    assert record_changes(conn, _changes('EQP-001')) == 0
+    assert _dispatch(conn, smtp_server) == (0, 0)
+    assert len(handler.messages) == 1
+    assert conn.deliveries() == {'EQP-001': ('sent', 1, True)}
+
+def test_large_line_is_split_into_digests(conn, smtp_server, monkeypatch):
+    _, handler = smtp_server
+    monkeypatch.setattr(mail_dispatch, 'MAX_CHANGES_PER_DIGEST', 2)
+    record_changes(conn, _changes('EQP-001', 'EQP-002', 'EQP-003', 'EQP-004', 'EQP-005'))
+
+    assert _dispatch(conn, smtp_server) == (3, 5)
+    assert sorted(len(message.get_content().split('\n- ')) - 1 for _, message in handler.messages) == [1, 2, 2]
+    assert set(conn.deliveries().values()) == {('sent', 1, True)}
+
+def test_rejected_digest_does_not_block_other_lines(conn, smtp_server, monkeypatch):
+    _, handler = smtp_server
+    monkeypatch.setattr(mail_dispatch, 'MAX_DELIVERY_ATTEMPTS', 2)
+    monkeypatch.setattr(mail_dispatch, 'LINE_RECIPIENTS', {'LINE-01': ['reject@localhost']})
+    record_changes(conn, _changes('EQP-001', 'EQP-051'))
+
+    assert _dispatch(conn, smtp_server) == (1, 1)
+    assert conn.deliveries() == {'EQP-001': ('pending', 1, False), 'EQP-051': ('sent', 1, True)}
+
+    # MAX_DELIVERY_ATTEMPTS 번째 실패에서 'failed' 로 바뀌고, 이후에는 조회되지 않는다
+    record_changes(conn, _changes('EQP-052'))
+    assert _dispatch(conn, smtp_server) == (1, 1)
+    assert conn.deliveries()['EQP-001'] == ('failed', 2, False)
+    assert conn.deliveries()['EQP-052'] == ('sent', 1, True)
+    assert fetch_pending(conn) == []
+    assert len(handler.messages) == 2
+
+def test_connection_error_stops_cycle(conn, monkeypatch):
+    monkeypatch.setattr(mail_dispatch, 'MAX_SEND_ATTEMPTS', 1)
+    record_changes(conn, _changes('EQP-001', 'EQP-051'))
+
+    sender = SmtpSender('127.0.0.1', _free_port(), rate_per_second=0)   # 아무도 듣지 않는 포트
+    assert dispatch_pending(conn, sender) == (0, 0)
+
+    # 첫 digest 만 시도로 기록되고 나머지는 그대로 pending (다음 주기에 다시 보낸다)
+    assert sorted(conn.deliveries().values()) == [('pending', 0, False), ('pending', 1, False)]
+    assert len(fetch_pending(conn)) == 2